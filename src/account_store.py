@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import pprint
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 100_000  # Rows parsed at a time by the bulk readers
+
+class StringColumn:
+    """Variable-length strings packed into one UTF-8 buffer plus an offsets array, as Arrow does.
+
+    Each string is stored NUL-terminated, so a whole column is encoded with a
+    single join instead of one encode call per value.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        builder = StringColumnBuilder()
+        builder.extend(strings)
+        return builder.build()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1] - 1].tobytes().decode('utf-8')
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.offsets.nbytes
+
+class StringColumnBuilder:
+    """Appends batches of strings to one growing buffer, so a column is never held twice."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._ends = [np.zeros(1, dtype=np.int64)]
+
+    def extend(self, strings):
+        strings = strings.tolist() if hasattr(strings, 'tolist') else list(strings)  # Series iterate slowly
+        if not strings:
+            return
+        encoded = ("\0".join(strings) + "\0").encode('utf-8')
+        ends = np.flatnonzero(np.frombuffer(encoded, dtype=np.uint8) == 0)
+        if len(ends) != len(strings):
+            raise ValueError("Strings in a StringColumn cannot contain NUL characters")
+        self._ends.append(ends + 1 + len(self._buffer))
+        self._buffer += encoded
+
+    def build(self):
+        return StringColumn(np.frombuffer(self._buffer, dtype=np.uint8), np.concatenate(self._ends))
+
+def avg_daily_retweets(retweet_counts, created_at, now=None):
+    """Vectorized TwitterAccount._calculate_avg_daily_retweets over whole columns."""
+    created = pd.to_datetime(pd.Series(created_at), format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    days = (pd.Timestamp(now or datetime.now()) - created).dt.days.to_numpy()
+    valid = ~np.isnan(days)
+    averages = np.zeros(len(created), dtype=np.float64)
+    averages[valid] = np.round(np.asarray(retweet_counts)[valid] / np.maximum(days[valid], 1), 2)
+    return averages
+
+def _column(name):
+    return property(lambda self: self._store.value(name, self._index), doc=f"The account's {name} column value.")
+
+class TwitterAccountView:
+    """Read-only TwitterAccount backed by one row of a TwitterAccountStore."""
+
+    __slots__ = ('_store', '_index', '_prompt_blocks')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    user_id = _column('user_id')
+    username = _column('username')
+    tweet = _column('tweet')
+    retweet_count = _column('retweet_count')
+    mention_count = _column('mention_count')
+    follower_count = _column('follower_count')
+    verified = _column('verified')
+    bot_label = _column('bot_label')
+    location = _column('location')
+    created_at = _column('created_at')
+    avg_daily_retweets = _column('avg_daily_retweets')
+
+    @property
+    def hashtags(self):
+        hashtags = self._store.value('hashtags', self._index)
+        return hashtags.split(',') if hashtags else []
+
+    @property
+    def account_id(self):
+        """Stable identifier used to journal and shard results."""
+        return str(self.user_id)
+
+    def get_account_details(self):
+        return {
+            'user_id': self.user_id,
+            'username': self.username,
+            'tweet': self.tweet,
+            'retweet_count': self.retweet_count,
+            'mention_count': self.mention_count,
+            'follower_count': self.follower_count,
+            'verified': self.verified,
+            'bot_label': self.bot_label,
+            'location': self.location,
+            'created_at': self.created_at,
+            'hashtags': self.hashtags,
+            'avg_daily_retweets': self.avg_daily_retweets
+        }
+
+    def __str__(self):
+        return pprint.pformat(self.get_account_details())
+
+class RobustAccountView:
+    """Read-only RobustTwitterAccount backed by one row of a RobustAccountStore."""
+
+    __slots__ = ('_store', '_index', '_prompt_blocks')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    username = _column('username')
+    handle = _column('handle')
+    description = _column('description')
+    location = _column('location')
+    webpage = _column('webpage')
+    joined = _column('joined')
+    following = _column('following')
+    followers = _column('followers')
+    bot_label = _column('bot_label')
+
+    @property
+    def tweets(self):
+        tweets = (self._store.value(f'tweet{i}', self._index) for i in range(1, 6))
+        return [t for t in tweets if t]
+
+    @property
+    def account_id(self):
+        """Stable identifier used to journal and shard results."""
+        return self.handle
+
+    def get_account_details(self):
+        return {
+            'username': self.username,
+            'handle': self.handle,
+            'description': self.description,
+            'location': self.location,
+            'webpage': self.webpage,
+            'joined': self.joined,
+            'following': self.following,
+            'followers': self.followers,
+            'tweets': self.tweets,
+            'is_bot': self.bot_label
+        }
+
+    def __str__(self):
+        return f"{self.username} (@{self.handle})"
+
+class AccountStore:
+    """Accounts held column by column: NumPy arrays for numbers, packed buffers for text.
+
+    Indexing or iterating yields lightweight row views that the interfaces use
+    like regular account objects. A store can be saved to a directory of .npy
+    files and loaded back memory-mapped, so only the pages that are read are
+    brought into memory.
+    """
+
+    NUMERIC = {}
+    STRINGS = ()
+    view_class = None
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._length = len(columns[next(iter(columns))])
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if not -self._length <= index < self._length:
+            raise IndexError(f"Account index {index} out of range")
+        return self.view_class(self, index % self._length)
+
+    def __iter__(self):
+        view_class = self.view_class
+        return (view_class(self, i) for i in range(self._length))
+
+    def value(self, name, index):
+        value = self.columns[name][index]
+        return value.item() if isinstance(value, np.generic) else value
+
+    @classmethod
+    def from_columns(cls, **values):
+        """Build a store from equal-length sequences, one per column."""
+        return cls.from_chunks([values])
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Build a store from an iterable of column batches, such as a CSV parsed in chunks.
+
+        Only the current batch exists as Python objects; text is appended to
+        each column's buffer as it arrives.
+        """
+        numeric = {name: [] for name in cls.NUMERIC}
+        strings = {name: StringColumnBuilder() for name in cls.STRINGS}
+        for chunk in chunks:
+            for name, dtype in cls.NUMERIC.items():
+                numeric[name].append(np.asarray(chunk[name], dtype=dtype))
+            for name, builder in strings.items():
+                builder.extend(chunk[name])
+        columns = {name: np.concatenate(pieces) if pieces else np.zeros(0, dtype=cls.NUMERIC[name])
+                   for name, pieces in numeric.items()}
+        columns.update({name: builder.build() for name, builder in strings.items()})
+        return cls(columns)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, column in self.columns.items():
+            if isinstance(column, StringColumn):
+                np.save(os.path.join(directory, f"{name}.data.npy"), column.data)
+                np.save(os.path.join(directory, f"{name}.offsets.npy"), column.offsets)
+            else:
+                np.save(os.path.join(directory, f"{name}.npy"), column)
+        with open(os.path.join(directory, "store.json"), 'w', encoding='utf-8') as f:
+            json.dump({'kind': self.KIND, 'rows': len(self)}, f)
+
+    @staticmethod
+    def load(directory, mmap=True):
+        """Load a saved store of either kind, memory-mapped unless mmap is False."""
+        with open(os.path.join(directory, "store.json"), encoding='utf-8') as f:
+            kind = json.load(f)['kind']
+        cls = {store.KIND: store for store in (TwitterAccountStore, RobustAccountStore)}[kind]
+        mode = 'r' if mmap else None
+        path = lambda name: os.path.join(directory, name)
+        columns = {name: np.load(path(f"{name}.npy"), mmap_mode=mode) for name in cls.NUMERIC}
+        columns.update({name: StringColumn(np.load(path(f"{name}.data.npy"), mmap_mode=mode),
+                                           np.load(path(f"{name}.offsets.npy"), mmap_mode=mode))
+                        for name in cls.STRINGS})
+        return cls(columns)
+
+class TwitterAccountStore(AccountStore):
+    KIND = 'standard'
+    NUMERIC = {'user_id': np.int64, 'retweet_count': np.int64, 'mention_count': np.int64,
+               'follower_count': np.int64, 'verified': np.bool_, 'bot_label': np.int8,
+               'avg_daily_retweets': np.float64}
+    STRINGS = ('username', 'tweet', 'location', 'created_at', 'hashtags')
+    view_class = TwitterAccountView
+
+class RobustAccountStore(AccountStore):
+    KIND = 'robust'
+    NUMERIC = {'following': np.int64, 'followers': np.int64, 'bot_label': np.bool_}
+    STRINGS = ('username', 'handle', 'description', 'location', 'webpage', 'joined',
+               'tweet1', 'tweet2', 'tweet3', 'tweet4', 'tweet5')
+    view_class = RobustAccountView
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a dataset CSV into a memory-mappable account store.")
+    parser.add_argument("dataset", help="CSV to convert")
+    parser.add_argument("output", help="directory for the store")
+    parser.add_argument("--robust", action="store_true", help="dataset uses the robust column layout")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    from .dataset_reader import read_dataset_columnar
+    from .robust_dataset_reader import read_robust_dataset_columnar
+    reader = read_robust_dataset_columnar if args.robust else read_dataset_columnar
+    store = reader(args.dataset, args.limit)
+    store.save(args.output)
+    print(f"Saved {len(store)} accounts ({store.nbytes / 2 ** 20:.1f} MiB) to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import re
+
+CONFIDENCE_FIELD = "**Bot Probability:**"
+
+# Appended to both opening prompts in adaptive mode; each side scores the account honestly, not its own case
+CONFIDENCE_REQUEST = f"""
+
+Finish with one line giving your honest estimate, regardless of the side you argued, of the probability (0-100) that this account is a bot:
+{CONFIDENCE_FIELD} <number>"""
+
+SKIPPED_CRITIQUE = "(No critique: both experts already agreed on the classification.)"
+
+_PROBABILITY = re.compile(r"(\d+(?:\.\d+)?)\s*(%?)")
+
+def parse_bot_probability(text):
+    """Read the trailing bot probability as a fraction in [0, 1], or None if it is missing or malformed.
+
+    The number is on the 0-100 scale the prompt asks for, so "1" is 1%, not certainty.
+    """
+    start = text.rfind(CONFIDENCE_FIELD)
+    if start == -1:
+        return None
+    match = _PROBABILITY.match(text[start + len(CONFIDENCE_FIELD):].strip().strip('*'))
+    if match is None:
+        return None
+    value = float(match.group(1))
+    return value / 100 if 0 <= value <= 100 else None
+
+def combine_rounds(critiques):
+    """Join one side's critiques across rounds into the single text the judge prompt expects."""
+    if len(critiques) == 1:
+        return critiques[0]
+    return "\n\n".join(f"Round {i}:\n{text}" for i, text in enumerate(critiques, 1))
+
+class AdaptiveDebatePolicy:
+    """Decides after the openings how much more debate an account needs.
+
+    Both opening agents score the account's bot probability. If both scores
+    are at or beyond the agreement threshold on the same side, the critiques
+    are skipped and, with skip_judge, so is the judge. If their average sits
+    within close_margin of 0.5 the evidence is balanced and extra_rounds
+    more critique rounds are held before the judge.
+    """
+
+    def __init__(self, agreement=0.8, skip_judge=True, close_margin=0.1, extra_rounds=1):
+        self.agreement = agreement
+        self.skip_judge = skip_judge
+        self.close_margin = close_margin
+        self.extra_rounds = extra_rounds
+
+    def route(self, bot_probability, human_probability):
+        """Return (path, consensus label or None) for the opening scores."""
+        if bot_probability is None or human_probability is None:
+            return 'standard', None
+        if min(bot_probability, human_probability) >= self.agreement:
+            return 'early_exit', 1
+        if 1 - max(bot_probability, human_probability) >= self.agreement:
+            return 'early_exit', 0
+        if self.extra_rounds and abs((bot_probability + human_probability) / 2 - 0.5) <= self.close_margin:
+            return 'extended', None
+        return 'standard', None
+
+    def calls(self, path):
+        """API calls an account on this path costs."""
+        if path == 'early_exit':
+            return 2 if self.skip_judge else 3
+        if path == 'extended':
+            return 5 + 2 * self.extra_rounds
+        return 5
+
+def adaptive_policy_from_env():
+    """Build the policy from the ADAPTIVE_* settings in .env."""
+    return AdaptiveDebatePolicy(
+        agreement=float(os.getenv("ADAPTIVE_AGREEMENT", 0.8)),
+        skip_judge=os.getenv("ADAPTIVE_SKIP_JUDGE", "true").lower() == "true",
+        close_margin=float(os.getenv("ADAPTIVE_CLOSE_MARGIN", 0.1)),
+        extra_rounds=int(os.getenv("ADAPTIVE_EXTRA_ROUNDS", 1)),
+    )
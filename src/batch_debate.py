@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import time
+import uuid
+from openai.types.chat import ChatCompletion
+from .debate_engine import record_verdict
+from .journal import iter_journal, new_result
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+FINISHED_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+# Each layer's stages only read stages of earlier layers
+LAYERS = (('openings', ('bot_agent', 'human_agent')),
+          ('critiques', ('bot_critic', 'human_critic')),
+          ('judge', ('judge',)))
+
+class OpenAIBatchBackend:
+    """The provider's batch endpoint: upload a JSONL file of requests, create a batch job, poll it, download replies."""
+
+    def __init__(self, client, completion_window="24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, path):
+        with open(path, 'rb') as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        return self.client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT,
+                                          completion_window=self.completion_window).id
+
+    def status(self, batch_id):
+        """(status, completed requests, total requests)."""
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return batch.status, (counts.completed + counts.failed if counts else 0), (counts.total if counts else 0)
+
+    def results(self, batch_id):
+        """Output lines of a finished batch, failed requests included."""
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        yield json.loads(line)
+
+class LocalBatchBackend:
+    """File-based stand-in for the batch endpoint, answering with the mock server's canned replies.
+
+    A submitted file is copied into directory and answered in full on its
+    first poll, with the mock's injected errors as failed requests, so batch
+    runs can be tested and rehearsed offline.
+    """
+
+    def __init__(self, directory, mock=None):
+        from .mock_openai_server import MockOpenAIServer
+        self.directory = directory
+        self.mock = mock if mock is not None else MockOpenAIServer(seed=0)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, batch_id, kind):
+        return os.path.join(self.directory, f"{batch_id}.{kind}.jsonl")
+
+    def submit(self, path):
+        batch_id = f"batch_{uuid.uuid4().hex[:16]}"
+        with open(path, encoding='utf-8') as src, open(self._path(batch_id, 'input'), 'w', encoding='utf-8') as dst:
+            dst.write(src.read())
+        return batch_id
+
+    def status(self, batch_id):
+        output = self._path(batch_id, 'output')
+        if not os.path.exists(output):
+            with open(self._path(batch_id, 'input'), encoding='utf-8') as src, \
+                    open(output + '.tmp', 'w', encoding='utf-8') as dst:
+                for line in src:
+                    request = json.loads(line)
+                    status, body = self.mock.respond(request['body'])
+                    dst.write(json.dumps({
+                        'id': f"batch_req_{uuid.uuid4().hex[:16]}", 'custom_id': request['custom_id'],
+                        'response': {'status_code': status, 'body': body}, 'error': None}) + '\n')
+            os.replace(output + '.tmp', output)
+        with open(output, encoding='utf-8') as f:
+            total = sum(1 for _ in f)
+        return 'completed', total, total
+
+    def results(self, batch_id):
+        with open(self._path(batch_id, 'output'), encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+class BatchDebate:
+    """Run the full debate for many accounts through batch jobs, one layer of stages at a time.
+
+    Each layer's requests for every account go into JSONL files in the
+    provider's batch format (at most max_requests per file), identified by a
+    "stage:account_id" custom ID. The files are submitted together and
+    polled every poll_seconds. Replies are mapped back to their accounts and
+    feed the next layer. A request that fails, or a judge reply without a
+    classification, is sent again in a follow-up batch up to retries times;
+    an account whose stage still failed is reported with the error and
+    scored as Human, like in the interactive engines.
+
+    Submitted batches and collected replies are kept in state_dir, so an
+    interrupted run resumed with resume=True picks up where it stopped:
+    finished layers are read back, batches still running are polled again
+    rather than resubmitted.
+    """
+
+    def __init__(self, interface, backend, state_dir, poll_seconds=30.0, retries=2, max_requests=50_000,
+                 resume=True):
+        self.interface = interface
+        self.backend = backend
+        self.state_dir = state_dir
+        self.poll_seconds = poll_seconds
+        self.retries = retries
+        self.max_requests = max_requests
+        self.submitted = 0
+        self.batches = 0
+        os.makedirs(state_dir, exist_ok=True)
+        self._state_path = os.path.join(state_dir, "state.json")
+        self.state = {}
+        if resume and os.path.exists(self._state_path):
+            with open(self._state_path, encoding='utf-8') as f:
+                self.state = json.load(f)
+        elif not resume:
+            # Like the journal, a run that is not resumed starts over
+            for layer, _ in LAYERS:
+                open(os.path.join(state_dir, f"{layer}.results.jsonl"), 'w').close()
+
+    def run(self, accounts, on_decided):
+        """Debate the accounts (a list, read once per layer) and pass each finished result to on_decided."""
+        replies = {}
+        for layer, stages in LAYERS:
+            replies.update(self._run_layer(layer, stages, accounts, replies))
+        for account in accounts:
+            on_decided(self._result(account, replies))
+
+    def _inputs(self, stage, account_id, replies):
+        """The texts a stage reads, or None when one of them failed."""
+        needed = {'bot_agent': (), 'human_agent': (), 'bot_critic': ('human_agent',), 'human_critic': ('bot_agent',),
+                  'judge': ('bot_agent', 'human_agent', 'bot_critic', 'human_critic')}[stage]
+        records = [replies.get(f"{upstream}:{account_id}") for upstream in needed]
+        if any(record is None or record['error'] for record in records):
+            return None
+        return [record['texts'][0] for record in records]
+
+    def _run_layer(self, layer, stages, accounts, replies):
+        layer_state = self.state.setdefault(layer, {'open': [], 'rounds': 0})
+        results_path = os.path.join(self.state_dir, f"{layer}.results.jsonl")
+        results, attempts = {}, {}
+        for record in iter_journal(results_path):
+            results[record['custom_id']] = record
+            attempts[record['custom_id']] = attempts.get(record['custom_id'], 0) + 1
+
+        while True:
+            while layer_state['open']:
+                batch = layer_state['open'][0]
+                self._wait(layer, batch['id'])
+                with open(results_path, 'a', encoding='utf-8') as out:
+                    for record in self._collect(batch):
+                        out.write(json.dumps(record) + '\n')
+                        results[record['custom_id']] = record
+                        attempts[record['custom_id']] = attempts.get(record['custom_id'], 0) + 1
+                layer_state['open'].pop(0)
+                self._save()
+
+            pending = self._pending(stages, accounts, replies, results, attempts)
+            if not self._submit(layer, layer_state, pending):
+                logging.info(f"Batch layer {layer} finished with {len(results)} replies")
+                return results
+
+    def _pending(self, stages, accounts, replies, results, attempts):
+        """(custom ID, request body) of every request of the layer still to be sent."""
+        for account in accounts:
+            for stage in stages:
+                custom_id = f"{stage}:{account.account_id}"
+                done = results.get(custom_id)
+                if (done is not None and not done['error']) or attempts.get(custom_id, 0) > self.retries:
+                    continue
+                texts = self._inputs(stage, account.account_id, replies)
+                if texts is not None:
+                    yield custom_id, self.interface.stage_params(stage, account, *texts)
+
+    def _submit(self, layer, layer_state, pending):
+        """Write pending requests to batch files of at most max_requests, submitting each; False if there were none."""
+        layer_state['rounds'] += 1
+        part, count, f, path = 0, 0, None, None
+        for custom_id, params in pending:
+            if f is None:
+                path = os.path.join(self.state_dir, f"{layer}.{layer_state['rounds']}.{part}.input.jsonl")
+                f = open(path, 'w', encoding='utf-8')
+            f.write(json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT, 'body': params}) + '\n')
+            count += 1
+            if count == self.max_requests:
+                f.close()
+                self._submit_file(layer, layer_state, path, count)
+                part, count, f = part + 1, 0, None
+        if f is not None:
+            f.close()
+            self._submit_file(layer, layer_state, path, count)
+        return bool(layer_state['open'])
+
+    def _submit_file(self, layer, layer_state, path, count):
+        batch_id = self.backend.submit(path)
+        logging.info(f"Submitted batch {batch_id} with {count} {layer} requests from {path}")
+        # Saved right away, so a restart polls this batch instead of sending its requests again
+        layer_state['open'].append({'id': batch_id, 'input': path})
+        self._save()
+        self.submitted += count
+        self.batches += 1
+
+    def _wait(self, layer, batch_id):
+        last = None
+        while True:
+            status, done, total = self.backend.status(batch_id)
+            if status != last:
+                logging.info(f"Batch {batch_id} ({layer}): {status}, {done} of {total} requests")
+                last = status
+            if status in FINISHED_STATUSES:
+                return status
+            time.sleep(self.poll_seconds)
+
+    def _collect(self, batch):
+        """A reply record per request of a finished batch; requests it has no line for count as failed."""
+        with open(batch['input'], encoding='utf-8') as f:
+            missing = {json.loads(line)['custom_id'] for line in f}
+        for line in self.backend.results(batch['id']):
+            custom_id = line['custom_id']
+            if custom_id not in missing:
+                continue
+            missing.discard(custom_id)
+            yield self._reply_record(custom_id, line)
+        for custom_id in sorted(missing):
+            yield {'custom_id': custom_id, 'texts': None, 'error': f"No reply from batch {batch['id']}"}
+
+    def _reply_record(self, custom_id, line):
+        stage, _, account_id = custom_id.partition(':')
+        response = line.get('response') or {}
+        if line.get('error') or response.get('status_code') != 200:
+            error = line.get('error') or response.get('body', {}).get('error') or {}
+            return {'custom_id': custom_id, 'texts': None,
+                    'error': f"Batch request failed ({response.get('status_code')}): {error.get('message', error)}"}
+        completion = ChatCompletion.model_validate(response['body'])
+        # Batch jobs have no per-request latency
+        self.interface.usage.record(stage, completion.model, completion, 0.0, account_id=account_id)
+        texts = [choice.message.content or "" for choice in completion.choices]
+        try:
+            self.interface.stage_result(stage, texts)
+        except IndexError as e:
+            return {'custom_id': custom_id, 'texts': None, 'error': str(e)}
+        return {'custom_id': custom_id, 'texts': texts, 'error': None}
+
+    def _result(self, account, replies):
+        result = new_result(account)
+        for _, stages in LAYERS:
+            for stage in stages:
+                record = replies.get(f"{stage}:{account.account_id}")
+                if record is None or record['error']:
+                    result['error'] = record['error'] if record else f"{stage} stage was not reached"
+                    logging.error(f"Error analyzing account @{account.username}: {result['error']}")
+                    return result
+                if stage != 'judge':
+                    result['stages'][stage] = record['texts'][0]
+        result['prediction'] = record_verdict(self.interface.stage_result('judge', record['texts']), result)
+        return result
+
+    def _save(self):
+        with open(self._state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(self._state_path + '.tmp', self._state_path)
+
+def batch_debate_from_env(interface, journal_path, resume=False):
+    """The batch engine described by the BATCH_* settings, keeping its state next to the journal by default."""
+    backend_name = os.getenv("BATCH_BACKEND", "openai").lower()
+    state_dir = os.getenv("BATCH_DIR") or os.path.splitext(journal_path)[0] + "_batches"
+    if backend_name == "local":
+        backend = LocalBatchBackend(os.path.join(state_dir, "local_endpoint"))
+    elif backend_name == "openai":
+        backend = OpenAIBatchBackend(interface.client, os.getenv("BATCH_COMPLETION_WINDOW", "24h"))
+    else:
+        raise ValueError(f"Batch backend must be openai or local, got {backend_name!r}")
+    return BatchDebate(interface, backend, state_dir,
+                       poll_seconds=float(os.getenv("BATCH_POLL_SECONDS", 30)),
+                       retries=interface.resilience.retries,
+                       max_requests=int(os.getenv("BATCH_MAX_REQUESTS", 50_000)), resume=resume)
@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+import multiprocessing
+from .mock_openai_server import MockOpenAIServer
+
+ROBUST_COLUMNS = ['username', 'handle', 'description', 'location', 'webpage', 'joined', 'following',
+                  'followers', 'tweet1', 'tweet2', 'tweet3', 'tweet4', 'tweet5', 'is_bot']
+
+_WORDS = ("data model launch coffee paper deadline thread weekend research team code release "
+          "giveaway crypto follow retweet airdrop news update python review").split()
+
+def write_synthetic_dataset(path, rows, seed=0, farm_fraction=0.0, farms=20):
+    """Write a robust-layout CSV of synthetic accounts, roughly half of them bots.
+
+    With farm_fraction, that share of the accounts belongs to one of a few bot
+    farms that post the same templated tweets under numbered handles.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    templates = [[" ".join(random.Random(f"{seed}:{farm}:{t}").choices(_WORDS, k=12)) + " {n}" for t in range(5)]
+                 for farm in range(farms)]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ROBUST_COLUMNS)
+        for i in range(rows):
+            if rng.random() < farm_fraction:
+                farm = rng.randrange(farms)
+                writer.writerow([
+                    f"Farm {farm} Member {i}", f"farm{farm}_{i}", "Follow for daily giveaways", "", "",
+                    "March 2024", rng.randint(2000, 5000), rng.randint(0, 50),
+                    *[template.format(n=rng.randint(1, 999)) for template in templates[farm]], "1"])
+                continue
+            is_bot = rng.random() < 0.5
+            tweets = [" ".join(rng.choices(_WORDS, k=rng.randint(6, 16))) for _ in range(5)]
+            writer.writerow([
+                f"Synthetic User {i}", f"synthetic_{i}", " ".join(rng.choices(_WORDS, k=8)),
+                rng.choice(["Berlin", "Lagos", "Austin, TX", ""]), "" if is_bot else f"user{i}.example",
+                f"{rng.choice(['January', 'May', 'October'])} {rng.randint(2008, 2024)}",
+                rng.randint(0, 5000), rng.randint(0, 50000), *tweets, "1" if is_bot else "0"])
+
+def synthetic_dataset(directory, rows, seed=0, farm_fraction=0.0):
+    """Path of a cached synthetic dataset with the given size, generating it on first use."""
+    farm_suffix = f"_farms{farm_fraction:g}" if farm_fraction else ""
+    path = os.path.join(directory, f"synthetic_{rows}_{seed}{farm_suffix}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {rows} synthetic accounts in {path}")
+        write_synthetic_dataset(path + ".tmp", rows, seed, farm_fraction)
+        os.replace(path + ".tmp", path)
+    return path
+
+def run_config(dataset_path, base_url, engine, max_workers, debate_mode, limit=None, judge_streaming='off'):
+    """Run the detection pipeline over the dataset against base_url and measure it.
+
+    Uses the same entry points as main(): process_account behind submit_bounded
+    for the threads engine, run_accounts for the async engine.
+    """
+    from .debate_engine import run_accounts
+    from .main import process_account, submit_bounded
+    from .openai_interface import RobustOpenAIInterface
+    from .rate_limiter import RateLimiter
+    from .resilience import resilience_from_env
+    from .robust_dataset_reader import iter_robust_dataset
+    from .usage_metrics import LatencyHistogram
+    logging.getLogger().setLevel(logging.ERROR)  # Per-account INFO logging would dominate the profile
+
+    # The limiter only absorbs injected 429s; its window starts wide open
+    limiter = RateLimiter(max_concurrency=10_000, initial_concurrency=10_000)
+    interface = RobustOpenAIInterface("benchmark", "mock-model", 0.0, rate_limiter=limiter, base_url=base_url,
+                                      judge_streaming=judge_streaming, resilience=resilience_from_env())
+    accounts = iter_robust_dataset(dataset_path, limit)
+    latency = LatencyHistogram()
+    counts = {'accounts': 0, 'errors': 0}
+
+    def collect(result):
+        interface.usage.pop_account(result['account_id'])
+        latency.observe(result['elapsed'])
+        counts['accounts'] += 1
+        counts['errors'] += result['error'] is not None
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    if engine == "async":
+        asyncio.run(run_accounts(accounts, interface, max_workers, collect, debate_mode))
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            process = partial(process_account, openai_interface=interface, debate_mode=debate_mode)
+            for result in submit_bounded(executor, process, accounts, 2 * max_workers):
+                collect(result)
+        interface.wait_background()
+    wall_time = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    calls = sum(row['calls'] for row in interface.usage.summary())
+    return {
+        'engine': engine,
+        'max_workers': max_workers,
+        'debate_mode': debate_mode,
+        'accounts': counts['accounts'],
+        'errors': counts['errors'],
+        'calls': calls,
+        'retries': limiter.retries,
+        'stage_retries': sum(row['retries'] for row in interface.resilience.summary()),
+        'hedges': sum(row['hedges'] for row in interface.resilience.summary()),
+        'wall_time': wall_time,
+        'accounts_per_sec': counts['accounts'] / wall_time if wall_time else 0.0,
+        'calls_per_sec': calls / wall_time if wall_time else 0.0,
+        'cpu_seconds': (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime),
+        'latency_mean': latency.sum / latency.total if latency.total else 0.0,
+        'latency_p50': latency.percentile(0.50),
+        'latency_p95': latency.percentile(0.95),
+        'latency_p99': latency.percentile(0.99),
+        'peak_rss_mb': usage_after.ru_maxrss * rss_unit / 2 ** 20,
+    }
+
+def run_isolated(*args):
+    """run_config in a fresh process, so peak memory is not inherited from earlier configurations."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_config, *args).result()
+
+def config_key(result):
+    return (result['engine'], result['max_workers'], result['debate_mode'])
+
+def compare_results(current, baseline, tolerance=0.10):
+    """Pair up matching configurations and flag throughput drops larger than tolerance."""
+    previous = {config_key(row): row for row in baseline['results']}
+    comparisons = []
+    for row in current['results']:
+        before = previous.get(config_key(row))
+        if before is None or not before['accounts_per_sec']:
+            continue
+        change = row['accounts_per_sec'] / before['accounts_per_sec'] - 1
+        comparisons.append({
+            'config': config_key(row),
+            'accounts_per_sec': (before['accounts_per_sec'], row['accounts_per_sec']),
+            'latency_p99': (before['latency_p99'], row['latency_p99']),
+            'peak_rss_mb': (before['peak_rss_mb'], row['peak_rss_mb']),
+            'throughput_change': change,
+            'regression': change < -tolerance,
+        })
+    return comparisons
+
+def _int_list(value):
+    return [int(v) for v in value.split(',')]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline throughput against a local mock OpenAI server.")
+    parser.add_argument("--accounts", type=int, default=10_000, help="synthetic dataset size")
+    parser.add_argument("--engines", default="threads,async")
+    parser.add_argument("--workers", type=_int_list, default=[8, 32, 128],
+                        help="comma-separated MAX_WORKERS (threads) / MAX_CONCURRENT_ACCOUNTS (async) values")
+    parser.add_argument("--modes", default="full", help="comma-separated debate modes")
+    parser.add_argument("--latency", default="lognormal:0.05,0.5",
+                        help="mock latency distribution: fixed:S, uniform:A,B or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="fraction answered with 500")
+    parser.add_argument("--judge-streaming", default="off", choices=["off", "cancel", "background"],
+                        help="stream the judge and stop reading once its classification line parses")
+    parser.add_argument("--farm-fraction", type=float, default=0.0,
+                        help="share of synthetic accounts that belong to templated bot farms")
+    parser.add_argument("--data-dir", default="benchmarks/data")
+    parser.add_argument("--output", default=None, help="results JSON (default: benchmarks/results_<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="throughput drop versus the baseline that counts as a regression")
+    args = parser.parse_args(argv)
+
+    dataset_path = synthetic_dataset(args.data_dir, args.accounts, farm_fraction=args.farm_fraction)
+    output = args.output or f'benchmarks/results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'accounts': args.accounts, 'farm_fraction': args.farm_fraction,
+                     'judge_streaming': args.judge_streaming,
+                     'latency': args.latency, 'error_rate': args.error_rate,
+                     'server_error_rate': args.server_error_rate},
+        'results': [],
+    }
+
+    print(f"{'Engine':<9}{'Workers':>8}{'Mode':>9}{'Acc/s':>10}{'Calls/s':>10}{'p50 s':>8}{'p95 s':>8}"
+          f"{'p99 s':>8}{'RSS MB':>9}{'Errors':>8}")
+    with MockOpenAIServer(latency=args.latency, error_rate=args.error_rate,
+                          server_error_rate=args.server_error_rate, seed=0) as server:
+        for mode in args.modes.split(','):
+            for engine in args.engines.split(','):
+                for workers in args.workers:
+                    row = run_isolated(dataset_path, server.base_url, engine, workers, mode, None,
+                                       args.judge_streaming)
+                    report['results'].append(row)
+                    print(f"{engine:<9}{workers:>8}{mode:>9}{row['accounts_per_sec']:>10.1f}"
+                          f"{row['calls_per_sec']:>10.1f}{row['latency_p50']:>8.2f}{row['latency_p95']:>8.2f}"
+                          f"{row['latency_p99']:>8.2f}{row['peak_rss_mb']:>9.1f}{row['errors']:>8}")
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            comparisons = compare_results(report, json.load(f), args.tolerance)
+        print(f"\nCompared with {args.baseline}:")
+        for c in comparisons:
+            before, after = c['accounts_per_sec']
+            flag = "  REGRESSION" if c['regression'] else ""
+            print(f"{'/'.join(map(str, c['config'])):<24}{before:>10.1f} -> {after:<10.1f}"
+                  f"{c['throughput_change']:>+8.1%}{flag}")
+        if any(c['regression'] for c in comparisons):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
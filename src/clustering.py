@@ -0,0 +1,200 @@
+import logging
+import os
+import re
+import zlib
+import numpy as np
+from .journal import new_result
+
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_MENTION = re.compile(r"@\w+")
+_NUMBER = re.compile(r"\d+")
+_WORD = re.compile(r"[\w#@']+")
+
+def normalize_text(text):
+    """Lower-case text with URLs, mentions and numbers collapsed, so templated posts look identical."""
+    text = _URL.sub(" url ", text.lower())
+    text = _MENTION.sub(" @user ", text)
+    return _NUMBER.sub("0", text)
+
+def handle_pattern(handle):
+    """Handle with digit runs collapsed: bot farms register crypto_fan123, crypto_fan982, ..."""
+    return _NUMBER.sub("#", handle.lower())
+
+def account_shingles(account, size=3):
+    """Word shingles over an account's posts and profile, plus its handle pattern."""
+    if hasattr(account, 'tweets'):
+        texts = list(account.tweets) + [account.description]
+        shingles = {"handle:" + handle_pattern(account.handle)}
+    else:
+        texts = [account.tweet]
+        shingles = {"tag:" + tag.strip().lower() for tag in account.hashtags if tag.strip()}
+    # Normalize every text in one pass; the separator keeps shingles from spanning two posts
+    for text in normalize_text(" \n ".join(t for t in texts if t)).split("\n"):
+        words = _WORD.findall(text)
+        if len(words) < size:
+            if words:
+                shingles.add(" ".join(words))
+            continue
+        shingles.update(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return shingles or {"id:" + account.account_id}  # Empty profiles only match themselves
+
+class MinHasher:
+    """MinHash signatures for many shingle sets at once, vectorized over NumPy arrays."""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # Multiply-shift hashing: (a * x + b) wraps modulo 2**64 and the high 32 bits are kept
+        self.a = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def signatures(self, shingle_sets, batch_shingles=100_000):
+        """One row of num_perm minimum hashes per shingle set."""
+        signatures = np.empty((len(shingle_sets), self.num_perm), dtype=np.uint32)
+        start = 0
+        while start < len(shingle_sets):
+            # Take whole sets until the batch holds about batch_shingles shingles
+            end, total = start, 0
+            while end < len(shingle_sets) and (total == 0 or total + len(shingle_sets[end]) <= batch_shingles):
+                total += len(shingle_sets[end])
+                end += 1
+            batch = shingle_sets[start:end]
+            hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for shingles in batch for s in shingles),
+                                 dtype=np.uint64, count=total)
+            offsets = np.cumsum([0] + [len(shingles) for shingles in batch[:-1]])
+            permuted = (hashes[:, None] * self.a + self.b) >> np.uint64(32)
+            signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=0)
+            start = end
+        return signatures
+
+def lsh_parameters(num_perm, threshold):
+    """(bands, rows) whose S-curve midpoint (1/bands)^(1/rows) is closest to the threshold."""
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+def cluster_signatures(signatures, threshold):
+    """Group rows whose estimated Jaccard similarity reaches threshold.
+
+    LSH banding proposes candidates that share a band; each candidate is then
+    checked against its bucket's first member before the two are joined.
+    Returns a cluster label per row.
+    """
+    count, num_perm = signatures.shape
+    bands, rows = lsh_parameters(num_perm, threshold)
+    parent = np.arange(count)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows]).view(f"V{4 * rows}").ravel()
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], count]
+        shared = ends - starts > 1  # Most buckets hold a single account; skip them without a Python loop
+        for start, end in zip(starts[shared], ends[shared]):
+            bucket = order[start:end]
+            anchor = bucket[0]
+            similarity = (signatures[bucket[1:]] == signatures[anchor]).mean(axis=1)
+            for member in bucket[1:][similarity >= threshold]:
+                root_a, root_b = find(anchor), find(member)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+    return np.array([find(i) for i in range(count)])
+
+class FarmClusters:
+    """Near-duplicate account clusters with verdict sharing.
+
+    Only the first sample_size members of each cluster are debated. Once they
+    have all finished, share() turns their majority verdict into results for
+    the remaining members, recording which accounts it came from.
+    """
+
+    def __init__(self, accounts, labels, signatures, sample_size=1):
+        self.accounts = accounts
+        self.sample_size = sample_size
+        self._members = {}
+        for index, label in enumerate(labels):
+            self._members.setdefault(int(label), []).append(index)
+        self._cluster_of = {}
+        self._pending = {}
+        self._verdicts = {}
+        for cluster_id, members in self._members.items():
+            for index in members:
+                self._cluster_of[accounts[index].account_id] = cluster_id
+            self._pending[cluster_id] = len(members[:sample_size])
+        self._signatures = signatures
+        self.shared = 0
+
+    @property
+    def cluster_count(self):
+        return len(self._members)
+
+    @property
+    def farm_sizes(self):
+        return sorted((len(m) for m in self._members.values() if len(m) > 1), reverse=True)
+
+    def to_debate(self):
+        """Sampled members of every cluster, in dataset order."""
+        sampled = sorted(index for members in self._members.values() for index in members[:self.sample_size])
+        return [self.accounts[index] for index in sampled]
+
+    def share(self, result):
+        """Annotate a debated result and, once its cluster's sample is complete, return results for the rest."""
+        cluster_id = self._cluster_of.get(result['account_id'])
+        if cluster_id is None:
+            return []
+        members = self._members[cluster_id]
+        if len(members) == 1:
+            return []
+        result['cluster'] = {'id': cluster_id, 'size': len(members), 'role': 'sampled'}
+        self._verdicts.setdefault(cluster_id, []).append(result)
+        self._pending[cluster_id] -= 1
+        if self._pending[cluster_id]:
+            return []
+
+        sampled = self._verdicts.pop(cluster_id)
+        valid = [r for r in sampled if not r['error']]
+        prediction = int(2 * sum(r['prediction'] for r in valid) > len(valid)) if valid else 0
+        sources = [r['account_id'] for r in sampled]
+        anchor = self._signatures[members[0]]
+        shared = []
+        for index in members[self.sample_size:]:
+            record = new_result(self.accounts[index])
+            record['prediction'] = prediction
+            record['decided_by'] = 'cluster'
+            record['cluster'] = {
+                'id': cluster_id, 'size': len(members), 'role': 'shared', 'sources': sources,
+                'similarity': float((self._signatures[index] == anchor).mean()),
+            }
+            if not valid:
+                record['error'] = "Every debated member of the cluster failed"  # Retried on --resume
+            shared.append(record)
+        self.shared += len(shared)
+        return shared
+
+def cluster_accounts(accounts, threshold=0.8, sample_size=1, num_perm=128):
+    """Cluster a list of accounts into near-duplicate groups ready for verdict sharing."""
+    signatures = MinHasher(num_perm).signatures([account_shingles(account) for account in accounts])
+    labels = cluster_signatures(signatures, threshold) if len(accounts) else np.zeros(0, dtype=int)
+    clusters = FarmClusters(accounts, labels, signatures, sample_size)
+    logging.info(f"Clustered {len(accounts)} accounts into {clusters.cluster_count} clusters; "
+                 f"largest farms: {clusters.farm_sizes[:5]}")
+    return clusters
+
+def clusters_from_env(accounts):
+    """Cluster the accounts if CLUSTER_ACCOUNTS is on, else return None without reading them.
+
+    Clustering needs every account at once, so the stream is read into memory.
+    """
+    if os.getenv("CLUSTER_ACCOUNTS", "false").lower() != "true":
+        return None
+    return cluster_accounts(
+        list(accounts),
+        threshold=float(os.getenv("CLUSTER_THRESHOLD", 0.8)),
+        sample_size=int(os.getenv("CLUSTER_SAMPLE_SIZE", 1)),
+    )
@@ -1,12 +1,15 @@
 import csv
+from itertools import islice
+import pandas as pd
+from .account_store import CHUNK_ROWS, TwitterAccountStore, avg_daily_retweets
 from .twitter_account import TwitterAccount
 
-def read_dataset(filepath, limit=None):
-    accounts = []
+def iter_dataset(filepath, limit=None):
+    """Yield accounts one row at a time, stopping after limit rows."""
     with open(filepath, mode='r', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
-        for row in reader:
-            account = TwitterAccount(
+        for row in islice(reader, limit):
+            yield TwitterAccount(
                 user_id=int(row['User ID']),
                 username=row['Username'],
                 tweet=row['Tweet'],
@@ -19,5 +22,28 @@ def read_dataset(filepath, limit=None):
                 created_at=row['Created At'],
                 hashtags=row['Hashtags']
             )
-            accounts.append(account)
-    return accounts[:limit] if limit else accounts
\ No newline at end of file
+
+def read_dataset(filepath, limit=None):
+    return list(iter_dataset(filepath, limit))
+
+def read_dataset_columnar(filepath, limit=None, chunk_size=CHUNK_ROWS):
+    """Load the dataset in bulk into a TwitterAccountStore, deriving avg_daily_retweets per chunk."""
+    chunks = pd.read_csv(filepath, nrows=limit, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    return TwitterAccountStore.from_chunks(_standard_columns(frame) for frame in chunks)
+
+def _standard_columns(frame):
+    retweet_counts = frame['Retweet Count'].astype('int64').to_numpy()
+    return dict(
+        user_id=frame['User ID'].astype('int64').to_numpy(),
+        username=frame['Username'],
+        tweet=frame['Tweet'],
+        retweet_count=retweet_counts,
+        mention_count=frame['Mention Count'].astype('int64').to_numpy(),
+        follower_count=frame['Follower Count'].astype('int64').to_numpy(),
+        verified=(frame['Verified'].str.strip().str.lower() == 'true').to_numpy(),
+        bot_label=frame['Bot Label'].astype('int64').to_numpy(),
+        location=frame['Location'],
+        created_at=frame['Created At'],
+        hashtags=frame['Hashtags'],
+        avg_daily_retweets=avg_daily_retweets(retweet_counts, frame['Created At'])
+    )
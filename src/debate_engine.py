@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+from .adaptive_debate import AdaptiveDebatePolicy, SKIPPED_CRITIQUE, combine_rounds, parse_bot_probability
+from .journal import new_result
+from . import tracing
+
+def record_compact_debate(debate, stages):
+    """Store a compact debate under the stage names the full debate uses and return its label."""
+    stages['bot_agent'] = debate['bot_arguments']
+    stages['human_agent'] = debate['human_arguments']
+    stages['bot_critic'] = debate['bot_critique']
+    stages['human_critic'] = debate['human_critique']
+    stages['judge'] = f"{debate['analysis']}\n**Classification:** {debate['classification']}"
+    return debate['prediction']
+
+def record_verdict(verdict, result):
+    """Store the judge's verdict in a result record and return its label.
+
+    With several judge samples the vote share and individual votes are kept too.
+    """
+    result['stages']['judge'] = verdict['text']
+    if len(verdict['votes']) > 1:
+        result['judge_confidence'] = verdict['confidence']
+        result['judge_votes'] = verdict['votes']
+    return verdict['prediction']
+
+async def process_account_async(account, openai_interface, debate_mode="full", policy=None):
+    """Run one account's debate as a dependency graph on the event loop.
+
+    The two opening arguments are independent, and each critique only needs the
+    opposing opening, so the five calls take three round trips instead of five.
+    """
+    result = new_result(account)
+    start = time.perf_counter()
+    with tracing.span("account", "account", account_id=account.account_id):
+        try:
+            stages = result['stages']
+
+            if debate_mode == "compact":
+                # One structured request covers every stage
+                debate = await openai_interface.aget_compact_debate(account)
+                classification = record_compact_debate(debate, stages)
+            elif debate_mode == "adaptive":
+                classification = await run_adaptive_debate_async(
+                    account, openai_interface, policy or AdaptiveDebatePolicy(), result)
+            else:
+                # Get initial arguments
+                stages['bot_agent'], stages['human_agent'] = await asyncio.gather(
+                    openai_interface.aget_bot_agent_arguments(account),
+                    openai_interface.aget_human_agent_arguments(account))
+
+                # Get critiques
+                stages['bot_critic'], stages['human_critic'] = await asyncio.gather(
+                    openai_interface.aget_bot_critic_response(account, stages['human_agent']),
+                    openai_interface.aget_human_critic_response(account, stages['bot_agent']))
+
+                # Get final judgment
+                classification = record_verdict(await openai_interface.aget_final_verdict(
+                    account, stages['bot_agent'], stages['human_agent'], stages['bot_critic'], stages['human_critic']), result)
+
+            result['prediction'] = classification
+            logging.info(f"Account @{account.username} classified as {'Bot' if classification else 'Human'}")
+        except Exception as e:
+            logging.error(f"Error analyzing account @{account.username}: {str(e)}")
+            result['error'] = str(e)  # Prediction stays Human in case of error
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+async def run_adaptive_debate_async(account, openai_interface, policy, result):
+    """Async counterpart of main.run_adaptive_debate; both sides of each round run concurrently."""
+    stages = result['stages']
+    stages['bot_agent'], stages['human_agent'] = await asyncio.gather(
+        openai_interface.aget_bot_agent_arguments(account, with_confidence=True),
+        openai_interface.aget_human_agent_arguments(account, with_confidence=True))
+    path, classification = policy.route(parse_bot_probability(stages['bot_agent']),
+                                        parse_bot_probability(stages['human_agent']))
+    result['debate_path'] = path
+    result['calls'] = policy.calls(path)
+    if path == 'early_exit' and policy.skip_judge:
+        return classification
+
+    if path == 'early_exit':
+        stages['bot_critic'] = stages['human_critic'] = SKIPPED_CRITIQUE
+    else:
+        bot_critiques, human_critiques = [], []
+        human_side, bot_side = stages['human_agent'], stages['bot_agent']
+        for _ in range(1 + (policy.extra_rounds if path == 'extended' else 0)):
+            bot_side, human_side = await asyncio.gather(
+                openai_interface.aget_bot_critic_response(account, human_side),
+                openai_interface.aget_human_critic_response(account, bot_side))
+            bot_critiques.append(bot_side)
+            human_critiques.append(human_side)
+        stages['bot_critic'] = combine_rounds(bot_critiques)
+        stages['human_critic'] = combine_rounds(human_critiques)
+
+    return record_verdict(await openai_interface.aget_final_verdict(
+        account, stages['bot_agent'], stages['human_agent'], stages['bot_critic'], stages['human_critic']), result)
+
+async def run_accounts(accounts, openai_interface, max_concurrency, on_result, debate_mode="full", policy=None):
+    """Debate every account on one event loop, keeping at most max_concurrency accounts in flight.
+
+    A fixed pool of worker coroutines pulls from the accounts iterable, so a
+    streaming reader is consumed only as fast as accounts finish. on_result is
+    called with each result record as soon as its account is done.
+    """
+    accounts = iter(accounts)
+
+    async def worker():
+        for account in accounts:
+            on_result(await process_account_async(account, openai_interface, debate_mode, policy))
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+    finally:
+        await openai_interface.aclose()
@@ -0,0 +1,135 @@
+import csv
+import json
+import logging
+import os
+import threading
+import time
+
+def new_result(account):
+    """Start the per-account result record that process_account fills in and the journal stores."""
+    return {
+        'account_id': account.account_id,
+        'username': account.username,
+        'true_label': int(account.bot_label),
+        'prediction': 0,
+        'decided_by': 'debate',
+        'stages': {},
+        'elapsed': 0.0,
+        'error': None,
+    }
+
+class ResultJournal:
+    """Append-only JSONL journal with one line per finished account.
+
+    Each line is flushed and fsynced as soon as its account completes, so a
+    crash or Ctrl-C loses at most the accounts still in flight. Reopening the
+    same file with resume=True keeps the earlier lines and reports which
+    accounts are already done.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not resume and os.path.exists(path) and os.path.getsize(path) > 0:
+            raise FileExistsError(f"Journal {path} already exists; pass --resume to continue it")
+        self._file = open(path, 'a', encoding='utf-8')
+        if self._file.tell() > 0 and not _ends_with_newline(path):
+            self._file.write('\n')  # Terminate a line torn by the previous crash
+        logging.info(f"Writing results journal to {path}")
+
+    def completed_ids(self):
+        """IDs of accounts that already have an error-free result in the journal."""
+        return {record['account_id'] for record in iter_results(self.path) if not record.get('error')}
+
+    def append(self, result):
+        line = json.dumps({**result, 'recorded_at': time.time()}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def append_stage_text(self, account_id, stage, text):
+        """Record a stage text that finished after its account's result, such as a judge reply drained in the background.
+
+        read_journal folds it into the account's record.
+        """
+        self.append({'account_id': account_id, 'kind': 'stage_text', 'stage': stage, 'text': text})
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class PredictionSink:
+    """CSV with one line per finished account: its ID, username, prediction, true label and how it was decided.
+
+    Lines are flushed as accounts finish but not fsynced; the journal stays
+    the durable record, this is the compact one for downstream consumers.
+    """
+
+    FIELDS = ('account_id', 'username', 'prediction', 'true_label', 'decided_by')
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        if self._file.tell() == 0:
+            self._writer.writerow(self.FIELDS)
+
+    def append(self, result):
+        row = [result['account_id'], result['username'], result['prediction'], result['true_label'],
+               result.get('decided_by', 'debate')]
+        with self._lock:
+            self._writer.writerow(row)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+def iter_journal(path):
+    """Yield every line of a journal in order, skipping a line torn by a crash mid-write."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping unreadable line {line_number} in {path}")
+
+def iter_results(path):
+    """Yield the account results of a journal in order, one at a time, without late stage texts.
+
+    An account retried after an error appears once per attempt.
+    """
+    return (record for record in iter_journal(path) if record.get('kind') != 'stage_text')
+
+def read_journal(path):
+    """Return the latest record per account, skipping a line torn by a crash mid-write.
+
+    Late stage texts replace the matching stage in their account's record.
+    """
+    records = {}
+    late_texts = []
+    for record in iter_journal(path):
+        if record.get('kind') == 'stage_text':
+            late_texts.append(record)
+            continue
+        records[record['account_id']] = record
+    for late in late_texts:
+        record = records.get(late['account_id'])
+        if record is not None and late['stage'] in record['stages']:
+            record['stages'][late['stage']] = late['text']
+    return list(records.values())
@@ -1,105 +1,465 @@
+import argparse
+import asyncio
 import logging
 import os
 import time
 from dotenv import load_dotenv
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from .dataset_reader import read_dataset
-from .robust_dataset_reader import read_robust_dataset
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from itertools import islice
+from .account_store import AccountStore
+from .dataset_reader import iter_dataset, read_dataset_columnar
+from .robust_dataset_reader import iter_robust_dataset, read_robust_dataset_columnar
 from .openai_interface import OpenAIInterface, RobustOpenAIInterface
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from .adaptive_debate import (AdaptiveDebatePolicy, SKIPPED_CRITIQUE, adaptive_policy_from_env, combine_rounds,
+                              parse_bot_probability)
+from .debate_engine import record_compact_debate, record_verdict, run_accounts
+from .batch_debate import batch_debate_from_env
+from .response_cache import response_cache_from_env
+from .rate_limiter import rate_limiter_from_env
+from .journal import PredictionSink, ResultJournal, iter_results, new_result
+from .pre_classifier import pre_classifier_from_env
+from .clustering import clusters_from_env
+from .verdict_index import verdict_index_from_env
+from .token_budget import token_budget_from_env
+from .resilience import resilience_from_env
+from .model_routing import stage_models_from_env
+from . import tracing
+from .metrics import RunMetrics
+from .sharding import filter_shard, parse_shard, shard_suffix, summary_path, write_summary
 from tqdm import tqdm  # Add this import
 
-# Configure logging to output to a file
-logging.basicConfig(
-    filename=f'logs/bot_detector_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log',
-    filemode='w',  # Overwrite the log file each time
-    level=logging.DEBUG,  # Set to DEBUG to capture all messages
-    format='%(asctime)s %(levelname)s:%(message)s'
-)
+def configure_logging(shard=None):
+    """Log to a file per run (and per shard), replacing handlers installed by imported modules."""
+    suffix = shard_suffix(shard) if shard else ''
+    os.makedirs('logs', exist_ok=True)
+    logging.basicConfig(
+        filename=f'logs/bot_detector_{datetime.now().strftime("%Y%m%d_%H%M%S")}{suffix}.log',
+        filemode='w',  # Overwrite the log file each time
+        level=logging.DEBUG,  # Set to DEBUG to capture all messages
+        format='%(asctime)s %(levelname)s:%(message)s',
+        force=True
+    )
 
-def process_account(account, openai_interface):
-    try:
-        account_details = account.get_account_details()
-        true_label = account.bot_label
+def process_account(account, openai_interface, debate_mode="full", policy=None):
+    result = new_result(account)
+    start = time.perf_counter()
+    with tracing.span("account", "account", account_id=account.account_id):
+        try:
+            stages = result['stages']
+
+            if debate_mode == "compact":
+                # One structured request covers every stage
+                debate = openai_interface.get_compact_debate(account)
+                classification = record_compact_debate(debate, stages)
+            elif debate_mode == "adaptive":
+                classification = run_adaptive_debate(account, openai_interface, policy or AdaptiveDebatePolicy(), result)
+            else:
+                # Get initial arguments
+                stages['bot_agent'] = openai_interface.get_bot_agent_arguments(account)
+                stages['human_agent'] = openai_interface.get_human_agent_arguments(account)
+
+                # Get critiques
+                stages['bot_critic'] = openai_interface.get_bot_critic_response(account, stages['human_agent'])
+                stages['human_critic'] = openai_interface.get_human_critic_response(account, stages['bot_agent'])
+
+                # Get final judgment
+                classification = record_verdict(openai_interface.get_final_verdict(
+                    account, stages['bot_agent'], stages['human_agent'], stages['bot_critic'], stages['human_critic']), result)
+
+            result['prediction'] = classification
+            logging.info(f"Account @{account.username} classified as {'Bot' if classification else 'Human'}")
+        except Exception as e:
+            logging.error(f"Error analyzing account @{account.username}: {str(e)}")
+            result['error'] = str(e)  # Prediction stays Human in case of error
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+def run_adaptive_debate(account, openai_interface, policy, result):
+    """Openings with confidence scores, then only as much debate as their agreement calls for."""
+    stages = result['stages']
+    stages['bot_agent'] = openai_interface.get_bot_agent_arguments(account, with_confidence=True)
+    stages['human_agent'] = openai_interface.get_human_agent_arguments(account, with_confidence=True)
+    path, classification = policy.route(parse_bot_probability(stages['bot_agent']),
+                                        parse_bot_probability(stages['human_agent']))
+    result['debate_path'] = path
+    result['calls'] = policy.calls(path)
+    if path == 'early_exit' and policy.skip_judge:
+        return classification
+
+    if path == 'early_exit':
+        stages['bot_critic'] = stages['human_critic'] = SKIPPED_CRITIQUE
+    else:
+        # Each round answers the other side's latest text; extended debates hold extra rounds
+        bot_critiques, human_critiques = [], []
+        human_side, bot_side = stages['human_agent'], stages['bot_agent']
+        for _ in range(1 + (policy.extra_rounds if path == 'extended' else 0)):
+            bot_side, human_side = (openai_interface.get_bot_critic_response(account, human_side),
+                                    openai_interface.get_human_critic_response(account, bot_side))
+            bot_critiques.append(bot_side)
+            human_critiques.append(human_side)
+        stages['bot_critic'] = combine_rounds(bot_critiques)
+        stages['human_critic'] = combine_rounds(human_critiques)
+
+    return record_verdict(openai_interface.get_final_verdict(
+        account, stages['bot_agent'], stages['human_agent'], stages['bot_critic'], stages['human_critic']), result)
+
+def submit_bounded(executor, fn, items, max_in_flight):
+    """Submit fn(item) for each item, never holding more than max_in_flight futures.
 
-        # Get initial arguments
-        bot_args = openai_interface.get_bot_agent_arguments(account_details)
-        human_args = openai_interface.get_human_agent_arguments(account_details)
+    Yields results as they complete, so items are pulled from a streaming reader
+    only as fast as the workers free up.
+    """
+    pending = set()
+    for item in items:
+        pending.add(executor.submit(fn, item))
+        if len(pending) >= max_in_flight:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    for future in as_completed(pending):
+        yield future.result()
 
-        # Get critiques
-        bot_critique = openai_interface.get_bot_critic_response(account_details, human_args)
-        human_critique = openai_interface.get_human_critic_response(account_details, bot_args)
+def load_accounts(dataset_path, limit, use_robust, account_store):
+    """Accounts to evaluate: streamed from the CSV, or row views over a columnar store.
 
-        # Get final judgment
-        final_classification = openai_interface.get_final_classification(
-            account_details, bot_args, human_args, bot_critique, human_critique)
-        classification = openai_interface.get_classification_result_from_text(final_classification)
+    A directory is a store saved with python -m src.account_store and is
+    memory-mapped rather than read. Stores are returned whole, so they can be
+    counted before the run.
+    """
+    if os.path.isdir(dataset_path):
+        store = AccountStore.load(dataset_path)
+        return store if limit is None or limit >= len(store) else islice(store, limit)
+    if account_store == "columnar":
+        reader = read_robust_dataset_columnar if use_robust else read_dataset_columnar
+        return reader(dataset_path, limit)
+    return iter_robust_dataset(dataset_path, limit) if use_robust else iter_dataset(dataset_path, limit)
 
-        logging.info(f"Account @{account.username} classified as {'Bot' if classification else 'Human'}")
-        return true_label, classification
-    except Exception as e:
-        logging.error(f"Error analyzing account @{account.username}: {str(e)}")
-        return true_label, 0  # Default to Human in case of error
+def accounts_to_score(accounts, shard, completed):
+    """Lazily keep the accounts of the shard that an earlier run has not completed."""
+    if shard:
+        # Every shard reads the same rows and keeps its own deterministic subset
+        accounts = filter_shard(accounts, *shard)
+    return (account for account in accounts if account.account_id not in completed)
 
-def main():
+def progress_total(accounts, limit, shard, completed):
+    """How many accounts the run will score, or None when a streamed reader cannot know it up front."""
+    if isinstance(accounts, AccountStore):
+        return sum(1 for _ in accounts_to_score(accounts, shard, completed))
+    return None if shard or completed else limit
+
+def temperature_from_env():
+    return float(os.getenv("TEMPERATURE", 0.5))
+
+def interface_from_env(use_robust=True, response_cache=None, rate_limiter=None):
+    """The OpenAI interface described by .env; shared by batch runs and the scoring service."""
+    model_name = os.getenv("MODEL_NAME", "gpt-3.5-turbo")
+    interface_class = RobustOpenAIInterface if use_robust else OpenAIInterface
+    return interface_class(
+        os.getenv("API_KEY"), model_name, temperature_from_env(),
+        cache=response_cache, rate_limiter=rate_limiter,
+        judge_samples=int(os.getenv("JUDGE_SAMPLES", 1)),
+        judge_streaming=os.getenv("JUDGE_STREAMING", "off").lower(),
+        budget=token_budget_from_env(model_name),
+        resilience=resilience_from_env(),
+        stage_models=stage_models_from_env(),
+    )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the multi-agent bot detector on a dataset.")
+    parser.add_argument("--journal", default=os.getenv("RESULTS_JOURNAL"),
+                        help="JSONL file that records every finished account (default: logs/results_<timestamp>.jsonl)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the run recorded in --journal, skipping accounts it already completed")
+    parser.add_argument("--metrics-json", default=os.getenv("USAGE_METRICS_JSON"),
+                        help="write per-stage token, cost and latency metrics to this JSON file")
+    parser.add_argument("--metrics-prom", default=os.getenv("USAGE_METRICS_PROM"),
+                        help="write the same metrics in Prometheus text format")
+    parser.add_argument("--predictions", default=os.getenv("PREDICTIONS_PATH"),
+                        help="CSV of account ID, prediction and true label, appended as each account finishes")
+    parser.add_argument("--shard", type=_shard_arg, default=os.getenv("SHARD") or None,
+                        help="evaluate only shard INDEX/COUNT of the dataset, e.g. 0/4; merge with python -m src.sharding")
+    args = parser.parse_args(argv)
+    if args.resume and not args.journal:
+        parser.error("--resume needs --journal (or RESULTS_JOURNAL) pointing at the run to continue")
+    if isinstance(args.shard, str):
+        args.shard = _shard_arg(args.shard)  # Defaults from the environment are not run through type
+    if not args.journal:
+        suffix = shard_suffix(args.shard) if args.shard else ''
+        args.journal = f'logs/results_{datetime.now().strftime("%Y%m%d_%H%M%S")}{suffix}.jsonl'
+    return args
+
+def _shard_arg(value):
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def main(argv=None):
     # Load environment variables from .env
     load_dotenv()
-    api_key = os.getenv("API_KEY")
-    model_name = os.getenv("MODEL_NAME", "gpt-3.5-turbo")
+    args = parse_args(argv)
+    configure_logging(args.shard)
     limit_samples_dataset = os.getenv("LIMIT_SAMPLES_DATASET")
-    temperature = float(os.getenv("TEMPERATURE", 0.5))
+    limit = int(limit_samples_dataset) if limit_samples_dataset else None
     use_robust = os.getenv("USE_ROBUST", "true").lower() == "true"
+    debate_engine = os.getenv("DEBATE_ENGINE", "threads").lower()
+    debate_mode = os.getenv("DEBATE_MODE", "full").lower()
+    account_store = os.getenv("ACCOUNT_STORE", "stream").lower()
+    response_cache = response_cache_from_env(temperature_from_env())
+    rate_limiter = rate_limiter_from_env()
+    pre_classifier = pre_classifier_from_env()
+    verdict_index = verdict_index_from_env()
+    policy = adaptive_policy_from_env() if debate_mode == "adaptive" else None
+    if debate_engine == "batch" and debate_mode != "full":
+        raise ValueError(f"The batch engine runs the full debate layer by layer; {debate_mode} mode needs "
+                         f"DEBATE_ENGINE=threads or async")
 
     # Initialize appropriate OpenAI interface
+    openai_interface = interface_from_env(use_robust, response_cache, rate_limiter)
+    judge_samples = openai_interface.judge_samples
+    budget = openai_interface.budget
     if use_robust:
-        openai_interface = RobustOpenAIInterface(api_key, model_name, temperature)
         dataset_path = os.getenv("ROBUST_DATASET_PATH", "data/robust_dataset.csv")
-        accounts = read_robust_dataset(dataset_path)
     else:
-        openai_interface = OpenAIInterface(api_key, model_name, temperature)
         dataset_path = os.getenv("DATASET_PATH", "dataset.csv")
-        accounts = read_dataset(dataset_path, int(limit_samples_dataset) if limit_samples_dataset else None)
+    accounts = load_accounts(dataset_path, limit, use_robust, account_store)
 
     logging.info(f"Twitter Bot Detector Started in {'robust' if use_robust else 'standard'} mode")
     print("\nTwitter Bot Detector Performance Evaluation")
     print("==========================================\n")
-    print(f"Using {'robust' if use_robust else 'standard'} mode")
-    print(f"Total accounts to analyze: {len(accounts)}\n")
+    print(f"Using {'robust' if use_robust else 'standard'} mode with the {debate_engine} engine and {debate_mode} debate")
+    if args.shard:
+        print(f"Shard {args.shard[0]} of {args.shard[1]} (accounts hashed by ID)")
+    print(f"Accounts to analyze: {limit if limit else 'entire dataset'} "
+          f"({'columnar store' if account_store == 'columnar' or os.path.isdir(dataset_path) else 'streamed'})")
+
+    journal = ResultJournal(args.journal, resume=args.resume)
+    # Judge replies drained in the background land in the journal after their account's result
+    openai_interface.judge_text_sink = journal.append_stage_text
+    print(f"Results journal: {args.journal}\n")
+    batch = batch_debate_from_env(openai_interface, args.journal, args.resume) if debate_engine == "batch" else None
+    if batch is not None:
+        print(f"Batch jobs: state in {batch.state_dir}, polled every {batch.poll_seconds:g}s\n")
+    trace_path = tracing.tracing_from_env()
+    if trace_path:
+        print(f"Tracing to {trace_path} (open in ui.perfetto.dev or chrome://tracing)\n")
+    predictions = PredictionSink(args.predictions, resume=args.resume) if args.predictions else None
+    # Metrics are folded in as accounts finish, so the run never holds its results in memory
+    run_metrics = RunMetrics()
+    completed = set()
+    if args.resume:
+        for record in iter_results(args.journal):
+            # Failed accounts are scored again in this run and counted then
+            if not record.get('error') and record['account_id'] not in completed:
+                completed.add(record['account_id'])
+                run_metrics.add(record)
+        print(f"Resuming: {len(completed)} accounts already completed\n")
+        logging.info(f"Resuming {args.journal} with {len(completed)} completed accounts")
+    total = progress_total(accounts, limit, args.shard, completed)
+    accounts = accounts_to_score(accounts, args.shard, completed)
 
-    true_labels = []
-    predicted_labels = []
     max_workers = int(os.getenv("MAX_WORKERS", os.cpu_count() or 1))
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(process_account, account, openai_interface): account for account in accounts}
-        for future in tqdm(as_completed(futures), total=len(futures)):
-            true, pred = future.result()
-            true_labels.append(true)
-            predicted_labels.append(pred)
-            time.sleep(0.1)  # Short delay to prevent rapid requests
+    # Accounts are read lazily, so only a bounded number are ever held in memory
+    max_queued = int(os.getenv("MAX_QUEUED_ACCOUNTS", 2 * max_workers))
+
+    run_start = time.perf_counter()
+    try:
+        with tqdm(total=total, unit="acct") as progress:
+            def collect(result):
+                result['usage'] = openai_interface.usage.pop_account(result['account_id'])
+                if result['decided_by'] == 'debate':
+                    openai_interface.usage.observe_account(result['elapsed'])
+                journal.append(result)
+                if predictions is not None:
+                    predictions.append(result)
+                run_metrics.add(result)
+                if verdict_index is not None:
+                    verdict_index.record(result)
+                # Throughput and ETA come from tqdm itself; the postfix adds the running scores
+                progress.set_postfix(run_metrics.counts.progress(), refresh=False)
+                progress.update()
+
+            if pre_classifier is not None:
+                # Confident accounts are decided locally; only the rest reach the debate
+                accounts = pre_classifier.cascade(accounts, collect)
+
+            if verdict_index is not None:
+                # Accounts nearly identical to one judged before, in this run or an earlier one, reuse its verdict
+                accounts = verdict_index.cascade(accounts, collect)
+
+            on_debated = collect
+            farms = clusters_from_env(accounts)
+            if farms is not None:
+                # Only sampled members of near-duplicate clusters are debated; the rest inherit their verdict
+                accounts = farms.to_debate()
+                print(f"Bot-farm clustering: {farms.cluster_count} clusters, {len(farms.farm_sizes)} with several "
+                      f"members (largest {farms.farm_sizes[:3]}); debating {len(accounts)} accounts")
+
+                def on_debated(result):
+                    shared = farms.share(result)
+                    collect(result)
+                    for record in shared:
+                        collect(record)
+
+            if batch is not None:
+                # Every account's openings go out in one batch job, then the critiques, then the judge
+                batch.run(list(accounts), on_debated)
+            elif debate_engine == "async":
+                # One event loop drives every account; stages within an account overlap
+                max_concurrency = int(os.getenv("MAX_CONCURRENT_ACCOUNTS", 256))
+                asyncio.run(run_accounts(accounts, openai_interface, max_concurrency, on_debated, debate_mode, policy))
+            else:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    process = partial(process_account, openai_interface=openai_interface, debate_mode=debate_mode,
+                                      policy=policy)
+                    for result in submit_bounded(executor, process, accounts, max_queued):
+                        on_debated(result)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; continue with: python -m src.main --journal {args.journal} --resume")
+        logging.warning("Run interrupted; completed accounts are in the journal")
+        raise
+    finally:
+        openai_interface.wait_background()
+        tracing.stop()
+        journal.close()
+        if predictions is not None:
+            predictions.close()
+    wall_time = time.perf_counter() - run_start
+
+    # Metrics cover every account in the journal, including earlier runs being resumed
+    counts = run_metrics.counts
 
     print("\nPerformance Evaluation")
     print("======================\n")
-    # print labels and predictions
-    print(f"True Labels     : {true_labels}")
-    print(f"Predicted Labels: {predicted_labels}\n")
-
-    # count correct predictions
-    correct = sum(1 for true, pred in zip(true_labels, predicted_labels) if true == pred)
-
-    # Calculate performance metrics
-    accuracy = accuracy_score(true_labels, predicted_labels)
-    precision = precision_score(true_labels, predicted_labels, zero_division=0)
-    recall = recall_score(true_labels, predicted_labels, zero_division=0)
-    f1 = f1_score(true_labels, predicted_labels, zero_division=0)
-
-    # Output performance metrics
-    print("Performance Metrics:")
-    print(f"Accuracy : {accuracy:.2f}")
-    print(f"Precision: {precision:.2f}")
-    print(f"Recall   : {recall:.2f}")
-    print(f"F1 Score : {f1:.2f}")
+    if args.predictions:
+        print(f"Predictions: {args.predictions}\n")
+
+    # Confusion counts are mergeable, so shard runs combine into the same metrics
+    print(counts.report())
+
+    # Wall time covers only this invocation, so compare modes on fresh journals
+    if run_metrics.timed:
+        print(f"\nWall time: {wall_time:.1f}s, mean account latency {run_metrics.elapsed / run_metrics.timed:.2f}s "
+              f"({debate_mode} debate)")
+
+    layout = openai_interface.prompt_stats.report()
+    if layout:
+        print("\nPrompt layout (estimated tokens per call):")
+        print(f"{'Stage':<14}{'Calls':>7}{'Prompt':>9}{'Shared prefix':>15}{'Provider cached':>17}")
+        for stage, calls, prompt_tokens, prefix_tokens, cached_tokens in layout:
+            print(f"{stage:<14}{calls:>7}{prompt_tokens:>9.0f}{prefix_tokens:>15.0f}{cached_tokens:>17}")
+
+    if batch is not None:
+        print(f"\nBatch jobs: {batch.submitted} requests in {batch.batches} batches this run "
+              f"(state in {batch.state_dir})")
+
+    if pre_classifier is not None:
+        escalated = run_metrics.slice('decided_by', 'debate').total
+        local = run_metrics.slice('decided_by', 'pre_classifier')
+        print(f"\nPre-classifier: {local.total} decided locally"
+              f"{f' ({local.accuracy():.2f} accuracy)' if local.total else ''}, "
+              f"{escalated} escalated to the debate "
+              f"({escalated / counts.total if counts.total else 0:.0%} escalation rate)")
+
+    if verdict_index is not None:
+        stats = verdict_index.stats()
+        reused = run_metrics.slice('decided_by', 'verdict_index')
+        disagreed = reused.total - reused.correct
+        print(f"\nVerdict index: {stats['hits']} of {stats['queries']} accounts reused a stored verdict "
+              f"({stats['hit_rate']:.0%} hit rate); reused verdicts disagreed with the true label "
+              f"{disagreed} times ({disagreed / reused.total if reused.total else 0:.0%}); "
+              f"{stats['entries']} verdicts stored")
+        verdict_index.close()
+
+    shared = run_metrics.slice('decided_by', 'cluster')
+    if shared.total:
+        # Each shared verdict saves a debate, costed at what debated accounts actually used
+        per_debate = run_metrics.api_calls_per_debate()
+        saved = f" (about {shared.total * per_debate:.0f} API calls saved)" if per_debate is not None else ""
+        print(f"\nBot-farm clustering: {shared.total} verdicts shared from debated cluster members{saved}, "
+              f"shared-verdict accuracy {shared.accuracy():.2f}")
+
+    if debate_mode == "adaptive":
+        full_calls = 5 * run_metrics.slice_total('debate_path')
+        if full_calls:
+            print(f"\nAdaptive debate: {run_metrics.adaptive_calls} calls instead of {full_calls} "
+                  f"({1 - run_metrics.adaptive_calls / full_calls:.0%} saved versus the full debate)")
+            for path in ('early_exit', 'standard', 'extended'):
+                group = run_metrics.slice('debate_path', path)
+                if group.total:
+                    print(f"  {path:<11}{group.total:>7} accounts, accuracy {group.accuracy():.2f}")
+
+    voted = run_metrics.slice_total('judge_vote')
+    if voted:
+        print(f"\nSelf-consistency judge ({judge_samples} samples): mean vote share "
+              f"{run_metrics.vote_share / voted:.2f}")
+        for label in ("unanimous", "split"):
+            group = run_metrics.slice('judge_vote', label)
+            if group.total:
+                print(f"  {label:<10}{group.total:>7} accounts, accuracy {group.accuracy():.2f}")
+
+    usage_rows = openai_interface.usage.summary()
+    if usage_rows:
+        # Usage is tracked per invocation, unlike the confusion counts folded in from a resumed journal
+        print(f"\nUsage by stage{' (this invocation only)' if args.resume else ''}:")
+        print(f"{'Stage':<14}{'Model':<20}{'Calls':>7}{'Cached':>8}{'Retries':>9}{'Prompt tok':>12}"
+              f"{'Compl. tok':>12}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'Cost $':>10}")
+        for row in usage_rows:
+            cost = f"{row['cost_usd']:.4f}" if row['cost_usd'] is not None else "n/a"
+            print(f"{row['stage']:<14}{row['model']:<20}{row['calls']:>7}{row['cache_hits']:>8}{row['retries']:>9}"
+                  f"{row['prompt_tokens']:>12}{row['completion_tokens']:>12}{row['latency_p50']:>8.2f}"
+                  f"{row['latency_p95']:>8.2f}{row['latency_p99']:>8.2f}{cost:>10}")
+        print(f"Estimated cost: ${openai_interface.usage.total_cost():.4f}")
+    router = openai_interface.stage_models.router
+    if router is not None:
+        print(f"\nModel routing (by {router.objective}, among models above each stage's accuracy floor):")
+        for stage, model, count in router.report():
+            print(f"  {stage:<14}{model:<20}{count:>7} requests")
+    resilience_rows = openai_interface.resilience.summary()
+    if resilience_rows:
+        print(f"\nStage retries and hedges ({run_metrics.failed} accounts failed after retries and were scored as Human):")
+        print(f"{'Stage':<14}{'Runs':>7}{'Retries':>9}{'Recovered':>11}{'Failed':>8}{'Retry rate':>12}"
+              f"{'Hedged':>8}{'Dup. won':>10}{'Hedge rate':>12}")
+        for row in resilience_rows:
+            print(f"{row['stage']:<14}{row['calls'] + row['failed']:>7}{row['retries']:>9}{row['recovered']:>11}"
+                  f"{row['failed']:>8}{row['retry_rate']:>12.1%}{row['hedges']:>8}{row['hedge_wins']:>10}"
+                  f"{row['hedge_rate']:>12.1%}")
+    if budget.active:
+        # Compare accuracy with a run without limits on the same accounts to judge the trade-off
+        print(f"\nToken budget (accuracy {counts.accuracy():.2f}):")
+        print(f"{'Prompt part':<20}{'Items':>8}{'Tokens before':>15}{'After':>10}{'Saved':>8}")
+        for part, items, before, after in budget.report():
+            print(f"{part:<20}{items:>8}{before:>15}{after:>10}{1 - after / before if before else 0:>8.0%}")
+        if budget.stage_max_tokens:
+            print("Reply caps (max_tokens): " + ", ".join(f"{stage}={cap}" for stage, cap in budget.stage_max_tokens.items()))
+    if args.metrics_json:
+        with open(args.metrics_json, 'w', encoding='utf-8') as f:
+            f.write(openai_interface.usage.to_json())
+        print(f"Usage metrics written to {args.metrics_json}")
+    if args.metrics_prom:
+        with open(args.metrics_prom, 'w', encoding='utf-8') as f:
+            f.write(openai_interface.usage.to_prometheus())
+        print(f"Prometheus metrics written to {args.metrics_prom}")
+
+    if rate_limiter is not None:
+        limiter_stats = rate_limiter.stats()
+        print(f"\nRate limiter: {limiter_stats['requests']} requests, {limiter_stats['throttled']} throttled, "
+              f"{limiter_stats['retries']} retries, final concurrency {limiter_stats['concurrency']}")
+        logging.info(f"Rate limiter stats: {limiter_stats}")
+
+    summary_file = summary_path(args.journal)
+    write_summary(summary_file, counts, args.shard, usage_rows, wall_time, resumed=args.resume)
+    print(f"\nRun summary: {summary_file}")
+
+    if response_cache is not None:
+        stats = response_cache.stats()
+        print(f"\nResponse cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+        logging.info(f"Response cache stats: {stats}")
+        response_cache.close()
 
     logging.info("Performance evaluation completed successfully")
 
@@ -0,0 +1,141 @@
+class ConfusionCounts:
+    """Binary confusion matrix that can be updated one result at a time and merged across runs.
+
+    Bot (1) is the positive class; the ratios follow scikit-learn with
+    zero_division=0, so merged shard counts give the same metrics as one run
+    over all their accounts.
+    """
+
+    FIELDS = ('tp', 'fp', 'tn', 'fn')
+
+    def __init__(self, tp=0, fp=0, tn=0, fn=0):
+        self.tp = tp
+        self.fp = fp
+        self.tn = tn
+        self.fn = fn
+
+    @classmethod
+    def from_records(cls, records):
+        counts = cls()
+        for record in records:
+            counts.add(record['true_label'], record['prediction'])
+        return counts
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: int(data[field]) for field in cls.FIELDS})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def add(self, true_label, prediction):
+        if true_label:
+            if prediction:
+                self.tp += 1
+            else:
+                self.fn += 1
+        elif prediction:
+            self.fp += 1
+        else:
+            self.tn += 1
+
+    def __add__(self, other):
+        return ConfusionCounts(**{field: getattr(self, field) + getattr(other, field) for field in self.FIELDS})
+
+    def __eq__(self, other):
+        return isinstance(other, ConfusionCounts) and self.to_dict() == other.to_dict()
+
+    @property
+    def total(self):
+        return self.tp + self.fp + self.tn + self.fn
+
+    @property
+    def correct(self):
+        return self.tp + self.tn
+
+    def accuracy(self):
+        return self.correct / self.total if self.total else 0.0
+
+    def precision(self):
+        predicted = self.tp + self.fp
+        return self.tp / predicted if predicted else 0.0
+
+    def recall(self):
+        actual = self.tp + self.fn
+        return self.tp / actual if actual else 0.0
+
+    def f1(self):
+        denominator = 2 * self.tp + self.fp + self.fn
+        return 2 * self.tp / denominator if denominator else 0.0
+
+    def progress(self):
+        """Short live figures for the progress bar."""
+        return {'acc': f"{self.accuracy():.3f}", 'f1': f"{self.f1():.3f}"}
+
+    def report(self):
+        """The metrics block printed at the end of a run."""
+        return "\n".join([
+            "Performance Metrics:",
+            f"Accuracy : {self.accuracy():.2f}",
+            f"Precision: {self.precision():.2f}",
+            f"Recall   : {self.recall():.2f}",
+            f"F1 Score : {self.f1():.2f}",
+        ])
+
+class RunMetrics:
+    """Everything the end-of-run report needs, folded in one result at a time.
+
+    Keeps confusion counts for the whole run and for each slice the report
+    breaks out (how an account was decided, its adaptive debate path, a
+    unanimous or split judge vote) plus a few sums, so memory stays
+    constant however many accounts the run scores.
+    """
+
+    def __init__(self):
+        self.counts = ConfusionCounts()
+        self.slices = {}
+        self.failed = 0
+        self.timed = 0
+        self.elapsed = 0.0
+        self.adaptive_calls = 0
+        self.vote_share = 0.0
+        self.debated = 0
+        self.debate_api_calls = 0
+
+    def add(self, record):
+        true_label, prediction = record['true_label'], record['prediction']
+        self.counts.add(true_label, prediction)
+        for key in self._slices(record):
+            self.slices.setdefault(key, ConfusionCounts()).add(true_label, prediction)
+        self.failed += bool(record.get('error'))
+        if record['elapsed'] > 0:
+            self.timed += 1
+            self.elapsed += record['elapsed']
+        if record.get('debate_path'):
+            self.adaptive_calls += record['calls']
+        if 'judge_confidence' in record:
+            self.vote_share += record['judge_confidence']
+        usage = record.get('usage')
+        # Journals written before per-account call counts existed have no 'calls' to add up
+        if record.get('decided_by', 'debate') == 'debate' and usage and all('calls' in u for u in usage.values()):
+            self.debated += 1
+            self.debate_api_calls += sum(u['calls'] - u['cache_hits'] for u in usage.values())
+
+    def api_calls_per_debate(self):
+        """Mean API calls of a debated account, cache hits excluded; None before any was recorded."""
+        return self.debate_api_calls / self.debated if self.debated else None
+
+    @staticmethod
+    def _slices(record):
+        yield 'decided_by', record.get('decided_by', 'debate')
+        if record.get('debate_path'):
+            yield 'debate_path', record['debate_path']
+        if 'judge_confidence' in record:
+            yield 'judge_vote', 'unanimous' if record['judge_confidence'] == 1.0 else 'split'
+
+    def slice(self, kind, value):
+        """Confusion counts of the accounts in one slice; empty if none fell in it."""
+        return self.slices.get((kind, value), ConfusionCounts())
+
+    def slice_total(self, kind):
+        return sum(counts.total for (name, _), counts in self.slices.items() if name == kind)
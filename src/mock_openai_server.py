@@ -0,0 +1,263 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPACT_FIELDS = ['bot_arguments', 'human_arguments', 'bot_critique', 'human_critique', 'analysis']
+
+JUDGE_ANALYSIS = ("**Analysis:** The bot expert pointed to the follower ratio, the posting cadence and the repeated "
+                  "phrasing across tweets. The human expert answered with the personal details in the profile and the "
+                  "varied topics, but did not explain the cadence. Weighing both critiques, the stronger case is clear.")
+
+def parse_latency(spec):
+    """Turn 'fixed:0.2', 'uniform:0.1,0.5' or 'lognormal:0.8,0.5' (median, sigma) into a sampler."""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'fixed':
+        return lambda rng: values[0] if values else 0.0
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        import math
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+ERROR_PAYLOADS = {
+    429: {'error': {'message': 'Rate limit reached', 'type': 'rate_limit_error'}},
+    500: {'error': {'message': 'Mock server error', 'type': 'server_error'}},
+}
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # The default backlog of 5 refuses bursts of concurrent connections
+
+class MockOpenAIServer:
+    """Local OpenAI-compatible chat completions endpoint for offline tests and benchmarks.
+
+    Replies are canned: judge prompts get a "**Classification:**" line, compact
+    debate requests get the structured JSON, every other stage gets a short
+    argument. The verdict is a stable function of the account block, so the
+    same account is always judged the same way. Latency and error injection
+    are configurable, latency also per model (model_latency maps a model to
+    its own distribution), and max_tokens cuts replies at four characters per
+    token. Streamed replies deliver the first token after a fifth of the
+    sampled latency and spread the rest evenly over the tokens.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency='fixed:0', error_rate=0.0,
+                 server_error_rate=0.0, bot_rate=0.5, retry_after=0.05, seed=None, model_latency=None):
+        self.sample_latency = parse_latency(latency)
+        self.model_latency = {model: parse_latency(spec) for model, spec in (model_latency or {}).items()}
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.bot_rate = bot_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+        self.model_requests = {}
+        self.errors = 0
+        self.cancelled = 0  # Streams the client closed before the last chunk
+        self._address = (host, port)
+        self._httpd = None  # Bound on first use, so the canned replies work without a socket
+        self._thread = None
+
+    def _bind(self):
+        if self._httpd is None:
+            self._httpd = _Server(self._address, _Handler)
+            self._httpd.mock = self
+        return self._httpd
+
+    @property
+    def base_url(self):
+        host, port = self._bind().server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._bind().serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _draw(self, model=None):
+        """Sample (latency, failure status or None) for one request."""
+        with self._rng_lock:
+            self.requests += 1
+            self.model_requests[model] = self.model_requests.get(model, 0) + 1
+            latency = max(self.model_latency.get(model, self.sample_latency)(self._rng), 0.0)
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            return latency, 429
+        if roll < self.error_rate + self.server_error_rate:
+            return latency, 500
+        return latency, None
+
+    def verdict(self, messages):
+        """Deterministic Yes/No for the account described in the request."""
+        account_text = next((m['content'] for m in messages if m['content'].startswith('**Account Details:**')),
+                            json.dumps(messages))
+        digest = hashlib.sha256(account_text.encode('utf-8')).digest()
+        return "Yes" if digest[0] / 255 < self.bot_rate else "No"
+
+    def reply(self, body, index=0):
+        """Canned completion text for a chat request; extra samples (n > 1) may disagree at temperature > 0."""
+        messages = body['messages']
+        verdict = self.verdict(messages)
+        if index and self._flip(messages, index, body.get('temperature', 1.0)):
+            verdict = "No" if verdict == "Yes" else "Yes"
+        if body.get('response_format'):
+            debate = {field: f"Mock {field.replace('_', ' ')}." for field in COMPACT_FIELDS}
+            debate['classification'] = verdict
+            return json.dumps(debate)
+        if 'impartial judge' in messages[-1]['content']:
+            if "Start your reply with the **Classification:** line" in messages[-1]['content']:
+                return f"**Classification:** {verdict}\n{JUDGE_ANALYSIS}"
+            return f"{JUDGE_ANALYSIS}\n**Classification:** {verdict}"
+        if '**Bot Probability:**' in messages[-1]['content']:
+            return f"Mock argument citing follower ratios and tweet patterns.\n**Bot Probability:** {self.probability(messages)}"
+        return "Mock argument citing follower ratios and tweet patterns."
+
+    def _flip(self, messages, index, temperature):
+        digest = hashlib.sha256(f"{index}:{json.dumps(messages[:2])}".encode('utf-8')).digest()
+        return digest[0] / 255 < 0.25 * temperature
+
+    def probability(self, messages):
+        """Opening agents' bot probability: confident for most accounts, undecided for about one in five."""
+        digest = hashlib.sha256(json.dumps(messages[:2]).encode('utf-8')).digest()
+        if digest[1] < 51:
+            return 50
+        return 90 if self.verdict(messages) == "Yes" else 10
+
+    def completion(self, body):
+        """The chat.completion payload answering a request."""
+        prompt_tokens = sum(len(m['content']) for m in body['messages']) // 4
+        choices = []
+        for index in range(body.get('n', 1)):
+            content = self.reply(body, index)
+            finish_reason = 'stop'
+            if body.get('max_tokens') and len(content) > body['max_tokens'] * 4:
+                content, finish_reason = content[:body['max_tokens'] * 4], 'length'
+            choices.append({'index': index, 'finish_reason': finish_reason,
+                            'message': {'role': 'assistant', 'content': content}})
+        completion_tokens = sum(len(c['message']['content']) for c in choices) // 4
+        return {
+            'id': f'chatcmpl-mock-{self.requests}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'mock-model'),
+            'choices': choices,
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        }
+
+    def respond(self, body):
+        """(status, payload) for one request without its latency, as a batch job records it; errors are injected."""
+        _, failure = self._draw(body.get('model'))
+        if failure is not None:
+            self.errors += 1
+            return failure, ERROR_PAYLOADS[failure]
+        return 200, self.completion(body)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+    def do_POST(self):
+        mock = self.server.mock
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+        latency, failure = mock._draw(body.get('model'))
+        streaming = body.get('stream') and failure is None
+        time.sleep(latency / 5 if streaming else latency)
+        if failure == 429:
+            mock.errors += 1
+            return self._send_json(429, ERROR_PAYLOADS[429], {'retry-after-ms': str(int(mock.retry_after * 1000))})
+        if failure == 500:
+            mock.errors += 1
+            return self._send_json(500, ERROR_PAYLOADS[500])
+
+        completion = mock.completion(body)
+        if streaming:
+            return self._send_stream(body, completion['choices'], latency * 4 / 5,
+                                     completion['usage'] if body.get('stream_options', {}).get('include_usage') else None)
+        self._send_json(200, completion)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, body, choices, duration, usage):
+        """Send choices as server-sent chunks, paced over duration; stop quietly if the client hangs up."""
+        base = {'id': f'chatcmpl-mock-{self.server.mock.requests}', 'object': 'chat.completion.chunk',
+                'created': int(time.time()), 'model': body.get('model', 'mock-model')}
+        pieces = [(c['index'], piece) for c in choices for piece in re.findall(r"\S+\s*|\s+", c['message']['content'])]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for index, piece in pieces:
+                time.sleep(duration / len(pieces))
+                self._send_event({**base, 'choices': [{'index': index, 'delta': {'content': piece}, 'finish_reason': None}]})
+            for c in choices:
+                self._send_event({**base, 'choices': [{'index': c['index'], 'delta': {}, 'finish_reason': 'stop'}]})
+            if usage is not None:
+                self._send_event({**base, 'choices': [], 'usage': usage})
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.mock.cancelled += 1
+            self.close_connection = True
+
+    def _send_event(self, payload):
+        self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible mock server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:0.8,0.5", help="fixed:S, uniform:A,B or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="fraction answered with 500")
+    parser.add_argument("--model-latency", type=json.loads, default=None,
+                        help='JSON latency per model, e.g. {"gpt-4o": "lognormal:1.5,0.5"}')
+    parser.add_argument("--bot-rate", type=float, default=0.5, help="fraction of accounts judged to be bots")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(port=args.port, latency=args.latency, error_rate=args.error_rate,
+                              server_error_rate=args.server_error_rate, bot_rate=args.bot_rate,
+                              model_latency=args.model_latency)
+    print(f"Mock OpenAI server listening on {server.base_url} (set OPENAI_BASE_URL to use it)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import threading
+import time
+
+ROUTER_OBJECTIVES = ('latency', 'cost')
+
+class ModelRouter:
+    """Send each debate stage to the fastest (or cheapest) model that is accurate enough.
+
+    routes maps a stage, or 'default', to {"min_accuracy": floor, "models":
+    {model: accuracy}}, with each model's accuracy measured offline (for
+    example a benchmark or sweep run with that model on the stage). Models
+    below the floor are never used. Each remaining candidate is first sent
+    min_samples requests to measure it; after that the stage goes to the
+    candidate with the lowest median latency, or the lowest mean cost per
+    call, in the usage tracker. The choice is revisited every
+    refresh_seconds, so a model that slows down loses its traffic.
+    """
+
+    def __init__(self, routes, objective='latency', usage=None, min_samples=5, refresh_seconds=1.0):
+        if objective not in ROUTER_OBJECTIVES:
+            raise ValueError(f"Router objective must be one of {', '.join(ROUTER_OBJECTIVES)}, got {objective!r}")
+        self.candidates = {}
+        for stage, route in routes.items():
+            floor = route.get('min_accuracy', 0.0)
+            eligible = [model for model, accuracy in route['models'].items() if accuracy >= floor]
+            if not eligible:
+                raise ValueError(f"No model for the {stage} stage meets its accuracy floor of {floor}")
+            self.candidates[stage] = eligible
+        self.objective = objective
+        self.usage = usage  # Measured latency and cost per (stage, model); set by the interface
+        self.min_samples = min_samples
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._issued = {}
+        self._choice = {}
+        self.picks = {}
+
+    def choose(self, stage):
+        """Model for the next request of a stage, or None if the stage is not routed."""
+        candidates = self.candidates.get(stage, self.candidates.get('default'))
+        if candidates is None:
+            return None
+        with self._lock:
+            model = self._explore(stage, candidates) or self._best(stage, candidates)
+            self.picks[(stage, model)] = self.picks.get((stage, model), 0) + 1
+            return model
+
+    def _explore(self, stage, candidates):
+        for model in candidates:
+            issued = self._issued.get((stage, model), 0)
+            if issued < self.min_samples:
+                self._issued[(stage, model)] = issued + 1
+                return model
+        return None
+
+    def _best(self, stage, candidates):
+        choice = self._choice.get(stage)
+        now = time.monotonic()
+        if choice is not None and now - choice[1] < self.refresh_seconds:
+            return choice[0]
+        rows = {row['model']: row for row in self.usage.summary() if row['stage'] == stage}
+        scores = {model: self._score(rows.get(model)) for model in candidates}
+        best = min(candidates, key=lambda model: scores[model])
+        if choice is None or choice[0] != best:
+            logging.info(f"Routing the {stage} stage to {best} ({self.objective} {scores[best]:.4g})")
+        self._choice[stage] = (best, now)
+        return best
+
+    def _score(self, row):
+        # Cached replies say nothing about a model, so only API calls count
+        api_calls = row['calls'] - row['cache_hits'] if row else 0
+        if not api_calls:
+            return float('inf')
+        if self.objective == 'cost':
+            return row['cost_usd'] / api_calls if row['cost_usd'] is not None else float('inf')
+        return row['latency_p50']
+
+    def report(self):
+        """Rows of (stage, model, requests routed) in stage order."""
+        with self._lock:
+            return [(stage, model, count) for (stage, model), count in sorted(self.picks.items())]
+
+class StageModels:
+    """Model and temperature per debate stage.
+
+    models and temperatures map a stage, or 'default', to a value; stages
+    with neither keep the interface's model_name and temperature. A router,
+    when given, picks the model of the stages it has routes for. Reply caps
+    per stage are the token budget's STAGE_MAX_TOKENS.
+    """
+
+    def __init__(self, models=None, temperatures=None, router=None):
+        self.models = dict(models or {})
+        self.temperatures = dict(temperatures or {})
+        self.router = router
+
+    def options(self, stage):
+        """Completion options overriding the interface's model and temperature for a stage."""
+        options = {}
+        model = self.router.choose(stage) if self.router is not None else None
+        model = model or self.models.get(stage, self.models.get('default'))
+        if model:
+            options['model'] = model
+        temperature = self.temperatures.get(stage, self.temperatures.get('default'))
+        if temperature is not None:
+            options['temperature'] = temperature
+        return options
+
+def stage_models_from_env():
+    """Build the per-stage settings from STAGE_MODELS, STAGE_TEMPERATURES, MODEL_ROUTES and ROUTER_OBJECTIVE."""
+    def json_setting(name):
+        value = os.getenv(name)
+        return json.loads(value) if value else None
+
+    routes = json_setting("MODEL_ROUTES")
+    router = ModelRouter(routes, objective=os.getenv("ROUTER_OBJECTIVE", "latency").lower(),
+                         min_samples=int(os.getenv("ROUTER_MIN_SAMPLES", 5))) if routes else None
+    return StageModels(json_setting("STAGE_MODELS"), json_setting("STAGE_TEMPERATURES"), router)
@@ -1,18 +1,114 @@
+import asyncio
+import json
 import logging
-from openai import OpenAI
+import threading
+import time
+from openai import OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletion
 from dotenv import load_dotenv
 import os
-from .prompting import create_analysis_prompt
+from .adaptive_debate import CONFIDENCE_REQUEST
+from .model_routing import StageModels
+from . import tracing
+from .prompting import PromptLayoutStats, build_stage_messages, create_analysis_prompt, memoized_account_block
+from .rate_limiter import CHARS_PER_TOKEN, estimate_tokens
+from .resilience import StageResilience, abandoned, retrying
+from .token_budget import TokenBudget
+from .usage_metrics import UsageTracker
+
+COMPACT_DEBATE_FIELDS = ['bot_arguments', 'human_arguments', 'bot_critique', 'human_critique',
+                         'analysis', 'classification']
+
+# Structured output schema for the single-call debate; fields are generated in debate order
+COMPACT_DEBATE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "bot_detection_debate",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                **{field: {"type": "string"} for field in COMPACT_DEBATE_FIELDS[:-1]},
+                "classification": {"type": "string", "enum": ["Yes", "No"]}
+            },
+            "required": COMPACT_DEBATE_FIELDS,
+            "additionalProperties": False
+        }
+    }
+}
+
+JUDGE_STREAMING_MODES = ('off', 'cancel', 'background')
+
+PUBLIC_API_URL = "https://api.openai.com/v1"
+
+JUDGE_PROMPT_FIELDS = ('bot_args', 'human_args', 'bot_critique', 'human_critique')
+
+# Appended to the judge prompt when it is streamed, so the label arrives within the first few tokens
+CLASSIFICATION_FIRST = """
+Start your reply with the **Classification:** line on its own, then give the rest of your ruling."""
 
 class OpenAIInterface:
-    def __init__(self, api_key, model_name, temperature=0.5):
+    def __init__(self, api_key, model_name, temperature=0.5, cache=None, rate_limiter=None, usage=None,
+                 base_url=None, judge_samples=1, judge_streaming='off', budget=None, resilience=None,
+                 stage_models=None, judge_prompt=None):
         logging.info("Initializing OpenAI interface")
         load_dotenv()
-        self.client = OpenAI(api_key=api_key)
+        self.api_key = api_key
+        # None uses OPENAI_BASE_URL or the public API; the clients would take a blank OPENAI_BASE_URL literally
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or PUBLIC_API_URL
+        self.rate_limiter = rate_limiter
+        # The shared limiter owns retries so that every 429 feeds its concurrency control
+        self._client_retries = 0 if rate_limiter is not None else 2
+        self.client = OpenAI(api_key=api_key, base_url=self.base_url, max_retries=self._client_retries)
+        self._async_client = None
         self.model_name = model_name
         self.temperature = temperature
+        self.judge_samples = judge_samples  # Judge verdicts drawn per request for self-consistency voting
+        if judge_streaming not in JUDGE_STREAMING_MODES:
+            raise ValueError(f"Judge streaming must be one of {', '.join(JUDGE_STREAMING_MODES)}, got {judge_streaming!r}")
+        if judge_streaming != 'off' and judge_samples > 1:
+            logging.warning("Judge streaming reads a single verdict; it is off while judge_samples > 1")
+            judge_streaming = 'off'
+        self.judge_streaming = judge_streaming
+        # Template replacing the judge prompt, formatted with bot_args, human_args, bot_critique and human_critique
+        self.judge_prompt = judge_prompt
+        # Called as judge_text_sink(account_id, stage, text) with each full judge reply drained in the background
+        self.judge_text_sink = None
+        self._background_lock = threading.Lock()
+        self._background = set()
+        self.cache = cache
+        self.budget = budget if budget is not None else TokenBudget(model=model_name)
+        self.prompt_stats = PromptLayoutStats()
+        self.usage = usage if usage is not None else UsageTracker()
+        self.resilience = resilience if resilience is not None else StageResilience()
+        if self.resilience.usage is None:
+            self.resilience.usage = self.usage
+        # Per-stage model and temperature overrides; model_name and temperature are the fallback
+        self.stage_models = stage_models if stage_models is not None else StageModels()
+        if self.stage_models.router is not None and self.stage_models.router.usage is None:
+            self.stage_models.router.usage = self.usage
         logging.debug(f"OpenAI model set to: {self.model_name}, temperature: {self.temperature}")
 
+    @property
+    def async_client(self):
+        """Lazily created AsyncOpenAI client shared by every coroutine on the event loop."""
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                             max_retries=self._client_retries)
+        return self._async_client
+
+    async def aclose(self):
+        """Close the async client so the next event loop starts with a fresh connection pool.
+
+        Judge replies still streaming in the background are drained first.
+        """
+        with self._background_lock:
+            tasks = [task for task in self._background if isinstance(task, asyncio.Task)]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
     def get_classification_result_from_text(self, text):
         text = text + '\n'
         substr = "**Classification:**"
@@ -36,72 +132,209 @@ class OpenAIInterface:
             raise IndexError("Invalid classification format in OpenAI response")
         return classification
 
-    def get_bot_agent_arguments(self, account_details):
-        """Initial arguments for bot classification."""
-        prompt = f"""\
-As a Bot Detection Expert, analyze this Twitter account data and provide arguments suggesting it's a bot.
+    def classification_from_partial_text(self, text):
+        """Incremental get_classification_result_from_text for a reply that is still streaming.
 
-**Account Details:**
-{self._format_account_details(account_details)}
+        Returns None until the "**Classification:**" line is complete, then its
+        label; a complete line that does not parse raises IndexError as usual.
+        """
+        start = text.find("**Classification:**")
+        if start == -1:
+            return None
+        end = text.find("\n", start)
+        if end == -1:
+            return None
+        return self.get_classification_result_from_text(text[:end])
+
+    def wait_background(self):
+        """Wait for judge replies that worker threads are still draining in the background."""
+        # Copied under the lock, since drain threads remove themselves from the set as they finish
+        with self._background_lock:
+            threads = [task for task in self._background if isinstance(task, threading.Thread)]
+        for thread in threads:
+            thread.join()
+
+    def get_bot_agent_arguments(self, account_details, with_confidence=False):
+        """Initial arguments for bot classification, optionally ending with a bot probability score."""
+        return self._run_stage("bot_agent", account_details, *self._opening(self._bot_agent_prompt(), with_confidence))
+
+    async def aget_bot_agent_arguments(self, account_details, with_confidence=False):
+        """Async variant of get_bot_agent_arguments."""
+        return await self._arun_stage("bot_agent", account_details,
+                                      *self._opening(self._bot_agent_prompt(), with_confidence))
+
+    def _bot_agent_prompt(self):
+        prompt = """\
+As a Bot Detection Expert, analyze this Twitter account data and provide arguments suggesting it's a bot.
 
 Focus on suspicious patterns and red flags. Be thorough but concise.
 """
-        response = self._get_completion(prompt, "You are an expert focused on detecting Twitter bots.")
-        return response.choices[0].message.content
-
-    def get_human_agent_arguments(self, account_details):
-        """Initial arguments against bot classification."""
-        prompt = f"""\
+        return prompt, "You are an expert focused on detecting Twitter bots."
+
+    def get_human_agent_arguments(self, account_details, with_confidence=False):
+        """Initial arguments against bot classification, optionally ending with a bot probability score."""
+        return self._run_stage("human_agent", account_details,
+                               *self._opening(self._human_agent_prompt(), with_confidence))
+
+    async def aget_human_agent_arguments(self, account_details, with_confidence=False):
+        """Async variant of get_human_agent_arguments."""
+        return await self._arun_stage("human_agent", account_details,
+                                      *self._opening(self._human_agent_prompt(), with_confidence))
+
+    @staticmethod
+    def _opening(prompt_and_system, with_confidence):
+        """An opening stage's prompt, with the adaptive debate's confidence request appended if asked."""
+        prompt, system_message = prompt_and_system
+        return (prompt + CONFIDENCE_REQUEST if with_confidence else prompt), system_message
+
+    def _human_agent_prompt(self):
+        prompt = """\
 As a Human Behavior Expert, analyze this Twitter account data and provide arguments suggesting it's a genuine human user.
 
-**Account Details:**
-{self._format_account_details(account_details)}
-
 Focus on authentic behavior patterns and human indicators. Be thorough but concise.
 """
-        response = self._get_completion(prompt, "You are an expert in human social media behavior.")
-        return response.choices[0].message.content
+        return prompt, "You are an expert in human social media behavior."
 
     def get_bot_critic_response(self, account_details, human_arguments):
         """Bot expert critiques the human agent's arguments."""
+        return self._run_stage("bot_critic", account_details,
+                               *self._bot_critic_prompt(*self.budget.compact("bot_critic", human_arguments)))
+
+    async def aget_bot_critic_response(self, account_details, human_arguments):
+        """Async variant of get_bot_critic_response."""
+        return await self._arun_stage("bot_critic", account_details,
+                                      *self._bot_critic_prompt(*self.budget.compact("bot_critic", human_arguments)))
+
+    def _bot_critic_prompt(self, human_arguments):
         prompt = f"""\
 As a Bot Detection Expert, critique these arguments claiming the account is human:
 
-**Account Details:**
-{self._format_account_details(account_details)}
-
 **Human Expert's Arguments:**
 {human_arguments}
 
 Point out flaws in their reasoning and provide counter-evidence.
 """
-        response = self._get_completion(prompt, "You are a critical bot detection expert.")
-        return response.choices[0].message.content
+        return prompt, "You are a critical bot detection expert."
 
     def get_human_critic_response(self, account_details, bot_arguments):
         """Human expert critiques the bot agent's arguments."""
+        return self._run_stage("human_critic", account_details,
+                               *self._human_critic_prompt(*self.budget.compact("human_critic", bot_arguments)))
+
+    async def aget_human_critic_response(self, account_details, bot_arguments):
+        """Async variant of get_human_critic_response."""
+        return await self._arun_stage("human_critic", account_details,
+                                      *self._human_critic_prompt(*self.budget.compact("human_critic", bot_arguments)))
+
+    def _human_critic_prompt(self, bot_arguments):
         prompt = f"""\
 As a Human Behavior Expert, critique these arguments claiming the account is a bot:
 
-**Account Details:**
-{self._format_account_details(account_details)}
-
 **Bot Expert's Arguments:**
 {bot_arguments}
 
 Point out flaws in their reasoning and provide counter-evidence.
 """
-        response = self._get_completion(prompt, "You are a critical human behavior expert.")
-        return response.choices[0].message.content
+        return prompt, "You are a critical human behavior expert."
 
     def get_final_classification(self, account_details, bot_args, human_args, bot_critique, human_critique):
-        """Judge makes final assessment based on the debate."""
+        """Judge makes final assessment based on the debate.
+
+        With judge_samples > 1 this is the text of a sample that agrees with the majority verdict,
+        and with judge streaming it ends after the classification line.
+        """
+        if self.judge_samples > 1 or self.judge_streaming != 'off':
+            return self.get_final_verdict(account_details, bot_args, human_args, bot_critique, human_critique)['text']
+        return self._run_stage("judge", account_details, *self._judge_stage_prompt(bot_args, human_args, bot_critique, human_critique))
+
+    async def aget_final_classification(self, account_details, bot_args, human_args, bot_critique, human_critique):
+        """Async variant of get_final_classification."""
+        if self.judge_samples > 1 or self.judge_streaming != 'off':
+            verdict = await self.aget_final_verdict(account_details, bot_args, human_args, bot_critique, human_critique)
+            return verdict['text']
+        return await self._arun_stage("judge", account_details, *self._judge_stage_prompt(bot_args, human_args, bot_critique, human_critique))
+
+    def get_final_verdict(self, account_details, bot_args, human_args, bot_critique, human_critique):
+        """Judge the debate with judge_samples verdicts drawn in one request and majority-voted.
+
+        With judge streaming the judge states its classification first and the
+        reply is read only until that line parses.
+        """
+        def judge():
+            if self.judge_streaming != 'off':
+                response = self._stream_stage("judge", account_details,
+                                              *self._judge_stage_prompt(bot_args, human_args, bot_critique, human_critique),
+                                              until=self.classification_from_partial_text)
+                return self._vote([response.choices[0].message.content])
+            response = self._stage_response("judge", account_details,
+                                            *self._judge_stage_prompt(bot_args, human_args, bot_critique, human_critique),
+                                            **self._judge_options())
+            return self._vote([choice.message.content for choice in response.choices])
+        # A reply without a parsable classification is retried like a failed request
+        return self._stage("judge", judge)
+
+    async def aget_final_verdict(self, account_details, bot_args, human_args, bot_critique, human_critique):
+        """Async variant of get_final_verdict."""
+        async def judge():
+            if self.judge_streaming != 'off':
+                response = await self._astream_stage("judge", account_details,
+                                                     *self._judge_stage_prompt(bot_args, human_args, bot_critique, human_critique),
+                                                     until=self.classification_from_partial_text)
+                return self._vote([response.choices[0].message.content])
+            response = await self._astage_response("judge", account_details,
+                                                   *self._judge_stage_prompt(bot_args, human_args, bot_critique, human_critique),
+                                                   **self._judge_options())
+            return self._vote([choice.message.content for choice in response.choices])
+        return await self._astage("judge", judge)
+
+    def _judge_stage_prompt(self, bot_args, human_args, bot_critique, human_critique):
+        """The judge prompt over budget-compacted debate texts.
+
+        The label is requested first when the reply is streamed or capped by
+        max_tokens, so neither an early stop nor a cut-off loses it.
+        """
+        texts = self.budget.compact("judge", bot_args, human_args, bot_critique, human_critique)
+        prompt, system_message = self._judge_prompt(*texts)
+        if self.judge_prompt is not None:
+            prompt = self.judge_prompt.format(**dict(zip(JUDGE_PROMPT_FIELDS, texts)))
+        if self.judge_streaming != 'off' or self.budget.options("judge"):
+            prompt = prompt.rstrip() + "\n" + CLASSIFICATION_FIRST
+        return prompt, system_message
+
+    def _judge_options(self):
+        # n samples share one copy of the prompt tokens; only the completions are multiplied
+        return {"n": self.judge_samples} if self.judge_samples > 1 else {}
+
+    def _vote(self, texts):
+        """Majority vote over judge samples; ties go to the first valid sample's label.
+
+        Returns the winning label as 'prediction', its vote share as
+        'confidence', every parsed label under 'votes' (None for samples that
+        could not be parsed) and a majority sample's text as 'text'.
+        """
+        with tracing.span("parse", "parse"):
+            votes = []
+            for text in texts:
+                try:
+                    votes.append(self.get_classification_result_from_text(text))
+                except IndexError:
+                    votes.append(None)
+            valid = [vote for vote in votes if vote is not None]
+            if not valid:
+                raise IndexError(f"No parsable classification in {len(texts)} judge sample(s)")
+            bots = valid.count(1)
+            prediction = valid[0] if bots * 2 == len(valid) else int(bots * 2 > len(valid))
+            return {
+                'prediction': prediction,
+                'confidence': valid.count(prediction) / len(valid),
+                'votes': votes,
+                'text': texts[votes.index(prediction)],
+            }
+
+    def _judge_prompt(self, bot_args, human_args, bot_critique, human_critique):
         prompt = f"""\
 As an impartial judge, review this Twitter account classification debate:
 
-**Account Details:**
-{self._format_account_details(account_details)}
-
 **Initial Bot Arguments:**
 {bot_args}
 
@@ -126,8 +359,53 @@ Example 2: **Classification:** No
 Example 3: **Classification:** Yes
 Example 4: **Classification:** No
 """
-        response = self._get_completion(prompt, "You are an impartial judge evaluating expert arguments.")
-        return response.choices[0].message.content
+        return prompt, "You are an impartial judge evaluating expert arguments."
+
+    def get_compact_debate(self, account_details):
+        """Run the whole debate (both cases, both rebuttals and the verdict) in one structured request."""
+        return self._stage("compact", lambda: self._parse_compact_debate(self._stage_response(
+            "compact", account_details, *self._compact_debate_prompt(),
+            response_format=COMPACT_DEBATE_FORMAT).choices[0].message.content))
+
+    async def aget_compact_debate(self, account_details):
+        """Async variant of get_compact_debate."""
+        async def compact():
+            response = await self._astage_response("compact", account_details, *self._compact_debate_prompt(),
+                                                   response_format=COMPACT_DEBATE_FORMAT)
+            return self._parse_compact_debate(response.choices[0].message.content)
+        return await self._astage("compact", compact)
+
+    def _compact_debate_prompt(self):
+        prompt = """\
+Hold a complete Twitter bot detection debate about the account described above and report it as JSON.
+
+Fill in each field in order, each building on the previous ones:
+- bot_arguments: a Bot Detection Expert's case that the account is a bot, focusing on suspicious patterns and red flags
+- human_arguments: a Human Behavior Expert's case that it is a genuine human user, focusing on authentic behavior
+- bot_critique: the Bot Detection Expert pointing out flaws in the human arguments, with counter-evidence
+- human_critique: the Human Behavior Expert pointing out flaws in the bot arguments, with counter-evidence
+- analysis: an impartial judge weighing which side made stronger points and answered the other's criticisms
+- classification: the judge's ruling, "Yes" if the account is a bot and "No" otherwise
+
+Be thorough but concise in every field.
+"""
+        return prompt, "You moderate a debate between bot detection and human behavior experts and an impartial judge."
+
+    def _parse_compact_debate(self, text):
+        """Decode the structured debate and add the parsed label under 'prediction'."""
+        with tracing.span("parse", "parse"):
+            try:
+                debate = json.loads(text)
+            except json.JSONDecodeError as e:
+                raise IndexError(f"Invalid compact debate JSON in OpenAI response: {e}")
+            missing = [field for field in COMPACT_DEBATE_FIELDS if field not in debate]
+            if missing:
+                raise IndexError(f"Compact debate response is missing {', '.join(missing)}")
+            answer = str(debate['classification']).strip().lower()
+            if answer not in ("yes", "no"):
+                raise IndexError("Invalid classification format in OpenAI response")
+            debate['prediction'] = 1 if answer == "yes" else 0
+            return debate
 
     def _format_account_details(self, account_details):
         """Helper to format account details consistently."""
@@ -167,21 +445,360 @@ Location: {account_details['location']}"""
             tweets = account_details['tweets']
             if isinstance(tweets, list):
                 formatted += "\n\nRecent Tweets:"
-                for i, tweet in enumerate(tweets):
+                for i, tweet in enumerate(self.budget.fit_tweets(tweets)):
                     formatted += f"\nTweet {i+1}: {tweet}"
                     
         return formatted
 
-    def _get_completion(self, prompt, system_message):
-        """Helper to get OpenAI completion with consistent parameters."""
-        return self.client.chat.completions.create(
-            model=self.model_name,
-            messages=[
+    def _account_block(self, account_details):
+        """Formatted account details, built once per account object and reused by every stage."""
+        if isinstance(account_details, dict):
+            return self._format_account_details(account_details)
+        return memoized_account_block(account_details, type(self).__name__, self._format_account_details)
+
+    def _completion_params(self, prompt, system_message, account_block=None, **options):
+        """Request parameters shared by every completion call, plus per-call options.
+
+        With an account block the messages use the shared-prefix stage layout;
+        without one they are a plain system + user pair.
+        """
+        if account_block is None:
+            messages = [
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": prompt}
-            ],
-            temperature=self.temperature
-        )
+            ]
+        else:
+            messages = build_stage_messages(account_block, system_message, prompt)
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": self.temperature,
+            **options
+        }
+
+    def _record_prompt_layout(self, stage, params, response):
+        if stage is None:
+            return
+        details = getattr(response.usage, "prompt_tokens_details", None) if response.usage else None
+        self.prompt_stats.record(stage, params["messages"], getattr(details, "cached_tokens", None))
+
+    def _cache_lookup(self, params):
+        """Return (cache key, cached response or None); the key is None when caching is off."""
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(params)
+        cached = None if retrying.get() else self.cache.get(key)
+        if cached is None:
+            return key, None
+        logging.debug(f"Response cache hit for {key[:12]}")
+        return key, ChatCompletion.model_validate_json(cached)
+
+    def _cache_store(self, key, response):
+        if key is not None:
+            self.cache.put(key, response.model_dump_json())
+
+    def _send(self, params, on_retry=None):
+        """Send a request, through the shared rate limiter when one is configured."""
+        def create():
+            with tracing.span("http", "http", model=params["model"]):
+                return self.client.chat.completions.create(**params)
+
+        if self.rate_limiter is None:
+            return create()
+        return self.rate_limiter.call(create, estimate_tokens(params), on_retry)
+
+    async def _asend(self, params, on_retry=None):
+        """Async counterpart of _send."""
+        async def create():
+            with tracing.span("http", "http", model=params["model"]):
+                return await self.async_client.chat.completions.create(**params)
+
+        if self.rate_limiter is None:
+            return await create()
+        return await self.rate_limiter.acall(create, estimate_tokens(params), on_retry)
+
+    def _get_completion(self, prompt, system_message, stage=None, account_block=None, account_id=None, **options):
+        """Helper to get OpenAI completion with consistent parameters."""
+        params = self._completion_params(prompt, system_message, account_block, **options)
+        key, cached = self._cache_lookup(params)
+        if cached is not None:
+            self.usage.record(stage, params["model"], cached, 0.0, account_id=account_id, cache_hit=True)
+            return cached
+        retries = []
+        start = time.perf_counter()
+        response = self._send(params, on_retry=lambda: retries.append(1))
+        self.usage.record(stage, params["model"], response, time.perf_counter() - start,
+                          retries=len(retries), account_id=None if abandoned() else account_id)
+        self._cache_store(key, response)
+        self._record_prompt_layout(stage, params, response)
+        return response
+
+    async def _aget_completion(self, prompt, system_message, stage=None, account_block=None, account_id=None, **options):
+        """Async counterpart of _get_completion using the shared AsyncOpenAI client."""
+        params = self._completion_params(prompt, system_message, account_block, **options)
+        key, cached = self._cache_lookup(params)
+        if cached is not None:
+            self.usage.record(stage, params["model"], cached, 0.0, account_id=account_id, cache_hit=True)
+            return cached
+        retries = []
+        start = time.perf_counter()
+        response = await self._asend(params, on_retry=lambda: retries.append(1))
+        self.usage.record(stage, params["model"], response, time.perf_counter() - start,
+                          retries=len(retries), account_id=account_id)
+        self._cache_store(key, response)
+        self._record_prompt_layout(stage, params, response)
+        return response
+
+    def _get_streamed_completion(self, prompt, system_message, stage=None, account_block=None, account_id=None,
+                                 until=None, on_rest=None, **options):
+        """Stream a completion and stop reading once until(text so far) returns something other than None.
+
+        until is consulted at every line end. At that point the stream is
+        closed, which cancels the rest of the generation, or with on_rest it is
+        drained on a background thread that hands the full text to on_rest.
+        Returns a ChatCompletion with the text read so far; completion tokens
+        of a cancelled stream are estimated from that text.
+        """
+        params = self._completion_params(prompt, system_message, account_block, stream=True,
+                                         stream_options={"include_usage": True}, **options)
+        key, cached = self._cache_lookup(params)
+        if cached is not None:
+            self.usage.record(stage, params["model"], cached, 0.0, account_id=account_id, cache_hit=True)
+            return cached
+        retries = []
+        start = time.perf_counter()
+        stream = self._send(params, on_retry=lambda: retries.append(1))
+        reply = _StreamedReply(params)
+        handed_off = False
+        try:
+            with tracing.span("stream", "http"):
+                for chunk in stream:
+                    if reply.add(chunk) and until is not None and until(reply.text) is not None:
+                        break
+                else:
+                    reply.finished = True
+            response = reply.completion()
+            self.usage.record(stage, params["model"], response, time.perf_counter() - start,
+                              retries=len(retries), account_id=account_id)
+            self._record_prompt_layout(stage, params, response)
+            if on_rest is not None and not reply.finished:
+                self._track(threading.Thread(target=self._drain, args=(stream, reply, stage, key, on_rest), daemon=True))
+                handed_off = True
+            else:
+                self._cache_store(key, response)
+        finally:
+            if not handed_off:
+                stream.close()
+        return response
+
+    async def _aget_streamed_completion(self, prompt, system_message, stage=None, account_block=None, account_id=None,
+                                        until=None, on_rest=None, **options):
+        """Async counterpart of _get_streamed_completion; the rest is drained in a task on the event loop."""
+        params = self._completion_params(prompt, system_message, account_block, stream=True,
+                                         stream_options={"include_usage": True}, **options)
+        key, cached = self._cache_lookup(params)
+        if cached is not None:
+            self.usage.record(stage, params["model"], cached, 0.0, account_id=account_id, cache_hit=True)
+            return cached
+        retries = []
+        start = time.perf_counter()
+        stream = await self._asend(params, on_retry=lambda: retries.append(1))
+        reply = _StreamedReply(params)
+        handed_off = False
+        try:
+            with tracing.span("stream", "http"):
+                async for chunk in stream:
+                    if reply.add(chunk) and until is not None and until(reply.text) is not None:
+                        break
+                else:
+                    reply.finished = True
+            response = reply.completion()
+            self.usage.record(stage, params["model"], response, time.perf_counter() - start,
+                              retries=len(retries), account_id=account_id)
+            self._record_prompt_layout(stage, params, response)
+            if on_rest is not None and not reply.finished:
+                self._track(asyncio.ensure_future(self._adrain(stream, reply, stage, key, on_rest)))
+                handed_off = True
+            else:
+                self._cache_store(key, response)
+        finally:
+            if not handed_off:
+                await stream.close()
+        return response
+
+    def _track(self, task):
+        with self._background_lock:
+            self._background.add(task)
+        if isinstance(task, threading.Thread):
+            task.start()
+        else:
+            task.add_done_callback(self._untrack)
+
+    def _untrack(self, task):
+        with self._background_lock:
+            self._background.discard(task)
+
+    def _drain(self, stream, reply, stage, key, on_rest):
+        try:
+            for chunk in stream:
+                reply.add(chunk)
+            self._finish_drain(reply, stage, key, on_rest)
+        except Exception as e:
+            logging.warning(f"Background {stage} stream failed: {e}")
+        finally:
+            stream.close()
+            self._untrack(threading.current_thread())
+
+    async def _adrain(self, stream, reply, stage, key, on_rest):
+        try:
+            async for chunk in stream:
+                reply.add(chunk)
+            self._finish_drain(reply, stage, key, on_rest)
+        except Exception as e:
+            logging.warning(f"Background {stage} stream failed: {e}")
+        finally:
+            await stream.close()
+
+    def _finish_drain(self, reply, stage, key, on_rest):
+        """Bill the tokens that arrived after the call returned, cache the full reply and pass it on."""
+        recorded = reply.recorded_completion_tokens
+        reply.finished = True
+        response = reply.completion()
+        self.usage.add_completion_tokens(stage, response.model, response.usage.completion_tokens - recorded)
+        self._cache_store(key, response)
+        on_rest(response.choices[0].message.content)
+
+    def _stream_stage(self, stage, account_details, prompt, system_message, until):
+        """Stream one debate stage about an account, reading it only as far as until needs."""
+        return self._get_streamed_completion(prompt, system_message, stage=stage,
+                                             account_block=self._account_block(account_details),
+                                             account_id=getattr(account_details, 'account_id', None),
+                                             until=until, on_rest=self._rest_sink(stage, account_details),
+                                             **self._stage_options(stage))
+
+    async def _astream_stage(self, stage, account_details, prompt, system_message, until):
+        """Async counterpart of _stream_stage."""
+        return await self._aget_streamed_completion(prompt, system_message, stage=stage,
+                                                    account_block=self._account_block(account_details),
+                                                    account_id=getattr(account_details, 'account_id', None),
+                                                    until=until, on_rest=self._rest_sink(stage, account_details),
+                                                    **self._stage_options(stage))
+
+    def _rest_sink(self, stage, account_details):
+        """on_rest callback for the background mode, or None to cancel streams once until is satisfied."""
+        if self.judge_streaming != 'background':
+            return None
+        account_id = getattr(account_details, 'account_id', None)
+
+        def deliver(text):
+            if self.judge_text_sink is not None and account_id is not None:
+                self.judge_text_sink(account_id, stage, text)
+        return deliver
+
+    def stage_params(self, stage, account_details, *texts):
+        """Request parameters of one debate stage about an account, for sending it some other way, such as a batch job.
+
+        texts are the stage's inputs: none for the openings, the opposing
+        opening for a critique and the four debate texts for the judge.
+        """
+        prompts = {
+            'bot_agent': self._bot_agent_prompt,
+            'human_agent': self._human_agent_prompt,
+            'bot_critic': lambda human_arguments: self._bot_critic_prompt(
+                *self.budget.compact("bot_critic", human_arguments)),
+            'human_critic': lambda bot_arguments: self._human_critic_prompt(
+                *self.budget.compact("human_critic", bot_arguments)),
+            'judge': self._judge_stage_prompt,
+        }
+        options = self._stage_options(stage, **(self._judge_options() if stage == 'judge' else {}))
+        return self._completion_params(*prompts[stage](*texts), self._account_block(account_details), **options)
+
+    def stage_result(self, stage, texts):
+        """What a stage returns for its reply texts: the judge's verdict (raising IndexError if none parses), otherwise the text."""
+        return self._vote(texts) if stage == 'judge' else texts[0]
+
+    def _stage_response(self, stage, account_details, prompt, system_message, **options):
+        """Run one debate stage about an account and return the whole completion, hedged when it runs slow."""
+        options = self._stage_options(stage, **options)
+        return self.resilience.hedge(stage, lambda: self._get_completion(
+            prompt, system_message, stage=stage, account_block=self._account_block(account_details),
+            account_id=getattr(account_details, 'account_id', None), **options))
+
+    async def _astage_response(self, stage, account_details, prompt, system_message, **options):
+        """Async counterpart of _stage_response."""
+        options = self._stage_options(stage, **options)
+        return await self.resilience.ahedge(stage, lambda: self._aget_completion(
+            prompt, system_message, stage=stage, account_block=self._account_block(account_details),
+            account_id=getattr(account_details, 'account_id', None), **options))
+
+    def _stage(self, stage, run):
+        """Run a stage under its trace span, retrying it if it fails."""
+        with tracing.span(stage, "stage"):
+            return self.resilience.call(stage, run)
+
+    async def _astage(self, stage, run):
+        """Async counterpart of _stage; run is a coroutine function."""
+        with tracing.span(stage, "stage"):
+            return await self.resilience.acall(stage, run)
+
+    def _stage_options(self, stage, **options):
+        """The stage's reply cap, model and temperature, under any options the caller passes."""
+        return {**self.budget.options(stage), **self.stage_models.options(stage), **options}
+
+    def _run_stage(self, stage, account_details, prompt, system_message, **options):
+        """Run one debate stage about an account and return the text of the reply, retrying the stage if it fails."""
+        return self._stage(stage, lambda: self._stage_response(
+            stage, account_details, prompt, system_message, **options).choices[0].message.content)
+
+    async def _arun_stage(self, stage, account_details, prompt, system_message, **options):
+        """Async counterpart of _run_stage."""
+        async def run():
+            response = await self._astage_response(stage, account_details, prompt, system_message, **options)
+            return response.choices[0].message.content
+        return await self._astage(stage, run)
+
+class _StreamedReply:
+    """Text and metadata accumulated from the chunks of one streamed completion."""
+
+    def __init__(self, params):
+        self.params = params
+        self.text = ""
+        self.id = None
+        self.model = params["model"]
+        self.created = int(time.time())
+        self.usage = None
+        self.finished = False
+        self.recorded_completion_tokens = 0
+
+    def add(self, chunk):
+        """Take in one chunk; True if it completed a line."""
+        self.id = self.id or chunk.id
+        self.model = chunk.model or self.model
+        self.created = chunk.created or self.created
+        if chunk.usage is not None:
+            self.usage = chunk.usage
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            return False
+        piece = chunk.choices[0].delta.content
+        self.text += piece
+        return "\n" in piece
+
+    def completion(self):
+        """The reply so far as a ChatCompletion, with estimated usage unless the API reported it."""
+        if self.usage is not None and self.finished:
+            usage = self.usage.model_dump()
+        else:
+            prompt_chars = sum(len(message["content"]) for message in self.params["messages"])
+            completion_tokens = len(self.text) // CHARS_PER_TOKEN
+            usage = {"prompt_tokens": prompt_chars // CHARS_PER_TOKEN, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_chars // CHARS_PER_TOKEN + completion_tokens}
+        self.recorded_completion_tokens = usage["completion_tokens"]
+        return ChatCompletion.model_validate({
+            "id": self.id or "streamed", "object": "chat.completion", "created": self.created, "model": self.model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": self.text}}],
+            "usage": usage,
+        })
 
 class RobustOpenAIInterface(OpenAIInterface):
     def _format_account_details(self, account):
@@ -190,7 +807,7 @@ class RobustOpenAIInterface(OpenAIInterface):
             return super()._format_account_details(account)
             
         # Handle RobustTwitterAccount objects
-        tweets_formatted = "\n".join([f"Tweet {i+1}: {tweet}" for i, tweet in enumerate(account.tweets)])
+        tweets_formatted = "\n".join([f"Tweet {i+1}: {tweet}" for i, tweet in enumerate(self.budget.fit_tweets(account.tweets))])
         
         return f"""Username: @{account.username}
 Handle: {account.handle}
@@ -204,44 +821,34 @@ Followers: {account.followers}
 Recent Tweets:
 {tweets_formatted}"""
 
-    def get_bot_agent_arguments(self, account):
-        """Generate bot detection arguments for RobustTwitterAccount."""
-        prompt = f"""\
-As a Bot Detection Expert, analyze this Twitter account:
-
-{self._format_account_details(account)}
+    def _bot_agent_prompt(self):
+        """Prompt for bot detection arguments for RobustTwitterAccount."""
+        prompt = """\
+As a Bot Detection Expert, analyze the Twitter account described above.
 
 Provide arguments suggesting this is a bot account. Focus on:
 1. Account metadata (followers, following, creation date)
 2. Tweet content and patterns
 3. Profile completeness
 4. Behavioral indicators"""
-        
-        response = self._get_completion(prompt, "You are an expert in detecting Twitter bots.")
-        return response.choices[0].message.content
+        return prompt, "You are an expert in detecting Twitter bots."
 
-    def get_human_agent_arguments(self, account):
-        """Generate human behavior arguments for RobustTwitterAccount."""
-        prompt = f"""\
-As a Human Behavior Expert, analyze this Twitter account:
-
-{self._format_account_details(account)}
+    def _human_agent_prompt(self):
+        """Prompt for human behavior arguments for RobustTwitterAccount."""
+        prompt = """\
+As a Human Behavior Expert, analyze the Twitter account described above.
 
 Provide arguments suggesting this is a human account. Focus on:
 1. Natural language patterns in tweets
 2. Personal details and authenticity
 3. Engagement patterns
 4. Account history indicators"""
-        
-        response = self._get_completion(prompt, "You are an expert in human social media behavior.")
-        return response.choices[0].message.content
+        return prompt, "You are an expert in human social media behavior."
 
-    def get_final_classification(self, account, bot_args, human_args, bot_critique, human_critique):
-        """Make final classification for RobustTwitterAccount."""
+    def _judge_prompt(self, bot_args, human_args, bot_critique, human_critique):
+        """Prompt for the final classification for RobustTwitterAccount."""
         prompt = f"""\
-As an impartial judge, evaluate this Twitter account:
-
-{self._format_account_details(account)}
+As an impartial judge, evaluate the Twitter account described above.
 
 Bot Expert Arguments:
 {bot_args}
@@ -268,7 +875,5 @@ Example 3: **Classification:** Yes
 Example 4: **Classification:** No
 
 """
-        
-        response = self._get_completion(prompt, "You are an impartial judge evaluating expert arguments.")
-        return response.choices[0].message.content
+        return prompt, "You are an impartial judge evaluating expert arguments."
 
@@ -0,0 +1,120 @@
+import argparse
+import logging
+import os
+from itertools import islice
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer, StandardScaler
+from .account_store import RobustAccountView
+from .dataset_reader import iter_dataset
+from .journal import new_result
+from .robust_dataset_reader import iter_robust_dataset
+from .robust_twitter_account import RobustTwitterAccount
+
+STANDARD_FEATURES = ['follower_count', 'retweet_count', 'mention_count', 'avg_daily_retweets',
+                     'verified', 'hashtag_count']
+ROBUST_FEATURES = ['followers', 'following', 'tweet_count', 'follower_ratio',
+                   'has_description', 'has_location', 'has_webpage']
+
+def feature_matrix(accounts):
+    """Numeric feature matrix for a list of accounts of one dataset type."""
+    if accounts and isinstance(accounts[0], (RobustTwitterAccount, RobustAccountView)):
+        rows = [(a.followers, a.following, len(a.tweets), a.followers / max(a.following, 1),
+                 bool(a.description), bool(a.location), bool(a.webpage)) for a in accounts]
+        width = len(ROBUST_FEATURES)
+    else:
+        rows = [(a.follower_count, a.retweet_count, a.mention_count, a.avg_daily_retweets,
+                 a.verified, len(a.hashtags)) for a in accounts]
+        width = len(STANDARD_FEATURES)
+    return np.asarray(rows, dtype=np.float64).reshape(len(rows), width)
+
+class PreClassifier:
+    """Cheap feature-based first stage of the detection cascade.
+
+    Accounts whose bot probability falls outside the (low, high) confidence
+    band are decided locally; only the uncertain middle is escalated to the
+    five-call debate.
+    """
+
+    def __init__(self, low=0.1, high=0.9, model=None):
+        self.low = low
+        self.high = high
+        self.model = model or make_pipeline(
+            FunctionTransformer(np.log1p),  # Counts are heavy-tailed and non-negative
+            StandardScaler(),
+            LogisticRegression(class_weight='balanced', max_iter=1000))
+
+    def fit(self, accounts):
+        accounts = list(accounts)
+        labels = np.array([int(a.bot_label) for a in accounts])
+        self.model.fit(feature_matrix(accounts), labels)
+        return self
+
+    def predict_proba(self, accounts):
+        """Bot probability for each account, computed in one vectorized call."""
+        return self.model.predict_proba(feature_matrix(accounts))[:, 1]
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump(self.model, path)
+
+    @classmethod
+    def load(cls, path, low=0.1, high=0.9):
+        return cls(low=low, high=high, model=joblib.load(path))
+
+    def cascade(self, accounts, on_decided, batch_size=1024):
+        """Split a stream of accounts into local decisions and escalations.
+
+        Accounts are scored in batches; confident ones are passed to on_decided
+        as finished result records, and the uncertain ones are yielded for the
+        debate in their original order.
+        """
+        accounts = iter(accounts)
+        while batch := list(islice(accounts, batch_size)):
+            probabilities = self.predict_proba(batch)
+            for account, probability in zip(batch, probabilities):
+                if self.low < probability < self.high:
+                    yield account
+                    continue
+                result = new_result(account)
+                result['prediction'] = int(probability >= self.high)
+                result['decided_by'] = 'pre_classifier'
+                result['stages']['pre_classifier'] = f"p(bot)={probability:.3f}"
+                on_decided(result)
+
+def pre_classifier_from_env():
+    """Load the model named by PRE_CLASSIFIER_MODEL, or None to debate every account."""
+    path = os.getenv("PRE_CLASSIFIER_MODEL")
+    if not path:
+        return None
+    low = float(os.getenv("PRE_CLASSIFIER_LOW", 0.1))
+    high = float(os.getenv("PRE_CLASSIFIER_HIGH", 0.9))
+    logging.info(f"Loading pre-classifier from {path} with confidence band ({low}, {high})")
+    return PreClassifier.load(path, low=low, high=high)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the feature-based pre-classifier.")
+    parser.add_argument("dataset", help="labelled CSV to train on")
+    parser.add_argument("--robust", action="store_true", help="dataset uses the robust column layout")
+    parser.add_argument("--output", default="models/pre_classifier.joblib")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    reader = iter_robust_dataset if args.robust else iter_dataset
+    accounts = list(reader(args.dataset, args.limit))
+    classifier = PreClassifier()
+    labels = np.array([int(a.bot_label) for a in accounts])
+    folds = min(5, int(np.bincount(labels).min()))
+    if folds >= 2:
+        scores = cross_val_score(classifier.model, feature_matrix(accounts), labels, cv=folds)
+        print(f"Cross-validated accuracy: {scores.mean():.2f} (+/- {scores.std():.2f})")
+    classifier.fit(accounts).save(args.output)
+    print(f"Trained on {len(accounts)} accounts; model saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
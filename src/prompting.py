@@ -1,4 +1,6 @@
 import logging
+import threading
+from .rate_limiter import CHARS_PER_TOKEN
 
 def create_analysis_prompt(account_details):
     """Create a detailed prompt for OpenAI analysis including all account characteristics."""
@@ -34,4 +36,54 @@ Followers: {account.followers}
 Recent Tweets:
 {tweet_text}
 
-Based on these characteristics and tweet content, provide a detailed analysis of whether this account shows signs of being a bot or a genuine human user."""
\ No newline at end of file
+Based on these characteristics and tweet content, provide a detailed analysis of whether this account shows signs of being a bot or a genuine human user."""
+# Shared by every debate stage so the provider can cache the system text and account block as one prefix
+DEBATE_SYSTEM_PREFIX = """\
+You are taking part in a structured debate that decides whether a Twitter account is run by a bot or by a genuine human.
+The account under review is described in the next message. The message after it assigns your role and your task for this step of the debate."""
+
+def build_stage_messages(account_block, role_message, task_prompt):
+    """Order a stage's messages so the shared system text and account block come first.
+
+    The stage's role goes into the task message: many OpenAI-compatible
+    backends reject or ignore a system message after the first user turn.
+    """
+    return [
+        {"role": "system", "content": DEBATE_SYSTEM_PREFIX},
+        {"role": "user", "content": f"**Account Details:**\n{account_block}"},
+        {"role": "user", "content": f"{role_message}\n\n{task_prompt}"}
+    ]
+
+SHARED_PREFIX_MESSAGES = 2  # Leading messages of build_stage_messages that are identical across stages
+
+def memoized_account_block(account, key, formatter):
+    """Format an account once per key and keep the text on the account for the other stages."""
+    blocks = getattr(account, '_prompt_blocks', None)
+    if blocks is None:
+        blocks = account._prompt_blocks = {}
+    if key not in blocks:
+        blocks[key] = formatter(account)
+    return blocks[key]
+
+class PromptLayoutStats:
+    """Per-stage prompt sizes, showing how much of each prompt is the shared cacheable prefix."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, stage, messages, cached_tokens=None):
+        prompt_tokens = sum(len(message["content"]) for message in messages) // CHARS_PER_TOKEN
+        prefix_tokens = sum(len(message["content"]) for message in messages[:SHARED_PREFIX_MESSAGES]) // CHARS_PER_TOKEN
+        with self._lock:
+            stats = self._stages.setdefault(stage, {'calls': 0, 'prompt_tokens': 0, 'prefix_tokens': 0, 'cached_tokens': 0})
+            stats['calls'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['prefix_tokens'] += prefix_tokens
+            stats['cached_tokens'] += cached_tokens or 0
+
+    def report(self):
+        """Rows of (stage, calls, mean prompt tokens, mean shared prefix tokens, provider-cached tokens)."""
+        with self._lock:
+            return [(stage, s['calls'], s['prompt_tokens'] / s['calls'], s['prefix_tokens'] / s['calls'],
+                     s['cached_tokens']) for stage, s in self._stages.items()]
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from openai import RateLimitError
+
+CHARS_PER_TOKEN = 4  # Rough English average, good enough for budgeting before the reply arrives
+
+def estimate_tokens(params, expected_completion_tokens=512):
+    """Estimate the tokens a chat request will consume before it is sent."""
+    prompt_chars = sum(len(message["content"]) for message in params["messages"])
+    completion = params.get("max_tokens") or expected_completion_tokens
+    return prompt_chars // CHARS_PER_TOKEN + completion * params.get("n", 1)
+
+def retry_after_seconds(error):
+    """Read the server's Retry-After hint from a 429 error, or None if it sent none."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+class RateLimiter:
+    """Shared scheduler that keeps every completion call inside the account's quotas.
+
+    Requests-per-minute and tokens-per-minute are enforced with token buckets.
+    The number of calls in flight follows AIMD: it grows by one per window of
+    successful calls and halves on every 429, while Retry-After pauses all callers.
+    One instance can be shared by worker threads and coroutines alike.
+    """
+
+    POLL_INTERVAL = 0.02  # Seconds to wait when only the concurrency window is full
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None,
+                 max_concurrency=64, initial_concurrency=8, max_retries=6, backoff=1.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(min(initial_concurrency, max_concurrency))
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self._request_tokens = float(requests_per_minute or 0)
+        self._budget_tokens = float(tokens_per_minute or 0)
+        self._refilled_at = now
+        self._blocked_until = 0.0
+        self._in_flight = 0
+
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+
+    def _refill(self, now):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.requests_per_minute:
+            self._request_tokens = min(self.requests_per_minute,
+                                       self._request_tokens + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._budget_tokens = min(self.tokens_per_minute,
+                                      self._budget_tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _try_acquire(self, tokens):
+        """Take a slot if every budget allows it; otherwise return how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._in_flight >= int(self.concurrency):
+                return self.POLL_INTERVAL
+            if self.requests_per_minute and self._request_tokens < 1:
+                return (1 - self._request_tokens) * 60 / self.requests_per_minute
+            # A single request larger than the whole bucket still goes through once it is full
+            needed = min(tokens, self.tokens_per_minute or 0)
+            if self.tokens_per_minute and self._budget_tokens < needed:
+                return (needed - self._budget_tokens) * 60 / self.tokens_per_minute
+            if self.requests_per_minute:
+                self._request_tokens -= 1
+            if self.tokens_per_minute:
+                self._budget_tokens -= tokens
+            self._in_flight += 1
+            self.requests += 1
+            return 0.0
+
+    def _release(self, estimated_tokens, used_tokens=None, retry_after=None, throttled=False):
+        with self._lock:
+            self._in_flight -= 1
+            if self.tokens_per_minute and used_tokens is not None:
+                # Settle the estimate against what the API actually billed
+                self._budget_tokens -= used_tokens - estimated_tokens
+            if throttled:
+                self.throttled += 1
+                self.concurrency = max(1.0, self.concurrency / 2)
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                logging.warning(f"Rate limited; concurrency reduced to {int(self.concurrency)}, "
+                                f"retry after {retry_after}s")
+            else:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+    def _backoff_delay(self, attempt, error):
+        delay = retry_after_seconds(error)
+        return delay if delay is not None else self.backoff * 2 ** attempt
+
+    def call(self, send, estimated_tokens, on_retry=None):
+        """Run send() inside the budgets, retrying 429s after the server's Retry-After."""
+        for attempt in range(self.max_retries + 1):
+            while (wait := self._try_acquire(estimated_tokens)) > 0:
+                time.sleep(wait)
+            try:
+                response = send()
+            except RateLimitError as e:
+                delay = self._backoff_delay(attempt, e)
+                self._release(estimated_tokens, retry_after=delay, throttled=True)
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                if on_retry is not None:
+                    on_retry()
+                time.sleep(delay)
+                continue
+            except Exception:
+                self._release(estimated_tokens)
+                raise
+            self._release(estimated_tokens, used_tokens=_used_tokens(response))
+            return response
+
+    async def acall(self, send, estimated_tokens, on_retry=None):
+        """Async counterpart of call(); send is a coroutine function."""
+        for attempt in range(self.max_retries + 1):
+            while (wait := self._try_acquire(estimated_tokens)) > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await send()
+            except RateLimitError as e:
+                delay = self._backoff_delay(attempt, e)
+                self._release(estimated_tokens, retry_after=delay, throttled=True)
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                if on_retry is not None:
+                    on_retry()
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._release(estimated_tokens)
+                raise
+            self._release(estimated_tokens, used_tokens=_used_tokens(response))
+            return response
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'retries': self.retries,
+            'concurrency': int(self.concurrency),
+        }
+
+def _used_tokens(response):
+    usage = getattr(response, "usage", None)
+    return usage.total_tokens if usage is not None else None
+
+def rate_limiter_from_env():
+    """Build the shared limiter from the RATE_LIMIT_* settings in .env, or None without an RPM or TPM quota.
+
+    Without a limiter the clients keep the SDK's own retries, which also
+    cover server errors and dropped connections that the limiter does not.
+    """
+    rpm = os.getenv("RATE_LIMIT_RPM")
+    tpm = os.getenv("RATE_LIMIT_TPM")
+    if not rpm and not tpm:
+        return None
+    max_concurrency = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", 64))
+    return RateLimiter(
+        requests_per_minute=float(rpm) if rpm else None,
+        tokens_per_minute=float(tpm) if tpm else None,
+        max_concurrency=max_concurrency,
+        initial_concurrency=int(os.getenv("RATE_LIMIT_INITIAL_CONCURRENCY", min(8, max_concurrency))),
+        max_retries=int(os.getenv("RATE_LIMIT_MAX_RETRIES", 6)),
+    )
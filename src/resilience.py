@@ -0,0 +1,250 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from openai import APIConnectionError, APIStatusError
+
+# Set while a stage is being retried: its response must come from the API, not from a cached bad reply
+retrying = contextvars.ContextVar('retrying', default=False)
+# Per-request flag of a hedged request, raised once the other request has won
+_abandoned = contextvars.ContextVar('abandoned', default=None)
+
+def abandoned():
+    """True inside a hedged request whose answer is no longer wanted; its usage is not the account's."""
+    flag = _abandoned.get()
+    return flag is not None and flag.is_set()
+
+def _run_hedged(flag, send):
+    _abandoned.set(flag)
+    return send()
+
+def is_retryable(error):
+    """Server errors, timeouts, dropped connections and unparsable replies are worth another attempt.
+
+    Client errors are not, and neither are 429s: the rate limiter has already
+    retried those as often as it is allowed to. Other exceptions are bugs,
+    which a retry would only repeat. The reply parsers raise IndexError or
+    ValueError.
+    """
+    if isinstance(error, APIStatusError):
+        return error.status_code >= 500 or error.status_code in (408, 409)
+    # APITimeoutError is an APIConnectionError
+    return isinstance(error, (APIConnectionError, IndexError, ValueError))
+
+class _StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.recovered = 0
+        self.failed = 0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+class StageResilience:
+    """Stage-level retries and hedged requests for the debate calls.
+
+    call() runs a stage (request plus parsing) up to 1 + retries times with
+    jittered exponential backoff, so a failed stage is re-run on its own and
+    the account keeps every stage that already succeeded. hedge() wraps a
+    single request: once it has been outstanding longer than the stage's
+    hedge_percentile latency, a duplicate is sent and the first good answer
+    wins. Hedging starts after min_samples calls of the stage and stops while
+    hedges exceed max_hedge_rate of its requests.
+    """
+
+    def __init__(self, retries=0, backoff=0.5, max_backoff=8.0, hedge_percentile=None, min_samples=20,
+                 max_hedge_rate=0.1, usage=None, hedge_threads=128):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self.usage = usage  # Source of the per-stage latency percentiles; set by the interface
+        self.hedge_threads = hedge_threads
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._pool = None
+
+    def _stats(self, stage):
+        return self._stages.setdefault(stage or 'other', _StageStats())
+
+    def _delay(self, attempt):
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _attempt(self, stage, attempt, error):
+        """Count a failed attempt; True if the stage should be tried again."""
+        with self._lock:
+            stats = self._stats(stage)
+            if attempt < self.retries and is_retryable(error):
+                stats.retries += 1
+                retry = True
+            else:
+                stats.failed += 1
+                retry = False
+        logging.warning(f"{stage} stage failed (attempt {attempt + 1}): {error}"
+                        f"{'; retrying' if retry else ''}")
+        return retry
+
+    def _succeeded(self, stage, attempt):
+        with self._lock:
+            stats = self._stats(stage)
+            stats.calls += 1
+            if attempt:
+                stats.recovered += 1
+
+    def call(self, stage, run):
+        """Run a stage, retrying it after retryable failures."""
+        for attempt in range(self.retries + 1):
+            token = retrying.set(attempt > 0)
+            try:
+                result = run()
+            except Exception as e:
+                if not self._attempt(stage, attempt, e):
+                    raise
+                time.sleep(self._delay(attempt))
+                continue
+            finally:
+                retrying.reset(token)
+            self._succeeded(stage, attempt)
+            return result
+
+    async def acall(self, stage, run):
+        """Async counterpart of call(); run is a coroutine function."""
+        for attempt in range(self.retries + 1):
+            token = retrying.set(attempt > 0)
+            try:
+                result = await run()
+            except Exception as e:
+                if not self._attempt(stage, attempt, e):
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                continue
+            finally:
+                retrying.reset(token)
+            self._succeeded(stage, attempt)
+            return result
+
+    def hedge_delay(self, stage):
+        """Seconds after which a request of this stage is hedged, or None to send it alone."""
+        if self.hedge_percentile is None or self.usage is None:
+            return None
+        with self._lock:
+            stats = self._stats(stage)
+            stats.requests += 1
+            if stats.hedges >= self.max_hedge_rate * stats.requests:
+                return None
+        return self.usage.latency_percentile(stage, self.hedge_percentile, self.min_samples)
+
+    def _hedged(self, stage, duplicate_won):
+        with self._lock:
+            stats = self._stats(stage)
+            stats.hedges += 1
+            stats.hedge_wins += duplicate_won
+
+    def hedge(self, stage, send):
+        """Send a request, duplicating it once it runs past the stage's hedge delay.
+
+        Threads cannot be cancelled, so the losing request runs to completion
+        on the hedge pool; its answer is dropped and its usage counts only in
+        the stage totals.
+        """
+        delay = self.hedge_delay(stage)
+        if delay is None:
+            return send()
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.hedge_threads, thread_name_prefix="hedge")
+        flags = {}
+
+        def submit():
+            flag = threading.Event()
+            future = self._pool.submit(contextvars.copy_context().run, _run_hedged, flag, send)
+            flags[future] = flag
+            return future
+
+        primary = submit()
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        duplicate = submit()
+        pending = {primary, duplicate}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None or not pending:
+                    for loser in pending:
+                        flags[loser].set()
+                    self._hedged(stage, future is duplicate)
+                    return future.result()
+
+    async def ahedge(self, stage, send):
+        """Async counterpart of hedge(); the losing request is cancelled."""
+        delay = self.hedge_delay(stage)
+        if delay is None:
+            return await send()
+        primary = asyncio.ensure_future(send())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        duplicate = asyncio.ensure_future(send())
+        pending = {primary, duplicate}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        self._hedged(stage, task is duplicate)
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def summary(self):
+        """One row per stage with its retry and hedge counts and rates."""
+        with self._lock:
+            rows = []
+            for stage, s in sorted(self._stages.items()):
+                runs = s.calls + s.failed
+                rows.append({
+                    'stage': stage, 'calls': s.calls, 'retries': s.retries, 'recovered': s.recovered,
+                    'failed': s.failed, 'retry_rate': s.retries / runs if runs else 0.0,
+                    'requests': s.requests, 'hedges': s.hedges, 'hedge_wins': s.hedge_wins,
+                    'hedge_rate': s.hedges / s.requests if s.requests else 0.0,
+                })
+            return rows
+
+    def to_prometheus(self):
+        """Retry and hedge counters per stage in the Prometheus text exposition format."""
+        lines = []
+        counters = [
+            ('stage_retries', 'Stage attempts retried after a failure', 'retries'),
+            ('stage_failures', 'Stages that failed after their last attempt', 'failed'),
+            ('hedged_requests', 'Requests duplicated after running past the hedge delay', 'hedges'),
+            ('hedge_wins', 'Hedged requests answered first by the duplicate', 'hedge_wins'),
+        ]
+        rows = self.summary()
+        for name, help_text, key in counters:
+            lines.append(f"# HELP botdetector_{name}_total {help_text}")
+            lines.append(f"# TYPE botdetector_{name}_total counter")
+            for row in rows:
+                lines.append(f'botdetector_{name}_total{{stage="{row["stage"]}"}} {row[key]}')
+        return "\n".join(lines) + "\n"
+
+def resilience_from_env():
+    """Build the retry and hedging policy from the STAGE_RETRY_* and HEDGE_* settings in .env."""
+    percentile = os.getenv("HEDGE_PERCENTILE")
+    return StageResilience(
+        retries=int(os.getenv("STAGE_RETRIES", 2)),
+        backoff=float(os.getenv("STAGE_RETRY_BACKOFF", 0.5)),
+        hedge_percentile=float(percentile) if percentile else None,
+        min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", 20)),
+        max_hedge_rate=float(os.getenv("HEDGE_MAX_RATE", 0.1)),
+    )
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+class ResponseCache:
+    """Disk-backed, content-addressed cache of chat completion responses.
+
+    Entries are keyed by a SHA-256 of the request parameters (model, temperature,
+    messages and any other sampling options), so an unchanged prompt is served
+    from disk while an edited one misses and is paid for once.
+    """
+
+    EVICT_EVERY = 100  # Check the size limit once per this many inserts
+
+    def __init__(self, path, max_entries=None, ttl_seconds=None, bypass=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bypass = bypass  # Skip lookups but keep storing fresh responses
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self.evict()
+        logging.info(f"Response cache opened at {path}")
+
+    @staticmethod
+    def make_key(params):
+        """Hash the request parameters into a stable cache key."""
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the stored response JSON for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            if self.bypass:
+                self.misses += 1
+                return None
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response_json):
+        """Store a response, evicting old entries when the size limit is exceeded."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response_json, now, now))
+            self._conn.commit()
+            self._puts += 1
+            should_evict = self._puts % self.EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        with self._lock:
+            if self.ttl_seconds is not None:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            if self.max_entries is not None:
+                self._conn.execute("""
+                    DELETE FROM responses WHERE key NOT IN (
+                        SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?
+                    )""", (self.max_entries,))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def response_cache_from_env(temperature):
+    """Build the cache configured in .env, or None when RESPONSE_CACHE is off.
+
+    Without a RESPONSE_CACHE setting the cache is on only at temperature 0:
+    above it, replaying stored replies would stop every re-run from sampling
+    fresh debates.
+    """
+    mode = (os.getenv("RESPONSE_CACHE") or ("on" if temperature == 0 else "off")).lower()
+    if mode == "off":
+        return None
+    max_entries = os.getenv("RESPONSE_CACHE_MAX_ENTRIES")
+    ttl_hours = os.getenv("RESPONSE_CACHE_TTL_HOURS")
+    return ResponseCache(
+        os.getenv("RESPONSE_CACHE_PATH", "cache/responses.sqlite3"),
+        max_entries=int(max_entries) if max_entries else None,
+        ttl_seconds=float(ttl_hours) * 3600 if ttl_hours else None,
+        bypass=mode == "refresh",
+    )
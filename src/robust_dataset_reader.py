@@ -2,17 +2,20 @@ import csv
 import logging
 import os
 from pathlib import Path
+import pandas as pd
+from .account_store import CHUNK_ROWS, RobustAccountStore
 from .robust_twitter_account import RobustTwitterAccount
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def read_robust_dataset(filepath):
-    accounts = []
+def iter_robust_dataset(filepath, limit=None):
+    """Yield accounts as rows are parsed, in a single pass, stopping after limit accounts."""
     if not os.path.exists(filepath):
         logger.error(f"File not found: {filepath}")
-        return accounts
-        
+        return
+
+    loaded = 0
     try:
         with open(filepath, mode='r', encoding='utf-8') as csvfile:
             reader = csv.DictReader(
@@ -20,12 +23,10 @@ def read_robust_dataset(filepath):
                 dialect='excel',
                 quoting=csv.QUOTE_MINIMAL
             )
-            # Count total rows properly handling quoted fields
-            with open(filepath, 'r', encoding='utf-8') as countfile:
-                total_rows = sum(1 for _ in csv.DictReader(countfile, dialect='excel'))
-            logger.info(f"Processing {total_rows} accounts...")
             
             for i, row in enumerate(reader, 1):
+                if limit is not None and loaded >= limit:
+                    break
                 try:
                     tweets = [
                         row['tweet1'], row['tweet2'], row['tweet3'],
@@ -50,10 +51,11 @@ def read_robust_dataset(filepath):
                         tweets=tweets,
                         is_bot=row['is_bot']
                     )
-                    accounts.append(account)
+                    loaded += 1
+                    yield account
                     
                     if i % 100 == 0:
-                        logger.info(f"Processed {i}/{total_rows} accounts...")
+                        logger.info(f"Processed {i} rows...")
                         
                 except KeyError as e:
                     logger.error(f"Missing required field in row {i}: {e}")
@@ -65,8 +67,44 @@ def read_robust_dataset(filepath):
     except Exception as e:
         logger.error(f"Error reading file: {e}")
         
-    logger.info(f"Successfully loaded {len(accounts)} accounts")
-    return accounts
+    logger.info(f"Successfully loaded {loaded} accounts")
+
+def read_robust_dataset(filepath, limit=None):
+    return list(iter_robust_dataset(filepath, limit))
+
+def read_robust_dataset_columnar(filepath, limit=None, chunk_size=CHUNK_ROWS):
+    """Load the dataset in bulk into a RobustAccountStore, dropping rows with malformed counts.
+
+    Like iter_robust_dataset, limit counts the accounts loaded, not the rows read.
+    """
+    chunks = pd.read_csv(filepath, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    store = RobustAccountStore.from_chunks(_robust_columns(frame, counts) for frame, counts in _valid_rows(chunks, limit))
+    logger.info(f"Successfully loaded {len(store)} accounts")
+    return store
+
+def _valid_rows(chunks, limit):
+    """(frame, parsed counts) of each chunk's valid rows, reading no further than the first limit of them."""
+    remaining = limit
+    for frame in chunks:
+        counts = frame[['following', 'followers', 'is_bot']].apply(pd.to_numeric, errors='coerce')
+        invalid = counts.isna().any(axis=1)
+        if invalid.any():
+            logger.error(f"Skipping {int(invalid.sum())} rows with invalid counts or labels")
+            frame, counts = frame[~invalid], counts[~invalid]
+        if remaining is not None:
+            frame, counts = frame.iloc[:remaining], counts.iloc[:remaining]
+            remaining -= len(frame)
+        yield frame, counts
+        if remaining == 0:
+            return
+
+def _robust_columns(frame, counts):
+    return dict(
+        following=counts['following'].to_numpy(),
+        followers=counts['followers'].to_numpy(),
+        bot_label=counts['is_bot'].to_numpy() != 0,
+        **{name: frame[name] for name in RobustAccountStore.STRINGS}
+    )
 
 def main():
     dataset_path = "data/robust_dataset.csv"
@@ -15,6 +15,11 @@ class RobustTwitterAccount:
         self.tweets = tweets if tweets else []
         self.bot_label = bool(int(is_bot))
         
+    @property
+    def account_id(self):
+        """Stable identifier used to journal and shard results."""
+        return self.handle
+
     def get_account_details(self):
         return {
             'username': self.username,
@@ -0,0 +1,307 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import signal
+import time
+from dotenv import load_dotenv
+from .adaptive_debate import adaptive_policy_from_env
+from .debate_engine import process_account_async
+from . import tracing
+from .pre_classifier import pre_classifier_from_env
+from .rate_limiter import rate_limiter_from_env
+from .response_cache import response_cache_from_env
+from .robust_twitter_account import RobustTwitterAccount
+from .usage_metrics import LatencyHistogram
+
+MAX_BODY_BYTES = 8 * 2 ** 20
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 503: "Service Unavailable"}
+
+class ServiceOverloaded(Exception):
+    """The intake queue cannot take every account of a request; the client should retry later."""
+
+def account_from_json(data):
+    """Build a RobustTwitterAccount from a request's JSON object; the handle is required."""
+    if not isinstance(data, dict) or not data.get('handle'):
+        raise ValueError("Each account must be a JSON object with at least a 'handle'")
+    tweets = data.get('tweets') or []
+    if not isinstance(tweets, list):
+        raise ValueError("'tweets' must be a list of strings")
+    return RobustTwitterAccount(
+        data.get('username', data['handle']), data['handle'], data.get('description', ''),
+        data.get('location', ''), data.get('webpage', ''), data.get('joined', ''),
+        data.get('following', 0), data.get('followers', 0), [str(tweet) for tweet in tweets],
+        data.get('is_bot', 0))
+
+def _fingerprint(account):
+    """Key under which identical concurrent requests for an account share one debate."""
+    details = json.dumps(account.get_account_details(), sort_keys=True, default=str)
+    return hashlib.sha256(details.encode('utf-8')).hexdigest()
+
+def public_result(result, include_stages=False):
+    """The parts of a result record returned to clients; the dataset label is meaningless here."""
+    public = {key: value for key, value in result.items() if key not in ('true_label', 'stages')}
+    public['label'] = 'bot' if result['prediction'] else 'human'
+    if include_stages:
+        public['stages'] = result['stages']
+    return public
+
+class ScoringService:
+    """Long-running asyncio HTTP service that classifies accounts as they arrive.
+
+    Requests put their accounts on a bounded intake queue; a request that
+    does not fit is rejected with 503 rather than queued without limit.
+    Identical accounts already in flight share one debate. A batcher drains
+    the queue in micro-batches so the pre-classifier scores each batch in one
+    vectorized call, and a fixed pool of worker coroutines debates the
+    escalated accounts through one warm interface whose client keeps its
+    connections alive between requests.
+    """
+
+    def __init__(self, interface, max_concurrency=64, queue_size=1024, batch_size=32, batch_window=0.005,
+                 debate_mode="full", policy=None, pre_classifier=None):
+        self.interface = interface
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.debate_mode = debate_mode
+        self.policy = policy
+        self.pre_classifier = pre_classifier
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._work = asyncio.Queue(maxsize=max_concurrency)  # Holds the batcher back while every worker is busy
+        self._in_flight = {}
+        self._tasks = []
+        self._server = None
+        self.started_at = time.time()
+        self.counters = {'requests': 0, 'accounts': 0, 'coalesced': 0, 'rejected': 0, 'errors': 0,
+                         'pre_classified': 0, 'batches': 0}
+        self.latency = LatencyHistogram()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Start the batcher, the workers and the HTTP listener; port 0 picks a free port."""
+        self.interface.async_client  # Create the pooled client before the first request arrives
+        self._tasks = [asyncio.create_task(self._batcher())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        self._server = await asyncio.start_server(self._serve_connection, host, port, backlog=1024)
+        self.address = self._server.sockets[0].getsockname()[:2]
+        logging.info(f"Scoring service listening on http://{self.address[0]}:{self.address[1]}")
+        return self
+
+    async def stop(self, drain_timeout=30.0):
+        """Stop accepting connections, let accepted accounts finish, then shut the pipeline down."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        pending = [future for future in self._in_flight.values() if not future.done()]
+        if pending:
+            await asyncio.wait(pending, timeout=drain_timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.interface.aclose()
+
+    async def classify(self, accounts):
+        """Classify accounts and return their result records in request order.
+
+        Raises ServiceOverloaded without queueing anything if the intake
+        queue cannot take all of the new accounts.
+        """
+        loop = asyncio.get_running_loop()
+        keys = [_fingerprint(account) for account in accounts]
+        new = {key: account for key, account in zip(keys, accounts) if key not in self._in_flight}
+        if len(new) > self._queue.maxsize - self._queue.qsize():
+            self.counters['rejected'] += 1
+            raise ServiceOverloaded(f"Intake queue is full ({self._queue.qsize()} accounts waiting)")
+        self.counters['accounts'] += len(accounts)
+        self.counters['coalesced'] += len(accounts) - len(new)
+        for key, account in new.items():
+            self._in_flight[key] = loop.create_future()
+            self._queue.put_nowait((key, account))
+        # Shielded: a client that disconnects must not cancel debates other requests share
+        results = await asyncio.gather(*(asyncio.shield(self._in_flight[key]) for key in keys))
+        return [dict(result) for result in results]
+
+    async def _batcher(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.pre_classifier is not None and self.batch_window and self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.batch_window)  # Give concurrent requests a moment to join the batch
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self.counters['batches'] += 1
+            for item in self._pre_classify(batch):
+                await self._work.put(item)
+
+    def _pre_classify(self, batch):
+        """Resolve the batch's confident accounts locally and return the items left to debate."""
+        if self.pre_classifier is None:
+            return batch
+        # The cascade settles accounts strictly in order, each either decided or yielded
+        items = iter(batch)
+        escalated = []
+
+        def decided(result):
+            key, _ = next(items)
+            self.counters['pre_classified'] += 1
+            self._finish(key, result)
+
+        for _ in self.pre_classifier.cascade([account for _, account in batch], decided):
+            escalated.append(next(items))
+        return escalated
+
+    async def _worker(self):
+        while True:
+            key, account = await self._work.get()
+            result = await process_account_async(account, self.interface, self.debate_mode, self.policy)
+            self.latency.observe(result['elapsed'])
+            self.interface.usage.observe_account(result['elapsed'])
+            self._finish(key, result)
+
+    def _finish(self, key, result):
+        result['usage'] = self.interface.usage.pop_account(result['account_id'])
+        if result['error']:
+            self.counters['errors'] += 1
+        future = self._in_flight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'queued': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'in_flight': len(self._in_flight),
+        }
+
+    def metrics(self):
+        """Service counters and gauges followed by the interface's usage metrics, in Prometheus text format."""
+        lines = []
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE botdetector_service_{name}_total counter")
+            lines.append(f"botdetector_service_{name}_total {value}")
+        for name, value in (('queued', self._queue.qsize()), ('in_flight', len(self._in_flight))):
+            lines.append(f"# TYPE botdetector_service_{name} gauge")
+            lines.append(f"botdetector_service_{name} {value}")
+        lines.append("# TYPE botdetector_service_account_latency_seconds histogram")
+        for bound, count in self.latency.cumulative():
+            le = "+Inf" if bound == float('inf') else f"{bound:.4g}"
+            lines.append(f'botdetector_service_account_latency_seconds_bucket{{le="{le}"}} {count}')
+        lines.append(f"botdetector_service_account_latency_seconds_sum {self.latency.sum}")
+        lines.append(f"botdetector_service_account_latency_seconds_count {self.latency.total}")
+        return "\n".join(lines) + "\n" + self.interface.resilience.to_prometheus() + self.interface.usage.to_prometheus()
+
+    async def _serve_connection(self, reader, writer):
+        """Answer HTTP/1.1 requests on one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode('latin-1').split(maxsplit=2)
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': f"Body larger than {MAX_BODY_BYTES} bytes"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload, extra_headers = await self._route(method, path.split('?')[0], body)
+                close = headers.get('connection', '').lower() == 'close' or version.strip() != 'HTTP/1.1'
+                await self._respond(writer, status, payload, extra_headers, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # Malformed request or the client went away mid-request
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        if path == '/healthz':
+            return 200, self.health(), {}
+        if path == '/metrics':
+            return 200, self.metrics(), {'Content-Type': 'text/plain; version=0.0.4'}
+        if path != '/v1/classify':
+            return 404, {'error': f"Unknown path {path}"}, {}
+        if method != 'POST':
+            return 405, {'error': "Use POST"}, {'Allow': 'POST'}
+        self.counters['requests'] += 1
+        try:
+            request = json.loads(body or b'{}')
+            single = 'account' in request
+            accounts = [account_from_json(request['account'])] if single else \
+                [account_from_json(item) for item in request.get('accounts', [])]
+        except (ValueError, TypeError, AttributeError) as e:
+            return 400, {'error': f"Invalid request: {e}"}, {}
+        if not accounts:
+            return 400, {'error': "Send 'account' or a non-empty 'accounts' list"}, {}
+        if len(accounts) > self._queue.maxsize:
+            return 413, {'error': f"At most {self._queue.maxsize} accounts per request"}, {}
+        try:
+            results = await self.classify(accounts)
+        except ServiceOverloaded as e:
+            return 503, {'error': str(e)}, {'Retry-After': '1'}
+        results = [public_result(result, request.get('include_stages', False)) for result in results]
+        return 200, ({'result': results[0]} if single else {'results': results}), {}
+
+    async def _respond(self, writer, status, payload, headers=None, close=False):
+        headers = dict(headers or {})
+        if isinstance(payload, str):
+            data = payload.encode('utf-8')
+        else:
+            data = json.dumps(payload).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json')
+        headers['Content-Length'] = str(len(data))
+        headers['Connection'] = 'close' if close else 'keep-alive'
+        head = f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+def service_from_env():
+    """A ScoringService configured by .env like a batch run, plus the SERVICE_* settings."""
+    from .main import interface_from_env, temperature_from_env
+    debate_mode = os.getenv("DEBATE_MODE", "full").lower()
+    interface = interface_from_env(True, response_cache_from_env(temperature_from_env()), rate_limiter_from_env())
+    return ScoringService(
+        interface,
+        max_concurrency=int(os.getenv("MAX_CONCURRENT_ACCOUNTS", 256)),
+        queue_size=int(os.getenv("SERVICE_QUEUE_SIZE", 1024)),
+        batch_size=int(os.getenv("SERVICE_BATCH_SIZE", 32)),
+        batch_window=float(os.getenv("SERVICE_BATCH_WINDOW_MS", 5)) / 1000,
+        debate_mode=debate_mode,
+        policy=adaptive_policy_from_env() if debate_mode == "adaptive" else None,
+        pre_classifier=pre_classifier_from_env(),
+    )
+
+async def serve(host, port):
+    service = await service_from_env().start(host, port)
+    print(f"Scoring service listening on http://{service.address[0]}:{service.address[1]} "
+          f"(POST /v1/classify, GET /healthz, GET /metrics)")
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    await stopped.wait()
+    print("Shutting down; finishing accepted accounts")
+    await service.stop()
+    tracing.stop()
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Serve bot classifications over HTTP.")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", 8080)))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s', force=True)
+    tracing.tracing_from_env()
+    asyncio.run(serve(args.host, args.port))
+
+if __name__ == "__main__":
+    main()
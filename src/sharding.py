@@ -0,0 +1,115 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+from .journal import read_journal
+from .metrics import ConfusionCounts
+
+def parse_shard(spec):
+    """Parse an 'INDEX/COUNT' shard spec such as '2/8' into (2, 8)."""
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like INDEX/COUNT, got {spec!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be in [0, {count}), got {spec!r}")
+    return index, count
+
+def shard_of(account_id, num_shards):
+    """Shard an account belongs to; stable across processes, hosts and Python versions."""
+    digest = hashlib.sha256(str(account_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % num_shards
+
+def filter_shard(accounts, index, num_shards):
+    """Lazily keep the accounts that fall into shard index of num_shards."""
+    return (account for account in accounts if shard_of(account.account_id, num_shards) == index)
+
+def shard_suffix(shard):
+    index, count = shard
+    return f"_shard{index}of{count}"
+
+def summary_path(journal_path):
+    """Where a run writes its mergeable summary: next to its journal."""
+    root, _ = os.path.splitext(journal_path)
+    return root + ".summary.json"
+
+def write_summary(path, counts, shard=None, usage_rows=(), wall_time=None, resumed=False):
+    """Write a run summary; a resumed run's usage covers only its last invocation, unlike its confusion counts."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'shard': list(shard) if shard else None,
+            'confusion': counts.to_dict(),
+            'usage': [{key: row[key] for key in _USAGE_TOTALS + ('stage', 'model')} for row in usage_rows],
+            'usage_scope': 'invocation' if resumed else 'run',
+            'wall_time': wall_time,
+        }, f, indent=2)
+
+_USAGE_TOTALS = ('calls', 'cache_hits', 'retries', 'prompt_tokens', 'completion_tokens', 'cost_usd')
+
+def load_summary(path):
+    """Read a run summary, or derive one from a results journal (.jsonl)."""
+    if path.endswith('.jsonl'):
+        return {'shard': None, 'confusion': ConfusionCounts.from_records(read_journal(path)).to_dict(),
+                'usage': [], 'wall_time': None}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def merge_summaries(summaries):
+    """Combine shard summaries into total confusion counts and per-stage usage totals."""
+    counts = ConfusionCounts()
+    usage = {}
+    for summary in summaries:
+        counts += ConfusionCounts.from_dict(summary['confusion'])
+        for row in summary['usage']:
+            merged = usage.setdefault((row['stage'], row['model']), {key: 0 for key in _USAGE_TOTALS})
+            for key in _USAGE_TOTALS:
+                merged[key] += row[key] or 0
+    return counts, usage
+
+def missing_shards(summaries):
+    """Shard indices absent from a set of summaries that all use the same shard count."""
+    shards = [tuple(s['shard']) for s in summaries if s.get('shard')]
+    counts = {count for _, count in shards}
+    if len(counts) != 1:
+        return []
+    [count] = counts
+    return sorted(set(range(count)) - {index for index, _ in shards})
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the results of sharded runs into one set of metrics.")
+    parser.add_argument("paths", nargs='+', help="shard summaries (*.summary.json) or journals (*.jsonl); globs allowed")
+    parser.add_argument("--output", default=None, help="write the merged summary to this JSON file")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.paths for path in (glob.glob(pattern) or [pattern])})
+    summaries = [load_summary(path) for path in paths]
+    seen = [tuple(s['shard']) for s in summaries if s.get('shard')]
+    if len(seen) != len(set(seen)):
+        logging.warning("Some shards appear more than once; their accounts are counted twice")
+        print("Warning: duplicate shards in the inputs; their accounts are counted twice")
+    missing = missing_shards(summaries)
+    if missing:
+        print(f"Warning: shards {', '.join(map(str, missing))} are missing; metrics cover a partial dataset")
+
+    partial_usage = [path for path, s in zip(paths, summaries) if s.get('usage_scope') == 'invocation']
+    if partial_usage:
+        print(f"Warning: {', '.join(partial_usage)} were resumed; their usage covers only the last invocation")
+    counts, usage = merge_summaries(summaries)
+    print(f"Merged {len(paths)} shard results covering {counts.total} accounts\n")
+    print(counts.report())
+    print(f"\nConfusion matrix: TP={counts.tp} FP={counts.fp} TN={counts.tn} FN={counts.fn}")
+    if usage:
+        print(f"\n{'Stage':<14}{'Model':<20}{'Calls':>8}{'Prompt tok':>12}{'Compl. tok':>12}{'Cost $':>10}")
+        for (stage, model), row in sorted(usage.items()):
+            print(f"{stage:<14}{model:<20}{row['calls']:>8}{row['prompt_tokens']:>12}"
+                  f"{row['completion_tokens']:>12}{row['cost_usd']:>10.4f}")
+        print(f"Estimated cost: ${sum(row['cost_usd'] for row in usage.values()):.4f}")
+    if args.output:
+        usage_rows = [{'stage': stage, 'model': model, **row} for (stage, model), row in sorted(usage.items())]
+        write_summary(args.output, counts, usage_rows=usage_rows)
+        print(f"\nMerged summary written to {args.output}")
+
+if __name__ == "__main__":
+    main()
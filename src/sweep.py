@@ -0,0 +1,239 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from .metrics import ConfusionCounts
+from .model_routing import StageModels
+
+SWEEP_STAGES = ('bot_agent', 'human_agent', 'bot_critic', 'human_critic', 'judge')
+STAGE_SETTINGS = ('model', 'temperature')
+
+def expand_grid(spec):
+    """Configurations of a sweep spec: its explicit "configs" followed by every combination of its "grid".
+
+    A configuration holds per-stage "models" and "temperatures" (a stage or
+    'default' to a value, as in STAGE_MODELS), "judge_samples" and
+    "judge_prompt" (path of a template formatted with bot_args, human_args,
+    bot_critique and human_critique). Grid keys are "STAGE.model",
+    "STAGE.temperature", "judge_samples" or "judge_prompt", each with a list
+    of values. "base" is applied under every configuration.
+    """
+    base = spec.get('base', {})
+    configs = []
+    for i, config in enumerate(spec.get('configs', [])):
+        merged = _merge(base, config)
+        merged['name'] = config.get('name', f"config{i}")
+        configs.append(merged)
+    grid = spec.get('grid', {})
+    for values in itertools.product(*grid.values()):
+        config = _merge(base, {})
+        for key, value in zip(grid, values):
+            _set(config, key, value)
+        config['name'] = ",".join(f"{key}={value}" for key, value in zip(grid, values)) or "base"
+        configs.append(config)
+    if not configs:
+        raise ValueError("A sweep needs at least one entry under configs or grid")
+    return configs
+
+def _merge(base, config):
+    merged = {'models': {**base.get('models', {}), **config.get('models', {})},
+              'temperatures': {**base.get('temperatures', {}), **config.get('temperatures', {})}}
+    for key in ('judge_samples', 'judge_prompt'):
+        merged[key] = config.get(key, base.get(key))
+    return merged
+
+def _set(config, key, value):
+    stage, _, setting = key.rpartition('.')
+    if not stage and setting in ('judge_samples', 'judge_prompt'):
+        config[setting] = value
+    elif stage and setting in STAGE_SETTINGS:
+        config['models' if setting == 'model' else 'temperatures'][stage] = value
+    else:
+        raise ValueError(f"Unknown sweep setting {key!r}; use STAGE.model, STAGE.temperature, "
+                         f"judge_samples or judge_prompt")
+
+def variant_interface(base, config):
+    """An interface for one configuration, sharing the base interface's client, cache, limiter and usage.
+
+    The configuration's models and temperatures go over the base's
+    STAGE_MODELS and STAGE_TEMPERATURES. Model routing is left out, since a
+    routed stage would not be the same request across configurations.
+    """
+    judge_prompt = base.judge_prompt
+    if config.get('judge_prompt'):
+        with open(config['judge_prompt'], encoding='utf-8') as f:
+            judge_prompt = f.read()
+    interface = type(base)(
+        base.api_key, base.model_name, base.temperature, cache=base.cache, rate_limiter=base.rate_limiter,
+        usage=base.usage, base_url=base.base_url, judge_samples=config.get('judge_samples') or base.judge_samples,
+        judge_streaming=base.judge_streaming, budget=base.budget, resilience=base.resilience,
+        stage_models=StageModels({**base.stage_models.models, **config.get('models', {})},
+                                 {**base.stage_models.temperatures, **config.get('temperatures', {})}),
+        judge_prompt=judge_prompt)
+    interface.client = base.client
+    return interface
+
+def stage_settings(interface, stage):
+    """Everything besides its inputs that decides a stage's request, as a comparable string."""
+    settings = {'model': interface.model_name, 'temperature': interface.temperature,
+                **interface.budget.options(stage), **interface.stage_models.options(stage)}
+    if stage == 'judge':
+        settings.update(judge_samples=interface.judge_samples, judge_prompt=interface.judge_prompt,
+                        judge_streaming=interface.judge_streaming)
+    return json.dumps(settings, sort_keys=True)
+
+class Sweep:
+    """Run the full debate for several configurations, making each distinct stage request once.
+
+    Every account gets a stage graph per configuration: the openings, each
+    critique on the opposing opening and the judge on all four. A stage is
+    identified by its settings and the stages it reads, so configurations
+    that only differ downstream share the upstream calls, e.g. ten judge
+    variants share one set of openings and critiques. Usage and latency of a
+    shared stage count in full towards every configuration using it, so each
+    row shows what that configuration costs on its own.
+    """
+
+    def __init__(self, configs, base_interface):
+        self.names = [config['name'] for config in configs]
+        self.interfaces = [variant_interface(base_interface, config) for config in configs]
+        self.usage = base_interface.usage
+        self.settings = [{stage: stage_settings(interface, stage) for stage in SWEEP_STAGES}
+                         for interface in self.interfaces]
+
+    def run_account(self, account):
+        """Debate one account under every configuration; returns (per-configuration results, stages run)."""
+        nodes = {}
+
+        def node(index, stage, parents, run):
+            key = (stage, self.settings[index][stage], *parents)
+            if key not in nodes:
+                failed = next((nodes[parent] for parent in parents if nodes[parent]['error']), None)
+                nodes[key] = self._run_node(account, stage, run) if failed is None else {
+                    **_EMPTY_NODE, 'error': failed['error']}
+            return key
+
+        results = []
+        for index, interface in enumerate(self.interfaces):
+            bot = node(index, 'bot_agent', (), lambda: interface.get_bot_agent_arguments(account))
+            human = node(index, 'human_agent', (), lambda: interface.get_human_agent_arguments(account))
+            bot_critic = node(index, 'bot_critic', (human,),
+                              lambda: interface.get_bot_critic_response(account, nodes[human]['output']))
+            human_critic = node(index, 'human_critic', (bot,),
+                                lambda: interface.get_human_critic_response(account, nodes[bot]['output']))
+            judge = node(index, 'judge', (bot, human, bot_critic, human_critic),
+                         lambda: interface.get_final_verdict(account, *(nodes[key]['output'] for key in
+                                                                         (bot, human, bot_critic, human_critic))))
+            used = [nodes[key] for key in (bot, human, bot_critic, human_critic, judge)]
+            results.append({
+                'true_label': int(account.bot_label),
+                'prediction': nodes[judge]['output']['prediction'] if not nodes[judge]['error'] else 0,
+                'error': nodes[judge]['error'],
+                **{field: sum(n[field] for n in used) for field in _EMPTY_NODE if field not in ('output', 'error')},
+            })
+        return results, list(nodes.values())
+
+    def _run_node(self, account, stage, run):
+        start = time.perf_counter()
+        try:
+            output, error = run(), None
+        except Exception as e:
+            logging.error(f"Sweep {stage} stage failed for @{account.username}: {e}")
+            output, error = None, str(e)
+        elapsed = time.perf_counter() - start
+        entry = self.usage.pop_account(account.account_id).get(stage, {})
+        cost = self.usage.cost(entry['model'], entry['prompt_tokens'], entry['completion_tokens']) if entry else 0.0
+        return {'output': output, 'error': error, 'elapsed': elapsed, 'calls': 1,
+                'prompt_tokens': entry.get('prompt_tokens', 0), 'completion_tokens': entry.get('completion_tokens', 0),
+                'cost_usd': cost or 0.0}
+
+_EMPTY_NODE = {'output': None, 'error': None, 'elapsed': 0.0, 'calls': 0, 'prompt_tokens': 0,
+               'completion_tokens': 0, 'cost_usd': 0.0}
+
+def run_sweep(sweep, accounts, max_workers):
+    """Run every account through the sweep with max_workers accounts in flight; returns the report dict."""
+    from .main import submit_bounded
+    rows = [{'name': name, 'counts': ConfusionCounts(), 'accounts': 0, 'errors': 0, 'calls': 0, 'prompt_tokens': 0,
+             'completion_tokens': 0, 'cost_usd': 0.0, 'elapsed': 0.0} for name in sweep.names]
+    executed = dict.fromkeys(('calls', 'prompt_tokens', 'completion_tokens', 'cost_usd', 'elapsed'), 0)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for results, nodes in submit_bounded(executor, sweep.run_account, accounts, 2 * max_workers):
+            for row, result in zip(rows, results):
+                row['counts'].add(result['true_label'], result['prediction'])
+                row['accounts'] += 1
+                row['errors'] += result['error'] is not None
+                for field in ('calls', 'prompt_tokens', 'completion_tokens', 'cost_usd', 'elapsed'):
+                    row[field] += result[field]
+            for node in nodes:
+                for field in executed:
+                    executed[field] += node[field]
+    wall_time = time.perf_counter() - start
+
+    for row in rows:
+        counts = row.pop('counts')
+        row.update(counts.to_dict(), accuracy=counts.accuracy(), precision=counts.precision(), recall=counts.recall(),
+                   f1=counts.f1(), latency_mean=row['elapsed'] / row['accounts'] if row['accounts'] else 0.0,
+                   # Stage-seconds scale with wall time at a fixed concurrency, so this estimates a run of its own
+                   est_wall_time=wall_time * row['elapsed'] / executed['elapsed'] if executed['elapsed'] else 0.0)
+    return {'configs': rows, 'executed': executed, 'standalone_calls': sum(row['calls'] for row in rows),
+            'wall_time': wall_time, 'max_workers': max_workers}
+
+def print_report(report):
+    print(f"{'Configuration':<36}{'Acc':>6}{'Prec':>6}{'Rec':>6}{'F1':>6}{'Errors':>8}{'Calls':>8}"
+          f"{'Prompt tok':>12}{'Compl. tok':>12}{'Cost $':>10}{'Acct s':>8}{'Est. wall s':>13}")
+    for row in report['configs']:
+        print(f"{row['name'][:35]:<36}{row['accuracy']:>6.2f}{row['precision']:>6.2f}{row['recall']:>6.2f}"
+              f"{row['f1']:>6.2f}{row['errors']:>8}{row['calls']:>8}{row['prompt_tokens']:>12}"
+              f"{row['completion_tokens']:>12}{row['cost_usd']:>10.4f}{row['latency_mean']:>8.2f}"
+              f"{row['est_wall_time']:>13.1f}")
+    executed, standalone = report['executed'], report['standalone_calls']
+    print(f"\nSweep: {executed['calls']} stage calls instead of {standalone} for separate runs "
+          f"({1 - executed['calls'] / standalone if standalone else 0:.0%} shared), "
+          f"{executed['prompt_tokens'] + executed['completion_tokens']} tokens, ${executed['cost_usd']:.4f}, "
+          f"wall time {report['wall_time']:.1f}s with {report['max_workers']} workers")
+
+def main(argv=None):
+    from .main import configure_logging, interface_from_env, load_accounts, temperature_from_env
+    from .rate_limiter import rate_limiter_from_env
+    from .response_cache import response_cache_from_env
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compare debate configurations on one dataset, "
+                                                 "running the stages they have in common once.")
+    parser.add_argument("spec", help="JSON sweep spec with base, configs and/or grid")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MAX_WORKERS", os.cpu_count() or 1)),
+                        help="accounts debated at once (default: MAX_WORKERS)")
+    parser.add_argument("--output", default=None, help="also write the comparison as JSON to this file")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    with open(args.spec, encoding='utf-8') as f:
+        configs = expand_grid(json.load(f))
+    use_robust = os.getenv("USE_ROBUST", "true").lower() == "true"
+    limit = int(os.getenv("LIMIT_SAMPLES_DATASET")) if os.getenv("LIMIT_SAMPLES_DATASET") else None
+    dataset_path = (os.getenv("ROBUST_DATASET_PATH", "data/robust_dataset.csv") if use_robust
+                    else os.getenv("DATASET_PATH", "dataset.csv"))
+    response_cache = response_cache_from_env(temperature_from_env())
+    base = interface_from_env(use_robust, response_cache, rate_limiter_from_env())
+    sweep = Sweep(configs, base)
+    print(f"Sweeping {len(configs)} configurations over {limit if limit else 'the entire dataset'} accounts "
+          f"of {dataset_path}\n")
+
+    report = run_sweep(sweep, load_accounts(dataset_path, limit, use_robust, os.getenv("ACCOUNT_STORE", "stream")),
+                       args.workers)
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if response_cache is not None:
+        response_cache.close()
+
+if __name__ == "__main__":
+    main()
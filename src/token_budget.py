@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from .rate_limiter import CHARS_PER_TOKEN
+
+try:
+    import tiktoken  # Optional: exact counts; without it tokens are estimated from characters
+except ImportError:
+    tiktoken = None
+
+TRUNCATION_MARK = " [...]"
+
+_POINT_START = re.compile(r"^\s*(?:[-*•]|\d+[.)]|#+)\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:  # The BPE files are fetched once and cached; offline first use falls back
+        logging.warning(f"Tokenizer unavailable for {model}, estimating tokens from characters: {e}")
+        return None
+
+def count_tokens(text, model="gpt-4o"):
+    """Tokens in text for model, exact with tiktoken installed and estimated otherwise."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text, max_tokens, model="gpt-4o"):
+    """Cut text to at most max_tokens, marking the cut; text that fits is returned unchanged."""
+    encoding = _encoding(model)
+    if encoding is None:
+        limit = max_tokens * CHARS_PER_TOKEN
+        return text if len(text) <= limit else text[:max(limit - len(TRUNCATION_MARK), 0)].rstrip() + TRUNCATION_MARK
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max(max_tokens - 2, 0)]).rstrip() + TRUNCATION_MARK
+
+def key_points(text):
+    """The first sentence of every point in an argument: each bullet or numbered item, else each paragraph."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if any(_POINT_START.match(line) for line in lines):
+        points = [line.strip() for line in lines if _POINT_START.match(line)]
+    else:
+        points = [paragraph.strip() for paragraph in re.split(r"\n\s*\n", text) if paragraph.strip()]
+    key = []
+    for point in points:
+        marker = _POINT_START.match(point)
+        start = marker.end() if marker else 0
+        key.append(point[:start] + _SENTENCE_END.split(point[start:], maxsplit=1)[0])
+    return key
+
+def compact_argument(text, max_tokens, model="gpt-4o"):
+    """Reduce a debate argument to its key points when it is longer than max_tokens.
+
+    Points keep their order; if even the key points do not fit, they are truncated.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    return truncate_to_tokens("\n".join(key_points(text)), max_tokens, model)
+
+def sample_evenly(items, count):
+    """count items spread evenly over the sequence, first and last included, in their original order."""
+    if count >= len(items):
+        return list(items)
+    if count == 1:
+        return [items[0]]
+    return [items[round(i * (len(items) - 1) / (count - 1))] for i in range(count)]
+
+class TokenBudget:
+    """Token limits for the debate prompts and replies, with a record of what they saved.
+
+    stage_max_tokens caps each stage's reply (max_tokens). Tweets in the
+    account block are sampled down to max_tweets and cut to tweet_tokens
+    each, and debate texts quoted in critique and judge prompts are compacted
+    to argument_tokens. Unset limits leave that part untouched.
+    """
+
+    def __init__(self, stage_max_tokens=None, max_tweets=None, tweet_tokens=None, argument_tokens=None,
+                 model="gpt-4o"):
+        self.stage_max_tokens = dict(stage_max_tokens or {})
+        self.max_tweets = max_tweets
+        self.tweet_tokens = tweet_tokens
+        self.argument_tokens = argument_tokens
+        self.model = model
+        self._lock = threading.Lock()
+        self._parts = {}
+
+    @property
+    def active(self):
+        return bool(self.stage_max_tokens or self.max_tweets or self.tweet_tokens or self.argument_tokens)
+
+    def options(self, stage):
+        """Completion options for a stage: its max_tokens cap, if any."""
+        cap = self.stage_max_tokens.get(stage, self.stage_max_tokens.get('default'))
+        return {"max_tokens": cap} if cap else {}
+
+    def fit_tweets(self, tweets):
+        """Sample and truncate an account's tweets for its prompt block."""
+        if not (self.max_tweets or self.tweet_tokens):
+            return list(tweets)
+        kept = sample_evenly(list(tweets), self.max_tweets) if self.max_tweets else list(tweets)
+        if self.tweet_tokens:
+            kept = [truncate_to_tokens(tweet, self.tweet_tokens, self.model) for tweet in kept]
+        self._record('account tweets', tweets, kept)
+        return kept
+
+    def compact(self, stage, *texts):
+        """Compact the debate texts a stage's prompt quotes, recording the saving under that stage."""
+        if not self.argument_tokens:
+            return texts
+        compacted = tuple(compact_argument(text, self.argument_tokens, self.model) for text in texts)
+        self._record(f"{stage} input", texts, compacted)
+        return compacted
+
+    def _record(self, part, before, after):
+        before_tokens = sum(count_tokens(text, self.model) for text in before)
+        after_tokens = sum(count_tokens(text, self.model) for text in after)
+        with self._lock:
+            stats = self._parts.setdefault(part, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += before_tokens
+            stats[2] += after_tokens
+
+    def report(self):
+        """Rows of (part, items, tokens before, tokens after) for the prompt parts the budget shortened."""
+        with self._lock:
+            return [(part, items, before, after) for part, (items, before, after) in sorted(self._parts.items())]
+
+def token_budget_from_env(model="gpt-4o"):
+    """Build the budget from the STAGE_MAX_TOKENS / MAX_TWEETS / TWEET_MAX_TOKENS / ARGUMENT_MAX_TOKENS settings."""
+    def optional_int(name):
+        value = os.getenv(name)
+        return int(value) if value else None
+
+    stage_max_tokens = os.getenv("STAGE_MAX_TOKENS")
+    return TokenBudget(
+        stage_max_tokens=json.loads(stage_max_tokens) if stage_max_tokens else None,
+        max_tweets=optional_int("MAX_TWEETS"),
+        tweet_tokens=optional_int("TWEET_MAX_TOKENS"),
+        argument_tokens=optional_int("ARGUMENT_MAX_TOKENS"),
+        model=model,
+    )
@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+
+_tracer = None
+_current = contextvars.ContextVar('trace_span', default=None)
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name, cat, **args):
+    """Context manager timing one step of the pipeline; a shared no-op while tracing is off."""
+    if _tracer is None:
+        return _NO_SPAN
+    return _Span(_tracer, name, cat, args)
+
+def enabled():
+    return _tracer is not None
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'lane', 'start', 'token')
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.args['thread'] = threading.current_thread().name
+        try:
+            self.args['task'] = asyncio.current_task().get_name()
+        except (RuntimeError, AttributeError):  # Not on an event loop, or outside any task
+            pass
+        self.lane = self.tracer._open(self, _current.get())
+        self.token = _current.set(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._close(self, end)
+        return False
+
+class Tracer:
+    """Write spans as Chrome trace events (chrome://tracing, ui.perfetto.dev) while the run goes on.
+
+    Every span becomes one complete ("X") event when it ends, so memory does
+    not grow with the run. Spans are laid out on lanes (the trace's tids): a
+    span goes on its parent's lane when it is the innermost span open there,
+    otherwise on the first free lane, so that concurrent stages of one
+    account, hedged requests and the tasks of the async engine each get a
+    track of properly nested spans. The real thread and task names are in
+    each event's args.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write('[\n')
+        self._lock = threading.Lock()
+        self._lanes = []
+        self._free = []
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._first = True
+
+    def _open(self, span, parent):
+        with self._lock:
+            if parent is not None and parent.tracer is self and self._lanes[parent.lane][-1:] == [parent]:
+                lane = parent.lane
+            elif self._free:
+                lane = heapq.heappop(self._free)
+            else:
+                lane = len(self._lanes)
+                self._lanes.append([])
+                self._write({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': lane,
+                             'args': {'name': f"lane {lane}"}})
+            self._lanes[lane].append(span)
+            return lane
+
+    def _close(self, span, end):
+        event = {'name': span.name, 'cat': span.cat, 'ph': 'X', 'ts': (span.start - self._origin) / 1000,
+                 'dur': (end - span.start) / 1000, 'pid': self._pid, 'tid': span.lane, 'args': span.args}
+        with self._lock:
+            stack = self._lanes[span.lane]
+            stack.remove(span)
+            if not stack:
+                heapq.heappush(self._free, span.lane)
+            self._write(event)
+
+    def _write(self, event):
+        if self._file.closed:
+            return  # A straggler, such as a drained stream, finishing after the trace was closed
+        self._file.write(('' if self._first else ',\n') + json.dumps(event, default=str))
+        self._first = False
+
+    def close(self):
+        with self._lock:
+            self._file.write('\n]\n')
+            self._file.close()
+
+def start(path):
+    """Start tracing every span into a Chrome trace-event file at path."""
+    global _tracer
+    _tracer = Tracer(path)
+    logging.info(f"Tracing to {path}")
+    return _tracer
+
+def stop():
+    """Finish the trace file; spans after this are no-ops again."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+
+def tracing_from_env():
+    """Start tracing when TRACE_PATH is set; returns the path or None."""
+    path = os.getenv("TRACE_PATH")
+    if path:
+        start(path)
+    return path
@@ -19,6 +19,11 @@ class TwitterAccount:
         self.hashtags = hashtags.split(',') if hashtags else []
         self.avg_daily_retweets = self._calculate_avg_daily_retweets()
 
+    @property
+    def account_id(self):
+        """Stable identifier used to journal and shard results."""
+        return str(self.user_id)
+
     def _calculate_avg_daily_retweets(self):
         try:
             creation_datetime = datetime.strptime(self.created_at, '%Y-%m-%d %H:%M:%S')
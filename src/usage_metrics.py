@@ -0,0 +1,229 @@
+import json
+import math
+import os
+import threading
+
+# USD per million (prompt, completion) tokens; override or extend with MODEL_PRICES in .env
+DEFAULT_PRICES_PER_MILLION = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-4': (30.00, 60.00),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4.1': (2.00, 8.00),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1-nano': (0.10, 0.40),
+}
+
+def load_prices():
+    prices = dict(DEFAULT_PRICES_PER_MILLION)
+    overrides = os.getenv("MODEL_PRICES")
+    if overrides:
+        prices.update({model: tuple(price) for model, price in json.loads(overrides).items()})
+    return prices
+
+def price_for(prices, model):
+    """Price of a model, matching dated snapshots such as gpt-4o-2024-08-06 to their base name."""
+    if model in prices:
+        return prices[model]
+    matches = [name for name in prices if model.startswith(name + '-')]
+    return prices[max(matches, key=len)] if matches else None
+
+class LatencyHistogram:
+    """Fixed log-spaced buckets from 10ms to ~10min; percentiles are accurate to one bucket (~10%)."""
+
+    BOUNDS = [0.01 * 1.1 ** i for i in range(int(math.log(60000) / math.log(1.1)) + 1)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        low, high = 0, len(self.BOUNDS)
+        while low < high:
+            mid = (low + high) // 2
+            if seconds <= self.BOUNDS[mid]:
+                high = mid
+            else:
+                low = mid + 1
+        self.counts[low] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def percentile(self, q):
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.BOUNDS[min(i, len(self.BOUNDS) - 1)]
+        return self.BOUNDS[-1]
+
+    def cumulative(self):
+        """(upper bound, cumulative count) pairs for non-empty buckets, ending with +Inf."""
+        seen = 0
+        buckets = []
+        for bound, count in zip(self.BOUNDS + [math.inf], self.counts):
+            seen += count
+            if count or bound == math.inf:
+                buckets.append((bound, seen))
+        return buckets
+
+class _StageUsage:
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.latency = LatencyHistogram()
+
+class UsageTracker:
+    """Token, cost, latency and retry accounting per debate stage, model and account.
+
+    Aggregates use constant memory; per-account usage is held only until the
+    account's result is collected with pop_account().
+    """
+
+    def __init__(self, prices=None):
+        self.prices = prices if prices is not None else load_prices()
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._accounts = {}
+        self.account_latency = LatencyHistogram()
+
+    def record(self, stage, model, response, latency, retries=0, account_id=None, cache_hit=False):
+        usage = getattr(response, "usage", None)
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        completion_tokens = usage.completion_tokens if usage else 0
+        with self._lock:
+            stats = self._stages.setdefault((stage or 'other', model), _StageUsage())
+            stats.calls += 1
+            stats.retries += retries
+            if cache_hit:
+                stats.cache_hits += 1
+            else:
+                # Cached replies cost nothing and their latency says nothing about the API
+                stats.prompt_tokens += prompt_tokens
+                stats.completion_tokens += completion_tokens
+                stats.latency.observe(latency)
+            if account_id is not None:
+                account = self._accounts.setdefault(account_id, {})
+                entry = account.setdefault(stage or 'other', {
+                    'model': model, 'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'latency': 0.0,
+                    'retries': 0, 'cache_hits': 0})
+                entry['calls'] += 1
+                entry['retries'] += retries
+                if cache_hit:
+                    entry['cache_hits'] += 1
+                else:
+                    entry['prompt_tokens'] += prompt_tokens
+                    entry['completion_tokens'] += completion_tokens
+                    entry['latency'] += latency
+
+    def add_completion_tokens(self, stage, model, tokens):
+        """Settle tokens billed after a call was recorded, such as the rest of a stream drained in the background.
+
+        The account's own usage may already have been collected, so only the stage totals change.
+        """
+        with self._lock:
+            stats = self._stages.setdefault((stage or 'other', model), _StageUsage())
+            stats.completion_tokens += tokens
+
+    def pop_account(self, account_id):
+        """Per-stage usage of one account, removed from the tracker once its result is recorded."""
+        with self._lock:
+            return self._accounts.pop(account_id, {})
+
+    def latency_percentile(self, stage, q, min_samples=1):
+        """The q-th latency percentile of a stage's API calls, or None before min_samples of them."""
+        with self._lock:
+            histograms = [stats.latency for (name, _), stats in self._stages.items() if name == stage]
+            if sum(h.total for h in histograms) < min_samples:
+                return None
+            if len(histograms) == 1:
+                return histograms[0].percentile(q)
+            merged = LatencyHistogram()
+            for histogram in histograms:
+                merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                merged.total += histogram.total
+            return merged.percentile(q)
+
+    def observe_account(self, elapsed):
+        with self._lock:
+            self.account_latency.observe(elapsed)
+
+    def cost(self, model, prompt_tokens, completion_tokens):
+        price = price_for(self.prices, model)
+        if price is None:
+            return None
+        return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+    def summary(self):
+        """One row per (stage, model) with totals, latency percentiles and estimated cost."""
+        with self._lock:
+            rows = []
+            for (stage, model), stats in self._stages.items():
+                rows.append({
+                    'stage': stage,
+                    'model': model,
+                    'calls': stats.calls,
+                    'cache_hits': stats.cache_hits,
+                    'retries': stats.retries,
+                    'prompt_tokens': stats.prompt_tokens,
+                    'completion_tokens': stats.completion_tokens,
+                    'latency_p50': stats.latency.percentile(0.50),
+                    'latency_p95': stats.latency.percentile(0.95),
+                    'latency_p99': stats.latency.percentile(0.99),
+                    'cost_usd': self.cost(model, stats.prompt_tokens, stats.completion_tokens),
+                })
+            return rows
+
+    def total_cost(self):
+        return sum(row['cost_usd'] or 0.0 for row in self.summary())
+
+    def to_json(self):
+        return json.dumps({
+            'stages': self.summary(),
+            'total_cost_usd': self.total_cost(),
+            'account_latency': {
+                'count': self.account_latency.total,
+                'p50': self.account_latency.percentile(0.50),
+                'p95': self.account_latency.percentile(0.95),
+                'p99': self.account_latency.percentile(0.99),
+            },
+        }, indent=2)
+
+    def to_prometheus(self):
+        """Render the aggregates in the Prometheus text exposition format."""
+        lines = []
+        counters = [
+            ('calls', 'Completion calls', 'calls'),
+            ('cache_hits', 'Completion calls served from the response cache', 'cache_hits'),
+            ('retries', 'Retried completion attempts', 'retries'),
+            ('prompt_tokens', 'Prompt tokens billed', 'prompt_tokens'),
+            ('completion_tokens', 'Completion tokens billed', 'completion_tokens'),
+        ]
+        with self._lock:
+            items = sorted(self._stages.items())
+            for name, help_text, attr in counters:
+                lines.append(f"# HELP botdetector_{name}_total {help_text}")
+                lines.append(f"# TYPE botdetector_{name}_total counter")
+                for (stage, model), stats in items:
+                    lines.append(f'botdetector_{name}_total{{stage="{stage}",model="{model}"}} {getattr(stats, attr)}')
+            lines.append("# HELP botdetector_stage_latency_seconds Completion latency per stage")
+            lines.append("# TYPE botdetector_stage_latency_seconds histogram")
+            for (stage, model), stats in items:
+                labels = f'stage="{stage}",model="{model}"'
+                for bound, count in stats.latency.cumulative():
+                    le = "+Inf" if bound == math.inf else f"{bound:.4g}"
+                    lines.append(f'botdetector_stage_latency_seconds_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f'botdetector_stage_latency_seconds_sum{{{labels}}} {stats.latency.sum}')
+                lines.append(f'botdetector_stage_latency_seconds_count{{{labels}}} {stats.latency.total}')
+        lines.append("# HELP botdetector_cost_usd_total Estimated spend")
+        lines.append("# TYPE botdetector_cost_usd_total counter")
+        lines.append(f"botdetector_cost_usd_total {self.total_cost()}")
+        return "\n".join(lines) + "\n"
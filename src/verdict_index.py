@@ -0,0 +1,165 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from itertools import islice
+import numpy as np
+from .clustering import account_shingles
+from .journal import new_result
+from .pre_classifier import feature_matrix
+
+DIMS = 256  # Hashed text dimensions per account; stored vectors only compare at the same size
+TEXT_WEIGHT = 0.8  # Share of the cosine similarity that comes from text, the rest from numeric features
+
+def account_vectors(accounts, dims=DIMS):
+    """Unit vectors comparing accounts by content: hashed word n-grams plus log-scaled numeric features.
+
+    The text part uses signed feature hashing of the same normalized shingles
+    (posts, profile, handle pattern) that bot-farm clustering uses, with
+    bigrams so that reworded templates still overlap. The cosine of two
+    vectors is TEXT_WEIGHT times their text cosine plus the rest times their
+    numeric cosine.
+    """
+    text = np.zeros((len(accounts), dims), dtype=np.float32)
+    for row, account in enumerate(accounts):
+        for shingle in account_shingles(account, size=2):
+            h = zlib.crc32(shingle.encode('utf-8'))
+            text[row, h % dims] += 1.0 if h & 0x80000000 else -1.0
+    numeric = np.log1p(np.maximum(feature_matrix(accounts), 0)).astype(np.float32)
+    for part in (text, numeric):
+        norms = np.linalg.norm(part, axis=1, keepdims=True)
+        part /= np.where(norms > 0, norms, 1)
+    return np.hstack([text * np.sqrt(TEXT_WEIGHT), numeric * np.sqrt(1 - TEXT_WEIGHT)])
+
+class VerdictIndex:
+    """Nearest-neighbour index of past debate verdicts, persisted in SQLite across runs.
+
+    Vectors are held in memory as one matrix and searched by brute-force
+    cosine similarity, which is fast enough for a local index of a few
+    hundred thousand accounts. An account whose nearest stored neighbour is
+    at least threshold similar reuses that verdict; every other account is
+    debated and its verdict added.
+    """
+
+    def __init__(self, path, threshold=0.95):
+        self.path = path
+        self.threshold = threshold
+        self.queries = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._pending = {}  # Vectors of accounts sent to the debate, until their result comes back
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                account_id TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                prediction INTEGER NOT NULL,
+                confidence REAL NOT NULL,
+                created_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+        self._ids = []
+        self._row_of = {}
+        self._verdicts = []
+        self._vectors = None  # Sized on first use: the numeric part differs between the two dataset types
+        for account_id, vector, prediction, confidence in self._conn.execute(
+                "SELECT account_id, vector, prediction, confidence FROM verdicts ORDER BY created_at"):
+            self._append(account_id, np.frombuffer(vector, dtype=np.float32), prediction, confidence)
+        logging.info(f"Verdict index opened at {path} with {len(self._ids)} verdicts")
+
+    def __len__(self):
+        return len(self._ids)
+
+    def nearest(self, vectors):
+        """(row, similarity) of the closest stored verdict for each vector; row is -1 when the index is empty."""
+        with self._lock:
+            if not self._ids or vectors.shape[1] != self._vectors.shape[1]:
+                return np.full(len(vectors), -1), np.zeros(len(vectors), dtype=np.float32)
+            similarities = vectors @ self._vectors[:len(self._ids)].T
+        rows = similarities.argmax(axis=1)
+        return rows, similarities[np.arange(len(vectors)), rows]
+
+    def cascade(self, accounts, on_decided, batch_size=256):
+        """Decide accounts with a close enough past verdict locally and yield the rest for the debate.
+
+        Reused verdicts go to on_decided as finished results with
+        decided_by 'verdict_index' and the source account and similarity.
+        """
+        accounts = iter(accounts)
+        while batch := list(islice(accounts, batch_size)):
+            vectors = account_vectors(batch)
+            rows, similarities = self.nearest(vectors)
+            for account, vector, row, similarity in zip(batch, vectors, rows, similarities):
+                self.queries += 1
+                if row < 0 or similarity < self.threshold:
+                    with self._lock:
+                        self._pending[account.account_id] = vector
+                    yield account
+                    continue
+                self.hits += 1
+                prediction, confidence = self._verdicts[row]
+                result = new_result(account)
+                result['prediction'] = prediction
+                result['decided_by'] = 'verdict_index'
+                result['verdict_index'] = {'source': self._ids[row], 'similarity': round(float(similarity), 4),
+                                           'confidence': confidence}
+                on_decided(result)
+
+    def record(self, result):
+        """Add a finished debate's verdict for the accounts it was queried for; other results are ignored."""
+        with self._lock:
+            vector = self._pending.pop(result['account_id'], None)
+        if vector is None or result.get('decided_by', 'debate') != 'debate' or result.get('error'):
+            return
+        self.add(result['account_id'], vector, result['prediction'], result.get('judge_confidence', 1.0))
+
+    def _append(self, account_id, vector, prediction, confidence):
+        if self._vectors is None:
+            self._vectors = np.empty((1024, len(vector)), dtype=np.float32)
+        elif len(vector) != self._vectors.shape[1]:
+            return False  # A verdict from the other dataset type; it could never match
+        row = self._row_of.get(account_id)
+        if row is None:
+            row = len(self._ids)
+            if row == len(self._vectors):
+                self._vectors = np.concatenate([self._vectors, np.empty_like(self._vectors)])
+            self._ids.append(account_id)
+            self._verdicts.append(None)
+            self._row_of[account_id] = row
+        self._vectors[row] = vector
+        self._verdicts[row] = (int(prediction), float(confidence))
+        return True
+
+    def add(self, account_id, vector, prediction, confidence=1.0):
+        with self._lock:
+            if not self._append(account_id, vector, prediction, confidence):
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (account_id, vector, prediction, confidence, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (account_id, np.asarray(vector, dtype=np.float32).tobytes(), int(prediction), float(confidence),
+                 time.time()))
+            self._conn.commit()
+
+    def stats(self):
+        return {'entries': len(self._ids), 'queries': self.queries, 'hits': self.hits,
+                'hit_rate': self.hits / self.queries if self.queries else 0.0}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def verdict_index_from_env():
+    """Open the index at VERDICT_INDEX_PATH, or None to debate every account."""
+    path = os.getenv("VERDICT_INDEX_PATH")
+    if not path:
+        return None
+    return VerdictIndex(path, threshold=float(os.getenv("VERDICT_INDEX_THRESHOLD", 0.95)))
@@ -0,0 +1,15 @@
+from openai.types.chat import ChatCompletion
+from src.twitter_account import TwitterAccount
+
+def make_completion(content, prompt_tokens=10, completion_tokens=5):
+    """Build a ChatCompletion the way the OpenAI client returns it."""
+    return ChatCompletion.model_validate({
+        'id': 'test', 'object': 'chat.completion', 'created': 0, 'model': 'test-model',
+        'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens}
+    })
+
+def make_account(user_id, bot_label=1):
+    return TwitterAccount(user_id, f"user{user_id}", "hello", 1, 0, 10, False, bot_label,
+                          "Nowhere", "2020-01-01 00:00:00", "")
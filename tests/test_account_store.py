@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from src.account_store import AccountStore, RobustAccountView, StringColumn, avg_daily_retweets
+from src.openai_interface import RobustOpenAIInterface
+from src.robust_dataset_reader import read_robust_dataset_columnar
+
+ROBUST_DATASET = "data/robust_dataset.csv"
+
+def test_string_column_round_trips_unicode():
+    column = StringColumn.from_strings(["", "plain", "emoji 😅", "ünïcode"])
+    assert [column[i] for i in range(len(column))] == ["", "plain", "emoji 😅", "ünïcode"]
+
+def test_avg_daily_retweets_matches_row_formula():
+    now = np.datetime64("2020-01-11T00:00:00").astype(object)
+    averages = avg_daily_retweets([100, 7, 5], ["2020-01-01 00:00:00", "not a date", "2020-01-11 00:00:00"], now)
+    assert averages.tolist() == [10.0, 0.0, 5.0]
+
+def test_saved_store_loads_memory_mapped(tmp_path):
+    store = read_robust_dataset_columnar(ROBUST_DATASET)
+    store.save(str(tmp_path / "store"))
+    loaded = AccountStore.load(str(tmp_path / "store"))
+    assert isinstance(loaded.columns['followers'], np.memmap)
+    assert [a.get_account_details() for a in loaded] == [a.get_account_details() for a in store]
+    assert loaded[-1].handle == store[len(store) - 1].handle
+    with pytest.raises(IndexError):
+        loaded[len(loaded)]
+
+def test_views_are_slotted_and_memoize_prompt_blocks():
+    view = read_robust_dataset_columnar(ROBUST_DATASET)[0]
+    assert isinstance(view, RobustAccountView)
+    with pytest.raises(AttributeError):
+        view.extra = 1
+    interface = RobustOpenAIInterface(api_key="test", model_name="test-model")
+    block = interface._account_block(view)
+    assert "Handle: yhterrance" in block
+    assert interface._account_block(view) is block
@@ -0,0 +1,70 @@
+import asyncio
+from src.adaptive_debate import AdaptiveDebatePolicy, CONFIDENCE_FIELD, combine_rounds, parse_bot_probability
+from src.debate_engine import process_account_async
+from src.main import process_account
+from src.openai_interface import OpenAIInterface
+from tests.fakes import make_account, make_completion
+
+class ScriptedInterface(OpenAIInterface):
+    """Opening agents report fixed bot probabilities; every other stage gives canned text."""
+
+    def __init__(self, bot_probability, human_probability):
+        super().__init__(api_key="test", model_name="test-model")
+        self.probabilities = {'bot_agent': bot_probability, 'human_agent': human_probability}
+        self.stages = []
+
+    def _reply(self, stage):
+        self.stages.append(stage)
+        if stage == 'judge':
+            return make_completion("**Analysis:** weighed\n**Classification:** No")
+        if stage in self.probabilities:
+            return make_completion(f"opening\n{CONFIDENCE_FIELD} {self.probabilities[stage]}")
+        return make_completion(f"critique {len(self.stages)}")
+
+    def _get_completion(self, prompt, system_message, stage=None, **kwargs):
+        return self._reply(stage)
+
+    async def _aget_completion(self, prompt, system_message, stage=None, **kwargs):
+        return self._reply(stage)
+
+def test_parse_bot_probability():
+    assert parse_bot_probability(f"text\n{CONFIDENCE_FIELD} 85") == 0.85
+    assert parse_bot_probability(f"{CONFIDENCE_FIELD} 40%") == 0.4
+    assert parse_bot_probability(f"{CONFIDENCE_FIELD} 1") == 0.01
+    assert parse_bot_probability(f"{CONFIDENCE_FIELD} 0.5") == 0.005
+    assert parse_bot_probability(f"{CONFIDENCE_FIELD} **90**") == 0.9
+    assert parse_bot_probability(f"{CONFIDENCE_FIELD} 250") is None
+    assert parse_bot_probability("no score") is None
+
+def test_policy_routes_on_agreement():
+    policy = AdaptiveDebatePolicy(agreement=0.8, close_margin=0.1, extra_rounds=1)
+    assert policy.route(0.9, 0.85) == ('early_exit', 1)
+    assert policy.route(0.1, 0.05) == ('early_exit', 0)
+    assert policy.route(0.55, 0.45) == ('extended', None)
+    assert policy.route(0.9, 0.5) == ('standard', None)
+    assert policy.route(None, 0.9) == ('standard', None)
+    assert [policy.calls(path) for path in ('early_exit', 'standard', 'extended')] == [2, 5, 7]
+
+def test_consensus_skips_critiques_and_judge():
+    interface = ScriptedInterface(95, 90)
+    result = process_account(make_account(1, bot_label=1), interface, "adaptive", AdaptiveDebatePolicy())
+    assert result['prediction'] == 1
+    assert (result['debate_path'], result['calls']) == ('early_exit', 2)
+    assert interface.stages == ['bot_agent', 'human_agent']
+
+def test_consensus_can_still_ask_the_judge():
+    interface = ScriptedInterface(95, 90)
+    result = process_account(make_account(1), interface, "adaptive", AdaptiveDebatePolicy(skip_judge=False))
+    assert result['prediction'] == 0
+    assert interface.stages == ['bot_agent', 'human_agent', 'judge']
+
+def test_balanced_openings_get_an_extra_round_async():
+    interface = ScriptedInterface(55, 45)
+    result = asyncio.run(process_account_async(make_account(1), interface, "adaptive", AdaptiveDebatePolicy()))
+    assert (result['debate_path'], result['calls']) == ('extended', 7)
+    assert interface.stages.count('bot_critic') == 2
+    assert result['stages']['bot_critic'].startswith("Round 1:")
+    assert len(interface.stages) == result['calls']
+
+def test_combine_rounds_keeps_single_critique_unchanged():
+    assert combine_rounds(["only"]) == "only"
@@ -0,0 +1,55 @@
+import json
+import os
+import pytest
+from src.batch_debate import BatchDebate, LocalBatchBackend
+from src.benchmark import write_synthetic_dataset
+from src.mock_openai_server import MockOpenAIServer
+from src.openai_interface import RobustOpenAIInterface
+from src.robust_dataset_reader import iter_robust_dataset
+
+class InterruptedBackend(LocalBatchBackend):
+    """Stops the run the first time the critiques batch is polled, as if the process were killed."""
+
+    def status(self, batch_id):
+        with open(self._path(batch_id, 'input'), encoding='utf-8') as f:
+            if '"custom_id": "bot_critic:' in f.read():
+                raise KeyboardInterrupt
+        return super().status(batch_id)
+
+@pytest.fixture
+def accounts(tmp_path):
+    dataset = tmp_path / "synthetic.csv"
+    write_synthetic_dataset(str(dataset), 6)
+    return list(iter_robust_dataset(str(dataset)))
+
+def test_batch_debate_runs_layer_by_layer_and_retries_failed_requests(tmp_path, accounts):
+    mock = MockOpenAIServer(server_error_rate=0.2, seed=3)
+    backend = LocalBatchBackend(str(tmp_path / "endpoint"), mock)
+    batch = BatchDebate(RobustOpenAIInterface("test", "test-model", 0.0), backend, str(tmp_path / "state"),
+                        poll_seconds=0, retries=3)
+    results = []
+    batch.run(accounts, results.append)
+
+    assert [result['account_id'] for result in results] == [account.account_id for account in accounts]
+    assert all(result['error'] is None and set(result['stages']) == {'bot_agent', 'human_agent', 'bot_critic',
+                                                                      'human_critic', 'judge'} for result in results)
+    assert mock.errors > 0 and batch.submitted == 5 * len(accounts) + mock.errors
+    with open(tmp_path / "state" / "openings.1.0.input.jsonl", encoding='utf-8') as f:
+        request = json.loads(f.readline())
+    assert request['custom_id'] == f"bot_agent:{accounts[0].account_id}"
+    assert (request['method'], request['url']) == ('POST', '/v1/chat/completions')
+    assert request['body']['model'] == 'test-model' and request['body']['messages']
+
+def test_interrupted_batch_run_resumes_without_resubmitting(tmp_path, accounts):
+    interface = RobustOpenAIInterface("test", "test-model", 0.0)
+    state, endpoint = str(tmp_path / "state"), str(tmp_path / "endpoint")
+    with pytest.raises(KeyboardInterrupt):
+        BatchDebate(interface, InterruptedBackend(endpoint), state, poll_seconds=0).run(accounts, lambda r: None)
+
+    resumed = BatchDebate(interface, LocalBatchBackend(endpoint), state, poll_seconds=0, resume=True)
+    results = []
+    resumed.run(accounts, results.append)
+    assert len(results) == len(accounts) and not any(result['error'] for result in results)
+    # Only the judge layer was left to submit; the critiques batch from before was polled, not sent again
+    assert (resumed.submitted, resumed.batches) == (len(accounts), 1)
+    assert len([name for name in os.listdir(endpoint) if name.endswith('.input.jsonl')]) == 3
@@ -0,0 +1,29 @@
+from src.benchmark import compare_results, run_config, write_synthetic_dataset
+from src.mock_openai_server import MockOpenAIServer, parse_latency
+import random
+
+def test_parse_latency():
+    rng = random.Random(0)
+    assert parse_latency("fixed:0.2")(rng) == 0.2
+    assert 0.1 <= parse_latency("uniform:0.1,0.5")(rng) <= 0.5
+    assert parse_latency("lognormal:0.05,0.5")(rng) > 0
+
+def test_run_config_against_mock_server(tmp_path):
+    dataset = tmp_path / "synthetic.csv"
+    write_synthetic_dataset(str(dataset), 12)
+    with MockOpenAIServer(error_rate=0.2, retry_after=0.01, seed=1) as server:
+        threads = run_config(str(dataset), server.base_url, "threads", 4, "full")
+        compact = run_config(str(dataset), server.base_url, "async", 4, "compact")
+    assert threads['accounts'] == compact['accounts'] == 12
+    assert threads['errors'] == compact['errors'] == 0
+    assert threads['calls'] == 60 and compact['calls'] == 12
+    assert threads['retries'] > 0
+    assert threads['accounts_per_sec'] > 0
+
+def test_compare_results_flags_regressions():
+    row = {'engine': 'async', 'max_workers': 8, 'debate_mode': 'full', 'latency_p99': 1.0, 'peak_rss_mb': 50.0}
+    baseline = {'results': [{**row, 'accounts_per_sec': 100.0}]}
+    current = {'results': [{**row, 'accounts_per_sec': 80.0}]}
+    [comparison] = compare_results(current, baseline, tolerance=0.1)
+    assert comparison['regression']
+    assert not compare_results(current, baseline, tolerance=0.3)[0]['regression']
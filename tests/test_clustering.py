@@ -0,0 +1,67 @@
+import random
+from src.clustering import cluster_accounts, handle_pattern, lsh_parameters, normalize_text
+from src.journal import new_result
+from src.robust_twitter_account import RobustTwitterAccount
+
+WORDS = "sun river quiet paper train garden coffee letter window mountain violin autumn market".split()
+
+def farm_account(i):
+    tweets = [f"Claim your free {i * 7} tokens now at https://scam.example/{i} before midnight friends",
+              f"Huge giveaway for @user{i} and everyone who retweets this within {i} hours today",
+              "Our project is listed on every exchange soon so buy early and hold strong forever"]
+    return RobustTwitterAccount(f"Crypto Fan {i}", f"cryptofan{1000 + i}", "Crypto lover. DMs open.", "", "",
+                                "May 2023", 5000, 12, tweets, 1)
+
+def human_account(i, rng):
+    tweets = [" ".join(rng.sample(WORDS, 8)) for _ in range(3)]
+    return RobustTwitterAccount(f"Person {i}", f"person_{chr(97 + i)}", " ".join(rng.sample(WORDS, 4)), "",
+                                "", "May 2015", 100, 150, tweets, 0)
+
+def test_normalization_collapses_templates():
+    assert normalize_text("Win 500 at https://x.io/a @bob") == normalize_text("Win 20 at https://y.io/b @al")
+    assert handle_pattern("CryptoFan1234") == handle_pattern("cryptofan98") == "cryptofan#"
+
+def test_lsh_parameters_match_threshold():
+    bands, rows = lsh_parameters(128, 0.8)
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.8) < 0.1
+
+def test_farm_accounts_share_one_debated_verdict():
+    rng = random.Random(0)
+    farm = [farm_account(i) for i in range(30)]
+    humans = [human_account(i, rng) for i in range(10)]
+    accounts = farm[:15] + humans + farm[15:]
+    clusters = cluster_accounts(accounts, threshold=0.7)
+    debated = clusters.to_debate()
+    assert len(debated) == 11
+    assert clusters.farm_sizes == [30]
+
+    representative = next(a for a in debated if a.handle.startswith("cryptofan"))
+    result = new_result(representative)
+    result['prediction'] = 1
+    shared = clusters.share(result)
+    assert len(shared) == 29
+    assert result['cluster']['role'] == 'sampled'
+    assert all(r['decided_by'] == 'cluster' and r['prediction'] == 1 for r in shared)
+    assert shared[0]['cluster']['sources'] == [representative.handle]
+    assert shared[0]['cluster']['similarity'] >= 0.7
+    for human in humans:
+        assert clusters.share({**new_result(human), 'prediction': 0}) == []
+
+def test_sampled_members_vote_and_failures_stay_retryable():
+    farm = [farm_account(i) for i in range(6)]
+    clusters = cluster_accounts(farm, threshold=0.7, sample_size=3)
+    sampled = clusters.to_debate()
+    assert len(sampled) == 3
+    results = [new_result(account) for account in sampled]
+    results[0]['prediction'] = 1
+    results[1]['error'] = "timeout"
+    results[2]['prediction'] = 1
+    assert clusters.share(results[0]) == [] and clusters.share(results[1]) == []
+    shared = clusters.share(results[2])
+    assert [r['prediction'] for r in shared] == [1, 1, 1]
+
+    failing = cluster_accounts(farm, threshold=0.7)
+    [sampled] = failing.to_debate()
+    shared = failing.share({**new_result(sampled), 'error': "timeout"})
+    assert all(r['error'] for r in shared)
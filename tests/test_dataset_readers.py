@@ -0,0 +1,59 @@
+import csv
+from src.dataset_reader import iter_dataset, read_dataset, read_dataset_columnar
+from src.robust_dataset_reader import iter_robust_dataset, read_robust_dataset, read_robust_dataset_columnar
+
+ROBUST_DATASET = "data/robust_dataset.csv"
+
+def write_standard_dataset(path, rows):
+    fields = ['User ID', 'Username', 'Tweet', 'Retweet Count', 'Mention Count', 'Follower Count',
+              'Verified', 'Bot Label', 'Location', 'Created At', 'Hashtags']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for i in range(rows):
+            writer.writerow({'User ID': i, 'Username': f'user{i}', 'Tweet': 'hi', 'Retweet Count': 3,
+                             'Mention Count': 1, 'Follower Count': 10, 'Verified': 'False',
+                             'Bot Label': i % 2, 'Location': 'Here', 'Created At': '2020-01-01 00:00:00',
+                             'Hashtags': 'a,b'})
+
+def test_iter_dataset_stops_at_limit(tmp_path):
+    path = tmp_path / "dataset.csv"
+    write_standard_dataset(path, 50)
+    accounts = iter_dataset(str(path), limit=3)
+    assert next(accounts).user_id == 0
+    assert [a.user_id for a in accounts] == [1, 2]
+    assert len(read_dataset(str(path))) == 50
+
+def test_iter_robust_dataset_is_lazy_and_limited():
+    accounts = iter_robust_dataset(ROBUST_DATASET, limit=4)
+    first = next(accounts)
+    assert first.handle == "yhterrance"
+    assert len(list(accounts)) == 3
+    assert len(read_robust_dataset(ROBUST_DATASET)) == 11
+
+def test_iter_robust_dataset_missing_file_yields_nothing(tmp_path):
+    assert list(iter_robust_dataset(str(tmp_path / "missing.csv"))) == []
+
+def test_columnar_readers_match_row_readers(tmp_path):
+    path = tmp_path / "dataset.csv"
+    write_standard_dataset(path, 20)
+    store = read_dataset_columnar(str(path), limit=5)
+    assert len(store) == 5
+    for view, account in zip(store, iter_dataset(str(path), limit=5)):
+        assert view.get_account_details() == account.get_account_details()
+
+    robust = read_robust_dataset_columnar(ROBUST_DATASET)
+    for view, account in zip(robust, read_robust_dataset(ROBUST_DATASET)):
+        assert view.get_account_details() == account.get_account_details()
+        assert view.account_id == account.account_id
+
+def test_columnar_limit_counts_valid_accounts(tmp_path):
+    path = tmp_path / "robust.csv"
+    with open(ROBUST_DATASET, encoding='utf-8') as src:
+        header, *rows = src.read().splitlines()
+    broken = header.count(',') * ','  # Empty counts and label, dropped by both readers
+    path.write_text("\n".join([header, rows[0], broken, *rows[1:]]) + "\n", encoding='utf-8')
+
+    expected = [account.account_id for account in iter_robust_dataset(str(path), limit=4)]
+    assert len(expected) == 4
+    assert [view.account_id for view in read_robust_dataset_columnar(str(path), limit=4, chunk_size=2)] == expected
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from src.openai_interface import OpenAIInterface
+from src.debate_engine import process_account_async, run_accounts
+from tests.fakes import make_completion, make_account
+
+class FakeAsyncInterface(OpenAIInterface):
+    """Answers every stage after a fixed delay and records how many calls overlap."""
+
+    def __init__(self, delay=0.05):
+        super().__init__(api_key="test", model_name="test-model")
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def _aget_completion(self, prompt, system_message, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        if prompt.startswith("As an impartial judge"):
+            return make_completion("**Analysis:** clear\n**Classification:** Yes")
+        return make_completion("argument")
+
+def test_process_account_async_uses_three_round_trips():
+    interface = FakeAsyncInterface(delay=0.05)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await process_account_async(make_account(1), interface)
+        return result, loop.time() - start
+
+    result, elapsed = asyncio.run(run())
+    assert (result['true_label'], result['prediction']) == (1, 1)
+    assert result['account_id'] == "1"
+    assert set(result['stages']) == {'bot_agent', 'human_agent', 'bot_critic', 'human_critic', 'judge'}
+    assert interface.calls == 5
+    assert interface.max_in_flight == 2
+    assert elapsed < 4 * interface.delay
+
+def test_run_accounts_bounds_concurrency():
+    interface = FakeAsyncInterface(delay=0.01)
+    results = []
+    asyncio.run(run_accounts([make_account(i) for i in range(20)], interface, 3, results.append))
+    assert len(results) == 20
+    assert all(result['prediction'] == 1 for result in results)
+    # At most three accounts with two parallel stages each
+    assert interface.max_in_flight <= 6
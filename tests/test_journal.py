@@ -0,0 +1,66 @@
+import csv
+import pytest
+from src.journal import PredictionSink, ResultJournal, new_result, read_journal
+from tests.fakes import make_account
+
+def finished(user_id, prediction, error=None):
+    result = new_result(make_account(user_id))
+    result['prediction'] = prediction
+    result['error'] = error
+    return result
+
+def test_resume_skips_completed_and_retries_errors(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    journal = ResultJournal(path)
+    journal.append(finished(1, 1))
+    journal.append(finished(2, 0, error="timeout"))
+    journal.close()
+
+    with pytest.raises(FileExistsError):
+        ResultJournal(path)
+
+    resumed = ResultJournal(path, resume=True)
+    assert resumed.completed_ids() == {"1"}
+    resumed.append(finished(2, 1))
+    resumed.close()
+
+    records = {record['account_id']: record for record in read_journal(path)}
+    assert len(records) == 2
+    assert records["2"]['prediction'] == 1
+    assert records["2"]['error'] is None
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / "results.jsonl"
+    journal = ResultJournal(str(path))
+    journal.append(finished(1, 1))
+    journal.close()
+    with open(path, 'a') as f:
+        f.write('{"account_id": "2", "pred')  # Crash mid-write
+
+    resumed = ResultJournal(str(path), resume=True)
+    resumed.append(finished(3, 0))
+    resumed.close()
+    assert sorted(record['account_id'] for record in read_journal(str(path))) == ["1", "3"]
+
+def test_late_stage_text_replaces_the_stage(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    journal = ResultJournal(path)
+    result = finished(1, 1)
+    result['stages']['judge'] = "**Classification:** Yes\n"
+    journal.append(result)
+    journal.append_stage_text("1", "judge", "**Classification:** Yes\n**Analysis:** Full reasoning.")
+    journal.close()
+    [record] = read_journal(path)
+    assert record['stages']['judge'].endswith("Full reasoning.")
+
+def test_prediction_sink_appends_on_resume(tmp_path):
+    path = str(tmp_path / "predictions.csv")
+    sink = PredictionSink(path)
+    sink.append(finished(1, 1))
+    sink.close()
+    sink = PredictionSink(path, resume=True)
+    sink.append(finished(2, 0))
+    sink.close()
+    with open(path, encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['account_id'], row['prediction'], row['decided_by']) for row in rows] == [("1", "1", "debate"), ("2", "0", "debate")]
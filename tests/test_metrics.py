@@ -0,0 +1,58 @@
+import random
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from src.metrics import ConfusionCounts, RunMetrics
+
+def test_confusion_counts_match_sklearn():
+    rng = random.Random(3)
+    true = [rng.randint(0, 1) for _ in range(200)]
+    pred = [rng.randint(0, 1) for _ in range(200)]
+    counts = ConfusionCounts.from_records({'true_label': t, 'prediction': p} for t, p in zip(true, pred))
+    assert counts.total == 200
+    assert counts.accuracy() == accuracy_score(true, pred)
+    assert counts.precision() == precision_score(true, pred)
+    assert counts.recall() == recall_score(true, pred)
+    assert abs(counts.f1() - f1_score(true, pred)) < 1e-12
+
+def test_merged_counts_equal_counts_over_all_records():
+    records = [{'true_label': i % 2, 'prediction': i % 3 == 0} for i in range(30)]
+    merged = ConfusionCounts.from_records(records[:10]) + ConfusionCounts.from_records(records[10:])
+    assert merged == ConfusionCounts.from_records(records)
+    assert ConfusionCounts.from_dict(merged.to_dict()) == merged
+
+def test_empty_counts_follow_zero_division():
+    counts = ConfusionCounts(tn=4)
+    assert counts.accuracy() == 1.0
+    assert counts.precision() == counts.recall() == counts.f1() == 0.0
+
+def test_run_metrics_fold_results_into_slices():
+    records = [
+        {'true_label': 1, 'prediction': 1, 'decided_by': 'debate', 'elapsed': 2.0, 'error': None,
+         'debate_path': 'early_exit', 'calls': 2, 'judge_confidence': 1.0},
+        {'true_label': 0, 'prediction': 1, 'decided_by': 'debate', 'elapsed': 4.0, 'error': None,
+         'debate_path': 'standard', 'calls': 5, 'judge_confidence': 0.6},
+        {'true_label': 0, 'prediction': 0, 'decided_by': 'pre_classifier', 'elapsed': 0.0, 'error': None},
+        {'true_label': 1, 'prediction': 0, 'decided_by': 'debate', 'elapsed': 1.0, 'error': 'timeout'},
+    ]
+    metrics = RunMetrics()
+    for record in records:
+        metrics.add(record)
+    assert metrics.counts == ConfusionCounts.from_records(records)
+    assert metrics.slice('decided_by', 'debate').total == 3
+    assert metrics.slice('decided_by', 'pre_classifier').accuracy() == 1.0
+    assert metrics.slice('decided_by', 'cluster').total == 0
+    assert metrics.slice_total('debate_path') == 2 and metrics.adaptive_calls == 7
+    assert metrics.slice('judge_vote', 'split') == ConfusionCounts(fp=1)
+    assert (metrics.failed, metrics.timed, metrics.elapsed) == (1, 3, 7.0)
+
+def test_api_calls_per_debate_come_from_recorded_usage():
+    metrics = RunMetrics()
+    assert metrics.api_calls_per_debate() is None
+    stage = lambda calls, cache_hits=0: {'model': 'm', 'calls': calls, 'cache_hits': cache_hits}
+    # An early exit, a full debate with one cached reply, and a shared verdict that cost nothing
+    metrics.add({'true_label': 1, 'prediction': 1, 'decided_by': 'debate', 'elapsed': 1.0,
+                 'usage': {'bot_agent': stage(1), 'human_agent': stage(1)}})
+    metrics.add({'true_label': 0, 'prediction': 0, 'decided_by': 'debate', 'elapsed': 1.0,
+                 'usage': {name: stage(1, cache_hits=name == 'judge')
+                           for name in ('bot_agent', 'human_agent', 'bot_critic', 'human_critic', 'judge')}})
+    metrics.add({'true_label': 1, 'prediction': 1, 'decided_by': 'cluster', 'elapsed': 0.0, 'usage': {}})
+    assert metrics.api_calls_per_debate() == 3.0
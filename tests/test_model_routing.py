@@ -0,0 +1,28 @@
+import pytest
+from src.mock_openai_server import MockOpenAIServer
+from src.model_routing import ModelRouter, StageModels
+from src.openai_interface import OpenAIInterface
+from tests.fakes import make_account
+
+def test_stage_settings_fall_back_to_default_and_interface():
+    models = StageModels(models={"judge": "big-model", "default": "small-model"}, temperatures={"judge": 0})
+    assert models.options("judge") == {"model": "big-model", "temperature": 0}
+    assert models.options("bot_agent") == {"model": "small-model"}
+    assert StageModels().options("judge") == {}
+
+def test_router_rejects_routes_without_an_accurate_model():
+    with pytest.raises(ValueError):
+        ModelRouter({"judge": {"min_accuracy": 0.9, "models": {"small-model": 0.8}}})
+
+def test_router_sends_stages_to_the_fastest_accurate_model():
+    latency = {"slow-model": "fixed:0.05", "fast-model": "fixed:0", "inaccurate-model": "fixed:0"}
+    routes = {"default": {"min_accuracy": 0.8, "models": {"slow-model": 0.9, "fast-model": 0.85, "inaccurate-model": 0.6}}}
+    with MockOpenAIServer(model_latency=latency) as server:
+        router = ModelRouter(routes, min_samples=2, refresh_seconds=0)
+        interface = OpenAIInterface(api_key="test", model_name="mock-model", base_url=server.base_url,
+                                    stage_models=StageModels(router=router))
+        account = make_account(1)
+        for _ in range(10):
+            interface.get_bot_agent_arguments(account)
+    assert server.model_requests == {"slow-model": 2, "fast-model": 8}
+    assert {row['model'] for row in interface.usage.summary()} == {"slow-model", "fast-model"}
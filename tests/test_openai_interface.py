@@ -1,15 +1,24 @@
 import pytest
 from dotenv import load_dotenv
-from src.openai_interface import OpenAIInterface
+from src.mock_openai_server import MockOpenAIServer
+from src.openai_interface import OpenAIInterface, RobustOpenAIInterface
+from src.robust_twitter_account import RobustTwitterAccount
+from tests.fakes import make_account
 import os
+import json
 
 @pytest.fixture
 def openai_interface():
     load_dotenv()
-    api_key = os.getenv("API_KEY")
+    api_key = os.getenv("API_KEY") or "test"  # Parsing tests never reach the API
     model_name = os.getenv("MODEL_NAME", "gpt-4o-mini")
     return OpenAIInterface(api_key=api_key, model_name=model_name)
 
+@pytest.fixture
+def mock_openai_server():
+    with MockOpenAIServer() as server:
+        yield server
+
 def test_get_classification_result_from_text(openai_interface):
     # Test with real generated text
     text_real_generated = """- **Reason:** The account presents characteristics both supporting and opposing the classification as a bot. On the one hand, the disproportionate follower count relative to engagement and the presence of generic tweet content raise concerns about automation. However, the account's steady growth in followers, diverse content over a substantial period, and lack of an excessive automated engagement pattern suggest genuine human operation. The engagement patterns, though low, do not align with typical bot behavior that often focuses on amplification and visibility through excessive retweets and mentions. These human-like engagement tendencies, along with the unique but credible location information, point towards the account being operated by a human, despite potential atypical engagement metrics. Moreover, the account lacks characteristics like excessive hashtags, which are often indicative of bots trying to boost visibility artificially. Considering these factors, the balance tips towards a human-operated account.
@@ -29,55 +38,120 @@ def test_get_classification_result_from_text(openai_interface):
     with pytest.raises(IndexError):
         classification = openai_interface.get_classification_result_from_text(text_invalid)
 
-def test_get_arguments_for_bot(openai_interface):
-    account_details = {
-        'username': 'testuser',
-        'created_at': '2021-01-01',
-        'tweet': 100,
-        'follower_count': 50,
-        'retweet_count': 20,
-        'mention_count': 5,
-        'verified': False,
-        'location': 'Testville',
-        'hashtags': ['test', 'bot'],
-        'avg_daily_retweets': 2
-    }
-    result = openai_interface.get_arguments_for_bot(account_details)
-    assert isinstance(result, str)
-    assert len(result) > 0
-
-def test_get_arguments_against_bot(openai_interface):
-    account_details = {
-        'username': 'testuser',
-        'created_at': '2021-01-01',
-        'tweet': 100,
-        'follower_count': 50,
-        'retweet_count': 20,
-        'mention_count': 5,
-        'verified': True,
-        'location': 'Testville',
-        'hashtags': ['test', 'human'],
-        'avg_daily_retweets': 3
-    }
-    result = openai_interface.get_arguments_against_bot(account_details)
-    assert isinstance(result, str)
-    assert len(result) > 0
-
-def test_get_final_classification(openai_interface):
-    account_details = {
-        'username': 'testuser',
-        'created_at': '2021-01-01',
-        'tweet': 100,
-        'follower_count': 50,
-        'retweet_count': 20,
-        'mention_count': 5,
-        'verified': False,
-        'location': 'Testville',
-        'hashtags': ['test', 'bot'],
-        'avg_daily_retweets': 2
-    }
-    bot_args = openai_interface.get_arguments_for_bot(account_details)
-    human_args = openai_interface.get_arguments_against_bot(account_details)
-    result = openai_interface.get_final_classification(account_details, bot_args, human_args)
-    assert isinstance(result, str)
-    assert len(result) > 0
\ No newline at end of file
+def test_get_final_classification(mock_openai_server):
+    openai_interface = OpenAIInterface(api_key="test", model_name="mock-model", base_url=mock_openai_server.base_url)
+    account = make_account(1)
+    bot_args = openai_interface.get_bot_agent_arguments(account)
+    human_args = openai_interface.get_human_agent_arguments(account)
+    bot_critique = openai_interface.get_bot_critic_response(account, human_args)
+    human_critique = openai_interface.get_human_critic_response(account, bot_args)
+    assert all(isinstance(text, str) and text for text in (bot_args, human_args, bot_critique, human_critique))
+
+    result = openai_interface.get_final_classification(account, bot_args, human_args, bot_critique, human_critique)
+    assert openai_interface.get_classification_result_from_text(result) in (0, 1)
+    assert mock_openai_server.requests == 5
+
+def test_compact_debate_against_mock_server(mock_openai_server):
+    openai_interface = OpenAIInterface(api_key="test", model_name="mock-model", base_url=mock_openai_server.base_url)
+    debate = openai_interface.get_compact_debate(make_account(2))
+    assert debate['prediction'] in (0, 1)
+
+def test_parse_compact_debate(openai_interface):
+    text = json.dumps({
+        'bot_arguments': 'Posts every minute.',
+        'human_arguments': 'Personal replies.',
+        'bot_critique': 'Replies are templated.',
+        'human_critique': 'Timing matches a time zone.',
+        'analysis': 'The bot side is stronger.',
+        'classification': 'Yes'
+    })
+    debate = openai_interface._parse_compact_debate(text)
+    assert debate['prediction'] == 1
+    assert debate['analysis'] == 'The bot side is stronger.'
+
+    with pytest.raises(IndexError):
+        openai_interface._parse_compact_debate('{"classification": "Yes"}')
+    with pytest.raises(IndexError):
+        openai_interface._parse_compact_debate('**Classification:** Yes')
+
+def test_stage_messages_share_account_prefix(openai_interface):
+    account = make_account(7)
+    formatted = []
+    original = openai_interface._format_account_details
+    openai_interface._format_account_details = lambda details: formatted.append(1) or original(details)
+
+    bot_params = openai_interface._completion_params(
+        *openai_interface._bot_agent_prompt(), openai_interface._account_block(account))
+    judge_params = openai_interface._completion_params(
+        *openai_interface._judge_prompt("a", "b", "c", "d"), openai_interface._account_block(account))
+
+    assert bot_params['messages'][:2] == judge_params['messages'][:2]
+    assert [message['role'] for message in bot_params['messages']] == ['system', 'user', 'user']
+    assert "Username: @user7" in bot_params['messages'][1]['content']
+    assert bot_params['messages'][2] != judge_params['messages'][2]
+    assert len(formatted) == 1
+
+def test_robust_account_block_keeps_the_robust_fields():
+    interface = RobustOpenAIInterface(api_key="test", model_name="test-model")
+    account = RobustTwitterAccount("Ada", "ada_codes", "Compilers and tea", "London", "ada.example", "May 2015",
+                                   120, 340, ["Shipped the parser today"], 0)
+    messages = interface._completion_params(*interface._bot_agent_prompt(), interface._account_block(account))['messages']
+    for line in ("Handle: ada_codes", "Description: Compilers and tea", "Webpage: ada.example",
+                 "Tweet 1: Shipped the parser today"):
+        assert line in messages[1]['content']
+
+def test_vote_takes_the_majority_and_reports_its_share(openai_interface):
+    yes, no = "**Classification:** Yes", "**Classification:** No"
+    verdict = openai_interface._vote([no, yes, "garbled", yes])
+    assert (verdict['prediction'], verdict['confidence']) == (1, 2 / 3)
+    assert verdict['votes'] == [0, 1, None, 1]
+    assert verdict['text'] == yes
+    assert openai_interface._vote([no, yes])['prediction'] == 0  # Ties follow the first sample
+    with pytest.raises(IndexError):
+        openai_interface._vote(["garbled"])
+
+def test_self_consistency_judge_uses_one_request(mock_openai_server):
+    openai_interface = OpenAIInterface(api_key="test", model_name="mock-model", base_url=mock_openai_server.base_url,
+                                       judge_samples=5)
+    verdict = openai_interface.get_final_verdict(make_account(3), "a", "b", "c", "d")
+    assert mock_openai_server.requests == 1
+    assert len(verdict['votes']) == 5
+    assert verdict['confidence'] > 0.5
+    [row] = openai_interface.usage.summary()
+    assert row['calls'] == 1
+
+def test_classification_from_partial_text(openai_interface):
+    assert openai_interface.classification_from_partial_text("**Classif") is None
+    assert openai_interface.classification_from_partial_text("**Classification:** Ye") is None
+    assert openai_interface.classification_from_partial_text("**Classification:** Yes\n**Anal") == 1
+    assert openai_interface.classification_from_partial_text("Intro\n**Classification:** No\n") == 0
+    with pytest.raises(IndexError):
+        openai_interface.classification_from_partial_text("**Classification:** Maybe\n")
+
+@pytest.mark.parametrize("mode", ["cancel", "background"])
+def test_streaming_judge_stops_at_the_classification(mock_openai_server, mode):
+    streaming = OpenAIInterface(api_key="test", model_name="mock-model", base_url=mock_openai_server.base_url,
+                                judge_streaming=mode)
+    delivered = []
+    streaming.judge_text_sink = lambda account_id, stage, text: delivered.append((account_id, stage, text))
+    account = make_account(4)
+    verdict = streaming.get_final_verdict(account, "a", "b", "c", "d")
+    streaming.wait_background()
+
+    full = OpenAIInterface(api_key="test", model_name="mock-model", base_url=mock_openai_server.base_url)
+    expected = full.get_final_verdict(account, "a", "b", "c", "d")
+    assert verdict['prediction'] == expected['prediction']
+    assert verdict['text'].startswith("**Classification:**") and "**Analysis:**" not in verdict['text']
+    if mode == "background":
+        [(account_id, stage, text)] = delivered
+        assert (account_id, stage) == ("4", "judge") and "**Analysis:**" in text
+        assert streaming.usage.summary()[0]['completion_tokens'] == full.usage.summary()[0]['completion_tokens']
+    else:
+        assert delivered == []
+        assert streaming.usage.summary()[0]['completion_tokens'] < full.usage.summary()[0]['completion_tokens']
+
+def test_blank_base_url_setting_uses_the_public_api(monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", "")
+    interface = OpenAIInterface(api_key="test", model_name="test-model")
+    assert str(interface.client.base_url).startswith("https://api.openai.com/v1")
+    assert str(interface.async_client.base_url).startswith("https://api.openai.com/v1")
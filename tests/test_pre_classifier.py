@@ -0,0 +1,25 @@
+from src.pre_classifier import PreClassifier, feature_matrix
+from src.twitter_account import TwitterAccount
+
+def account(user_id, followers, bot_label):
+    return TwitterAccount(user_id, f"user{user_id}", "hi", 5, 1, followers, False, bot_label,
+                          "Here", "2020-01-01 00:00:00", "")
+
+def training_set():
+    # Bots in this toy set have almost no followers, humans have many
+    return ([account(i, 1 + i % 3, 1) for i in range(20)] +
+            [account(100 + i, 5000 + i, 0) for i in range(20)])
+
+def test_feature_matrix_shape():
+    assert feature_matrix(training_set()).shape == (40, 6)
+
+def test_cascade_decides_confident_accounts_and_escalates_the_rest():
+    classifier = PreClassifier(low=0.2, high=0.8).fit(training_set())
+    decided = []
+    # The middle account sits between the two clusters
+    stream = [account(1, 2, 1), account(2, 70, 1), account(3, 9000, 0)]
+    escalated = list(classifier.cascade(stream, decided.append, batch_size=2))
+
+    assert [a.user_id for a in escalated] == [2]
+    assert {(r['account_id'], r['prediction']) for r in decided} == {("1", 1), ("3", 0)}
+    assert all(r['decided_by'] == 'pre_classifier' for r in decided)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from openai import RateLimitError
+from src.rate_limiter import RateLimiter, estimate_tokens, rate_limiter_from_env, retry_after_seconds
+from tests.fakes import make_completion
+
+def rate_limit_error(headers):
+    response = SimpleNamespace(status_code=429, headers=headers, request=None)
+    return RateLimitError("Too many requests", response=response, body=None)
+
+def test_retry_after_header_parsing():
+    assert retry_after_seconds(rate_limit_error({"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(rate_limit_error({"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(rate_limit_error({})) is None
+
+def test_estimate_tokens_counts_prompt_and_completion():
+    params = {"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 50}
+    assert estimate_tokens(params) == 150
+
+def test_requests_per_minute_budget_is_enforced():
+    limiter = RateLimiter(requests_per_minute=600, max_concurrency=4, initial_concurrency=4)
+    limiter._request_tokens = 1  # Start with one request of burst left
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.call(lambda: make_completion("ok"), 10)
+    # 600 RPM refills one request every 0.1s
+    assert time.monotonic() - start >= 0.18
+
+def test_throttling_halves_concurrency_and_retries():
+    limiter = RateLimiter(max_concurrency=16, initial_concurrency=16, backoff=0.01)
+    replies = [rate_limit_error({"retry-after-ms": "10"}), make_completion("ok")]
+
+    def send():
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    assert limiter.call(send, 10).choices[0].message.content == "ok"
+    stats = limiter.stats()
+    assert stats['throttled'] == 1
+    assert stats['retries'] == 1
+    assert stats['concurrency'] == 8
+
+def test_gives_up_after_max_retries():
+    limiter = RateLimiter(max_retries=1, backoff=0.001)
+
+    def send():
+        raise rate_limit_error({})
+
+    with pytest.raises(RateLimitError):
+        limiter.call(send, 10)
+
+def test_async_calls_respect_concurrency_window():
+    limiter = RateLimiter(max_concurrency=2, initial_concurrency=2)
+    in_flight = 0
+    peak = 0
+
+    async def send():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return make_completion("ok")
+
+    async def run():
+        await asyncio.gather(*(limiter.acall(send, 10) for _ in range(8)))
+
+    asyncio.run(run())
+    assert peak <= 2
+    assert limiter.stats()['requests'] == 8
+
+def test_no_limiter_without_a_quota(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_RPM", "")
+    monkeypatch.delenv("RATE_LIMIT_TPM", raising=False)
+    assert rate_limiter_from_env() is None
+    monkeypatch.setenv("RATE_LIMIT_TPM", "200000")
+    assert rate_limiter_from_env().tokens_per_minute == 200000
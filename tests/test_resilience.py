@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+import pytest
+from openai import APIConnectionError
+from src.openai_interface import OpenAIInterface
+from src.resilience import StageResilience, abandoned
+from src.response_cache import ResponseCache
+from tests.fakes import make_account, make_completion
+
+class FixedLatency:
+    """Stands in for the usage tracker: every stage's percentile is the same delay."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def latency_percentile(self, stage, q, min_samples=1):
+        return self.seconds
+
+def test_retries_then_gives_up():
+    resilience = StageResilience(retries=2, backoff=0)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise APIConnectionError(request=None)
+        return "ok"
+
+    assert resilience.call("bot_agent", flaky) == "ok"
+    with pytest.raises(IndexError):
+        resilience.call("human_agent", lambda: (_ for _ in ()).throw(IndexError("no classification")))
+    # A bug fails at once instead of being retried with backoff
+    with pytest.raises(KeyError):
+        resilience.call("judge", lambda: {}['prediction'])
+    rows = {row['stage']: row for row in resilience.summary()}
+    assert rows['bot_agent']['retries'] == 2 and rows['bot_agent']['recovered'] == 1
+    assert rows['human_agent']['retries'] == 2 and rows['human_agent']['failed'] == 1
+    assert rows['judge']['retries'] == 0 and rows['judge']['failed'] == 1
+
+def test_unparsable_judge_reply_is_retried_past_the_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    interface = OpenAIInterface(api_key="test", model_name="test-model", cache=cache,
+                                resilience=StageResilience(retries=2, backoff=0))
+    replies = iter([make_completion("The judge rambled without a verdict."), make_completion("**Classification:** Yes")])
+    interface._send = lambda params, on_retry=None: next(replies)
+    account = make_account(1)
+
+    assert interface.get_final_verdict(account, "bot", "human", "bot critique", "human critique")['prediction'] == 1
+    # The good reply replaced the cached bad one, so the next identical request never reaches the API
+    assert interface.get_final_verdict(account, "bot", "human", "bot critique", "human critique")['prediction'] == 1
+    judge = interface.resilience.summary()[0]
+    assert (judge['stage'], judge['retries'], judge['recovered'], judge['failed']) == ('judge', 1, 1, 0)
+    cache.close()
+
+def test_slow_request_is_hedged_and_the_loser_abandoned():
+    resilience = StageResilience(hedge_percentile=0.95, usage=FixedLatency(0.05))
+    calls = []
+    loser_abandoned = threading.Event()
+
+    def send():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            if abandoned():
+                loser_abandoned.set()
+            return "slow"
+        return "fast"
+
+    start = time.perf_counter()
+    assert resilience.hedge("judge", send) == "fast"
+    assert time.perf_counter() - start < 0.4
+    assert loser_abandoned.wait(2)
+    row = resilience.summary()[0]
+    assert (row['hedges'], row['hedge_wins'], row['hedge_rate']) == (1, 1, 1.0)
+
+def test_async_hedge_cancels_the_slow_request():
+    resilience = StageResilience(hedge_percentile=0.95, usage=FixedLatency(0.05))
+    cancelled = []
+
+    async def run():
+        started = []
+
+        async def send():
+            started.append(1)
+            try:
+                await asyncio.sleep(0.5 if len(started) == 1 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return len(started)
+
+        return await resilience.ahedge("judge", send)
+
+    assert asyncio.run(run()) == 2
+    assert cancelled == [1]
@@ -0,0 +1,68 @@
+import time
+from src.openai_interface import OpenAIInterface
+from src.response_cache import ResponseCache, response_cache_from_env
+from tests.fakes import make_completion
+
+class CountingInterface(OpenAIInterface):
+    def __init__(self, cache):
+        super().__init__(api_key="test", model_name="test-model", temperature=0, cache=cache)
+        self.api_calls = 0
+
+        class Completions:
+            def create(inner, **params):
+                self.api_calls += 1
+                return make_completion(f"reply {self.api_calls}")
+        self.client.chat.completions = Completions()
+
+def test_key_depends_on_every_parameter():
+    params = {"model": "m", "temperature": 0, "messages": [{"role": "user", "content": "hi"}]}
+    key = ResponseCache.make_key(params)
+    assert key == ResponseCache.make_key(dict(reversed(list(params.items()))))
+    assert key != ResponseCache.make_key({**params, "temperature": 0.5})
+    assert key != ResponseCache.make_key({**params, "model": "other"})
+
+def test_hits_misses_and_bypass(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get("k") is None
+    cache.put("k", "{}")
+    assert cache.get("k") == "{}"
+    cache.bypass = True
+    assert cache.get("k") is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2, ttl_seconds=0.05)
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+        time.sleep(0.001)
+    cache.evict()
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    time.sleep(0.06)
+    assert cache.get("c") is None
+
+def test_interface_serves_repeated_prompts_from_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    interface = CountingInterface(ResponseCache(path))
+    account = {'username': 'u', 'location': 'x'}
+    first = interface.get_bot_agent_arguments(account)
+
+    # A fresh process re-reads the same file
+    rerun = CountingInterface(ResponseCache(path))
+    assert rerun.get_bot_agent_arguments(account) == first
+    assert rerun.api_calls == 0
+    rerun.get_human_agent_arguments(account)
+    assert rerun.api_calls == 1
+
+def test_cache_defaults_to_on_only_at_temperature_zero(tmp_path, monkeypatch):
+    monkeypatch.delenv("RESPONSE_CACHE", raising=False)
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    assert response_cache_from_env(0.5) is None
+    cache = response_cache_from_env(0.0)
+    assert cache is not None
+    cache.close()
+    monkeypatch.setenv("RESPONSE_CACHE", "on")
+    cache = response_cache_from_env(0.5)
+    assert cache is not None
+    cache.close()
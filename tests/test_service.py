@@ -0,0 +1,86 @@
+import asyncio
+import http.client
+import json
+import pytest
+from src.mock_openai_server import MockOpenAIServer
+from src.openai_interface import RobustOpenAIInterface
+from src.service import ScoringService, ServiceOverloaded, account_from_json
+
+def account_json(i):
+    return {'username': f"User {i}", 'handle': f"user{i}", 'description': "Coffee and code",
+            'followers': 100 + i, 'following': 50, 'tweets': [f"Tweet number {i}", "Another one"]}
+
+def request(address, method, path, payload=None):
+    connection = http.client.HTTPConnection(*address, timeout=10)
+    connection.request(method, path, json.dumps(payload) if payload is not None else None,
+                       {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    body = response.read().decode('utf-8')
+    connection.close()
+    return response.status, (json.loads(body) if response.getheader('Content-Type') == 'application/json' else body)
+
+def run_service(mock, test, **options):
+    async def main():
+        interface = RobustOpenAIInterface("test", "mock-model", 0.0, base_url=mock.base_url)
+        service = await ScoringService(interface, **options).start(port=0)
+        try:
+            return await test(service)
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+def test_single_and_batch_requests():
+    with MockOpenAIServer() as mock:
+        async def test(service):
+            single = await asyncio.to_thread(request, service.address, 'POST', '/v1/classify', {'account': account_json(1)})
+            batch = await asyncio.to_thread(request, service.address, 'POST', '/v1/classify',
+                                            {'accounts': [account_json(i) for i in range(2, 6)], 'include_stages': True})
+            invalid = await asyncio.to_thread(request, service.address, 'POST', '/v1/classify', {'accounts': [{}]})
+            health = await asyncio.to_thread(request, service.address, 'GET', '/healthz')
+            metrics = await asyncio.to_thread(request, service.address, 'GET', '/metrics')
+            return single, batch, invalid, health, metrics
+
+        single, batch, invalid, health, metrics = run_service(mock, test, max_concurrency=4)
+
+    status, body = single
+    assert status == 200 and body['result']['account_id'] == "user1"
+    assert body['result']['label'] in ('bot', 'human') and 'true_label' not in body['result']
+    status, body = batch
+    assert status == 200 and [r['account_id'] for r in body['results']] == [f"user{i}" for i in range(2, 6)]
+    assert set(body['results'][0]['stages']) == {'bot_agent', 'human_agent', 'bot_critic', 'human_critic', 'judge'}
+    assert invalid[0] == 400
+    assert health == (200, {'status': 'ok', 'uptime_seconds': health[1]['uptime_seconds'], 'queued': 0,
+                            'queue_capacity': 1024, 'in_flight': 0})
+    assert "botdetector_service_accounts_total 5" in metrics[1]
+    assert 'botdetector_calls_total{stage="judge",model="mock-model"} 5' in metrics[1]
+
+def test_concurrent_duplicates_share_one_debate():
+    with MockOpenAIServer(latency='fixed:0.05') as mock:
+        async def test(service):
+            account = account_from_json(account_json(7))
+            return await asyncio.gather(*(service.classify([account]) for _ in range(5)))
+
+        results = run_service(mock, test)
+        assert mock.requests == 5  # One five-call debate for five identical requests
+    assert len({result[0]['prediction'] for result in results}) == 1
+
+def test_full_intake_queue_rejects_requests():
+    with MockOpenAIServer(latency='fixed:0.1') as mock:
+        async def test(service):
+            # One account debating, one waiting for the worker, one held by the batcher, two queued
+            accepted = []
+            for i in range(5):
+                accepted.append(asyncio.create_task(service.classify([account_from_json(account_json(i))])))
+                await asyncio.sleep(0.01)
+            with pytest.raises(ServiceOverloaded):
+                await service.classify([account_from_json(account_json(10))])
+            status = await asyncio.to_thread(request, service.address, 'POST', '/v1/classify',
+                                             {'account': account_json(11)})
+            too_large = await asyncio.to_thread(request, service.address, 'POST', '/v1/classify',
+                                                {'accounts': [account_json(i) for i in range(20, 23)]})
+            await asyncio.gather(*accepted)
+            return status, too_large
+
+        (status, body), too_large = run_service(mock, test, max_concurrency=1, queue_size=2)
+    assert status == 503 and 'queue is full' in body['error']
+    assert too_large[0] == 413
@@ -0,0 +1,57 @@
+import pytest
+from src.metrics import ConfusionCounts
+from src.robust_dataset_reader import read_robust_dataset_columnar
+from src.sharding import (filter_shard, load_summary, merge_summaries, missing_shards, parse_shard,
+                          shard_of, write_summary)
+from tests.fakes import make_account
+
+def test_parse_shard():
+    assert parse_shard("2/8") == (2, 8)
+    for bad in ("8/8", "-1/2", "1", "a/b", "0/0"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+def test_blank_shard_setting_means_no_sharding(monkeypatch):
+    from src.main import parse_args
+    monkeypatch.setenv("SHARD", "")
+    assert parse_args(["--journal", "run.jsonl"]).shard is None
+    monkeypatch.setenv("SHARD", "1/4")
+    assert parse_args(["--journal", "run.jsonl"]).shard == (1, 4)
+
+def test_progress_total_counts_only_the_accounts_left_to_score():
+    from src.main import accounts_to_score, progress_total
+    store = read_robust_dataset_columnar("data/robust_dataset.csv")
+    completed = {store[0].account_id}
+    remaining = list(accounts_to_score(store, (0, 2), completed))
+    assert progress_total(store, None, (0, 2), completed) == len(remaining) < len(store)
+    assert store[0].account_id not in [account.account_id for account in remaining]
+    # A streamed reader cannot be counted ahead, so the bar shows no total rather than a wrong one
+    assert progress_total(iter(store), 10, (0, 2), set()) is None
+    assert progress_total(iter(store), 10, None, set()) == 10
+
+def test_shards_partition_the_accounts():
+    accounts = [make_account(i) for i in range(200)]
+    shards = [list(filter_shard(accounts, index, 4)) for index in range(4)]
+    ids = sorted(a.user_id for shard in shards for a in shard)
+    assert ids == list(range(200))
+    assert all(shards)
+    # Independent of the process: sha256 of the ID, not the randomized built-in hash
+    assert shard_of("12345", 4) == int.from_bytes(__import__('hashlib').sha256(b"12345").digest()[:8], 'big') % 4
+
+def test_merge_summaries(tmp_path):
+    usage = [{'stage': 'judge', 'model': 'm', 'calls': 2, 'cache_hits': 0, 'retries': 1,
+              'prompt_tokens': 10, 'completion_tokens': 5, 'cost_usd': 0.5}]
+    write_summary(tmp_path / "a.summary.json", ConfusionCounts(tp=1, tn=2), (0, 3), usage, 1.0)
+    write_summary(tmp_path / "b.summary.json", ConfusionCounts(fp=1, fn=1), (2, 3), usage, 2.0)
+    summaries = [load_summary(str(tmp_path / name)) for name in ("a.summary.json", "b.summary.json")]
+    counts, merged_usage = merge_summaries(summaries)
+    assert counts == ConfusionCounts(tp=1, fp=1, tn=2, fn=1)
+    assert merged_usage[('judge', 'm')]['calls'] == 4
+    assert merged_usage[('judge', 'm')]['cost_usd'] == 1.0
+    assert missing_shards(summaries) == [1]
+
+def test_resumed_summary_labels_its_usage(tmp_path):
+    write_summary(tmp_path / "resumed.summary.json", ConfusionCounts(tp=1), (0, 2), [], 1.0, resumed=True)
+    write_summary(tmp_path / "fresh.summary.json", ConfusionCounts(tp=1), (1, 2), [], 1.0)
+    assert load_summary(str(tmp_path / "resumed.summary.json"))['usage_scope'] == 'invocation'
+    assert load_summary(str(tmp_path / "fresh.summary.json"))['usage_scope'] == 'run'
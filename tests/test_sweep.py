@@ -0,0 +1,39 @@
+import pytest
+from src.benchmark import write_synthetic_dataset
+from src.mock_openai_server import MockOpenAIServer
+from src.openai_interface import RobustOpenAIInterface
+from src.robust_dataset_reader import iter_robust_dataset
+from src.sweep import Sweep, expand_grid, run_sweep
+
+def test_expand_grid():
+    configs = expand_grid({'base': {'temperatures': {'default': 0.2}},
+                           'configs': [{'name': 'fast', 'models': {'default': 'small'}}],
+                           'grid': {'judge.temperature': [0.0, 0.7], 'judge_samples': [1, 3]}})
+    assert [config['name'] for config in configs] == [
+        'fast', 'judge.temperature=0.0,judge_samples=1', 'judge.temperature=0.0,judge_samples=3',
+        'judge.temperature=0.7,judge_samples=1', 'judge.temperature=0.7,judge_samples=3']
+    assert configs[0]['models'] == {'default': 'small'} and configs[0]['temperatures'] == {'default': 0.2}
+    assert configs[4]['temperatures'] == {'default': 0.2, 'judge': 0.7} and configs[4]['judge_samples'] == 3
+    with pytest.raises(ValueError):
+        expand_grid({'grid': {'judge.prompt': ['x']}})
+
+def test_sweep_shares_stages_that_configurations_have_in_common(tmp_path):
+    dataset = tmp_path / "synthetic.csv"
+    write_synthetic_dataset(str(dataset), 3)
+    template = tmp_path / "judge.txt"
+    template.write_text("As an impartial judge, weigh {bot_args} {human_args} {bot_critique} {human_critique}\n"
+                        "**Classification:** Yes/No")
+    configs = expand_grid({'configs': [{'name': 'bot on c', 'models': {'bot_agent': 'c'}}],
+                           'grid': {'judge.model': ['a', 'b'], 'judge_prompt': [None, str(template)]}})
+    with MockOpenAIServer(seed=0) as server:
+        interface = RobustOpenAIInterface("test", "test-model", 0.0, base_url=server.base_url)
+        report = run_sweep(Sweep(configs, interface), iter_robust_dataset(str(dataset)), max_workers=2)
+        model_requests = dict(server.model_requests)
+
+    # Per account: four openings and critiques shared by everyone, a judge per configuration, and
+    # the bot opening on model c forks its critique and judge
+    assert report['executed']['calls'] == 3 * (4 + 5 + 2) and report['standalone_calls'] == 3 * 5 * 5
+    assert model_requests == {'test-model': 3 * 6, 'c': 3, 'a': 6, 'b': 6}
+    for row in report['configs']:
+        assert (row['accounts'], row['errors'], row['calls']) == (3, 0, 15)
+        assert row['prompt_tokens'] > 0 and row['est_wall_time'] > 0
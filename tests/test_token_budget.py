@@ -0,0 +1,50 @@
+from src.mock_openai_server import MockOpenAIServer
+from src.openai_interface import RobustOpenAIInterface
+from src.robust_twitter_account import RobustTwitterAccount
+from src.token_budget import (TRUNCATION_MARK, TokenBudget, compact_argument, count_tokens, key_points,
+                              sample_evenly, truncate_to_tokens)
+
+ARGUMENT = """\
+1. **Follower ratio:** The account follows 4,000 users but has 12 followers. Such ratios are typical of follow-back farms.
+2. **Posting cadence:** Tweets arrive every 15 minutes around the clock. No human keeps this schedule for months.
+3. **Templated content:** Three of five tweets share the same giveaway phrasing. Only the numbers change."""
+
+def test_truncate_and_count():
+    text = "word " * 200
+    cut = truncate_to_tokens(text, 20)
+    assert cut.endswith(TRUNCATION_MARK)
+    assert count_tokens(cut) <= 20
+    assert truncate_to_tokens("short", 20) == "short"
+
+def test_compaction_keeps_the_first_sentence_of_each_point():
+    points = key_points(ARGUMENT)
+    assert points == [
+        "1. **Follower ratio:** The account follows 4,000 users but has 12 followers.",
+        "2. **Posting cadence:** Tweets arrive every 15 minutes around the clock.",
+        "3. **Templated content:** Three of five tweets share the same giveaway phrasing.",
+    ]
+    assert compact_argument(ARGUMENT, 1000) == ARGUMENT
+    compacted = compact_argument(ARGUMENT, 60)
+    assert compacted == "\n".join(points) or compacted.endswith(TRUNCATION_MARK)
+    assert count_tokens(compacted) <= 60
+
+def test_sample_evenly_keeps_the_ends():
+    assert sample_evenly([1, 2, 3, 4, 5], 3) == [1, 3, 5]
+    assert sample_evenly([1, 2], 5) == [1, 2]
+
+def test_budget_limits_prompts_and_replies():
+    budget = TokenBudget(stage_max_tokens={'judge': 10}, max_tweets=2, tweet_tokens=5, argument_tokens=40)
+    account = RobustTwitterAccount("Name", "handle1", "desc", "Berlin", "", "May 2020", 10, 20,
+                                   ["a long tweet " * 20, "second", "third"], 1)
+    with MockOpenAIServer() as server:
+        interface = RobustOpenAIInterface("test", "mock-model", base_url=server.base_url, budget=budget)
+        block = interface._account_block(account)
+        assert "Tweet 3" not in block and TRUNCATION_MARK in block
+        verdict = interface.get_final_verdict(account, ARGUMENT, ARGUMENT, ARGUMENT, ARGUMENT)
+    # The capped judge is asked for its label first, so the cut-off reply still parses
+    assert verdict['prediction'] in (0, 1)
+    assert interface.usage.summary()[0]['completion_tokens'] <= 10
+    parts = {part: (items, before, after) for part, items, before, after in budget.report()}
+    assert parts['account tweets'][0] == 1
+    assert parts['judge input'][2] < parts['judge input'][1]
+    assert TokenBudget().options('judge') == {} and not TokenBudget().active
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from src import tracing
+from src.debate_engine import run_accounts
+from src.main import process_account
+from src.mock_openai_server import MockOpenAIServer
+from src.openai_interface import OpenAIInterface
+from tests.fakes import make_account
+
+def load_spans(path):
+    with open(path, encoding='utf-8') as f:
+        return [event for event in json.load(f) if event['ph'] == 'X']
+
+def assert_lanes_nest(spans):
+    """Spans sharing a lane must nest, or the trace viewer draws them on top of each other."""
+    lanes = {}
+    for span in spans:
+        lanes.setdefault(span['tid'], []).append((span['ts'], span['ts'] + span['dur']))
+    for intervals in lanes.values():
+        intervals.sort(key=lambda interval: (interval[0], -interval[1]))
+        open_ends = []
+        for start, end in intervals:
+            while open_ends and open_ends[-1] <= start:
+                open_ends.pop()
+            assert not open_ends or end <= open_ends[-1] + 1e-3
+            open_ends.append(end)
+
+def test_spans_cover_accounts_stages_requests_and_parsing(tmp_path):
+    path = str(tmp_path / "trace.json")
+    with MockOpenAIServer(latency="fixed:0.01") as server:
+        interface = OpenAIInterface(api_key="test", model_name="mock-model", base_url=server.base_url)
+        tracing.start(path)
+        try:
+            result = process_account(make_account(1), interface)
+        finally:
+            tracing.stop()
+    assert result['error'] is None
+    spans = load_spans(path)
+    names = [span['name'] for span in spans]
+    assert names.count('account') == 1 and names.count('http') == 5 and names.count('parse') == 1
+    assert {'bot_agent', 'human_agent', 'bot_critic', 'human_critic', 'judge'} <= set(names)
+    account = next(span for span in spans if span['name'] == 'account')
+    assert account['args']['account_id'] == "1"
+    assert all(span['tid'] == account['tid'] for span in spans)
+    assert all('thread' in span['args'] for span in spans)
+
+def test_concurrent_async_stages_get_their_own_lanes(tmp_path):
+    path = str(tmp_path / "trace.json")
+    with MockOpenAIServer(latency="fixed:0.02") as server:
+        interface = OpenAIInterface(api_key="test", model_name="mock-model", base_url=server.base_url)
+        tracing.start(path)
+
+        async def run():
+            try:
+                await run_accounts([make_account(i) for i in range(6)], interface, 3, lambda result: None)
+            finally:
+                await interface.aclose()
+
+        try:
+            asyncio.run(run())
+        finally:
+            tracing.stop()
+    spans = load_spans(path)
+    assert sum(span['name'] == 'account' for span in spans) == 6
+    assert len({span['tid'] for span in spans}) > 3  # Openings and critiques overlap within an account
+    assert_lanes_nest(spans)
+    assert all('task' in span['args'] for span in spans)
+
+def test_spans_are_shared_no_ops_while_off():
+    assert not tracing.enabled()
+    assert tracing.span("account", "account") is tracing.span("judge", "stage")
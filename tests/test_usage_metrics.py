@@ -0,0 +1,31 @@
+import json
+import pytest
+from src.usage_metrics import LatencyHistogram, UsageTracker
+from tests.fakes import make_completion
+
+def test_histogram_percentiles_within_one_bucket():
+    histogram = LatencyHistogram()
+    for i in range(1, 101):
+        histogram.observe(i / 10)
+    assert histogram.percentile(0.50) == pytest.approx(5.0, rel=0.1)
+    assert histogram.percentile(0.99) == pytest.approx(9.9, rel=0.1)
+
+def test_tracker_aggregates_stage_cost_and_account_usage():
+    tracker = UsageTracker(prices={'gpt-4o-mini': (0.15, 0.60)})
+    response = make_completion("ok", prompt_tokens=1000, completion_tokens=100)
+    tracker.record("judge", "gpt-4o-mini-2024-07-18", response, 0.5, retries=1, account_id="a")
+    tracker.record("judge", "gpt-4o-mini-2024-07-18", response, 0.0, account_id="a", cache_hit=True)
+
+    [row] = tracker.summary()
+    assert (row['calls'], row['cache_hits'], row['retries']) == (2, 1, 1)
+    assert row['prompt_tokens'] == 1000
+    assert row['cost_usd'] == pytest.approx((1000 * 0.15 + 100 * 0.60) / 1_000_000)
+
+    judge = tracker.pop_account("a")['judge']
+    assert (judge['calls'], judge['cache_hits'], judge['prompt_tokens']) == (2, 1, 1000)
+    assert tracker.pop_account("a") == {}
+
+    assert json.loads(tracker.to_json())['stages'][0]['stage'] == "judge"
+    prometheus = tracker.to_prometheus()
+    assert 'botdetector_calls_total{stage="judge",model="gpt-4o-mini-2024-07-18"} 2' in prometheus
+    assert 'le="+Inf"} 1' in prometheus
@@ -0,0 +1,47 @@
+from src.journal import new_result
+from src.robust_twitter_account import RobustTwitterAccount
+from src.verdict_index import VerdictIndex
+
+def farm_account(i):
+    tweets = [f"Claim your free {i * 7} tokens now at https://scam.example/{i} before midnight friends",
+              "Our project is listed on every exchange soon so buy early and hold strong forever"]
+    return RobustTwitterAccount(f"Crypto Fan {i}", f"cryptofan{1000 + i}", "Crypto lover. DMs open.", "", "",
+                                "May 2023", 5000, 12, tweets, 1)
+
+def human_account():
+    tweets = ["Finished the river trail before the rain, the autumn colours were unreal",
+              "Anyone know a good violin teacher near the old market?"]
+    return RobustTwitterAccount("Person", "person_a", "Coffee, letters and mountains", "", "", "May 2015",
+                                100, 150, tweets, 0)
+
+def debated(account, prediction):
+    result = new_result(account)
+    result['prediction'] = prediction
+    return result
+
+def test_near_duplicates_reuse_a_stored_verdict_across_runs(tmp_path):
+    path = str(tmp_path / "verdicts.sqlite3")
+    index = VerdictIndex(path, threshold=0.9)
+    decided = []
+    [first] = list(index.cascade([farm_account(1)], decided.append))
+    index.record(debated(first, 1))
+    index.close()
+
+    # A later run: same template under other handles hits, an unrelated account falls through
+    index = VerdictIndex(path, threshold=0.9)
+    assert len(index) == 1
+    to_debate = list(index.cascade([farm_account(2), human_account(), farm_account(3)], decided.append))
+    assert [account.handle for account in to_debate] == ["person_a"]
+    assert [(r['account_id'], r['prediction'], r['decided_by']) for r in decided] == [
+        ("cryptofan1002", 1, 'verdict_index'), ("cryptofan1003", 1, 'verdict_index')]
+    assert decided[0]['verdict_index']['source'] == "cryptofan1001"
+    assert decided[0]['verdict_index']['similarity'] >= 0.9
+    assert index.stats() == {'entries': 1, 'queries': 3, 'hits': 2, 'hit_rate': 2 / 3}
+
+    # Failed debates and results decided elsewhere are not stored
+    failed = debated(to_debate[0], 0)
+    failed['error'] = "timeout"
+    index.record(failed)
+    index.record(decided[0])
+    assert len(index) == 1
+    index.close()